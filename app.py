@@ -1,23 +1,47 @@
 import sys
 import os
+import time
+import queue
+import threading
+import contextvars
+import uuid
+from concurrent.futures import (
+    FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait)
 from pathlib import Path
 import streamlit as st
 from src.agents import AgentsManager
 from src.database import DatabaseManager
-from langchain.llms import OpenAI
+from src.llm_cache import SemanticCache
+from src.sql_rewrite import apply_limit, strip_limit
+from src.query_guard import QueryCancelledError
+from src.chunks import ChunkedStats
+from src.export import available_formats, discard_export, export_query, export_to_file
+from src.lazy import lazy_module
+from src.server import AnalysisClient, ServiceBusyError
+from src.timing import collect_timings, configure_json_logging, timed
+from src.memory import configure_memory_profiling, profile_memory, response_bytes
+from src.metrics import start_metrics_server, start_textfile_writer
+from src.session_store import SessionStore
 from dotenv import load_dotenv
 import pandas as pd
 from datetime import datetime
 import json
-import plotly.express as px
 import matplotlib.pyplot as plt
 
+# Plotly só é importado ao exibir o primeiro gráfico
+px = lazy_module("plotly.express")
+
 # Configuração de caminhos
 PROJECT_ROOT = Path(__file__).parent.resolve()
 sys.path.append(str(PROJECT_ROOT))
 
 # Configuração inicial
 load_dotenv()
+# LOG_FORMAT=json emite os logs (inclusive os tempos por etapa) em JSON
+if os.getenv("LOG_FORMAT", "").lower() == "json":
+    configure_json_logging()
+# MEMORY_PROFILE=1 mede a memória por etapa com o tracemalloc (mais lento)
+configure_memory_profiling()
 st.set_page_config(
     page_title="Analytics com IA - Completo",
     layout="wide",
@@ -488,9 +512,46 @@ st.markdown("""
 # Verificação do banco de dados
 DB_PATH = PROJECT_ROOT / 'data' / 'clientes_completo.db'
 
+# Limite máximo do slider; acima de IN_MEMORY_ROWS as linhas não são
+# carregadas de uma vez: estatísticas e exportação leem o resultado em blocos
+MAX_RECORD_LIMIT = int(os.getenv("MAX_RECORD_LIMIT", "1000000"))
+IN_MEMORY_ROWS = int(os.getenv("IN_MEMORY_ROWS", "10000"))
+QUERY_CHUNKSIZE = int(os.getenv("QUERY_CHUNKSIZE", "5000"))
+# Prazo para o primeiro trecho dos insights antes de usar o resumo básico
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "8"))
+# Últimas respostas das sessões: memória total do processo, ociosidade que
+# as compacta, ociosidade que as esquece (e apaga do disco) e diretório
+# opcional para onde vão os dados compactados
+SESSION_MEMORY_BUDGET_MB = float(os.getenv("SESSION_MEMORY_BUDGET_MB", "512"))
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "900"))
+SESSION_FORGET_SECONDS = float(os.getenv("SESSION_FORGET_SECONDS", "3600"))
+SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "")
+# Com ANALYSIS_API_URL o app é cliente do serviço (python -m src.server),
+# que mantém o LLM e os caches compartilhados entre front ends
+ANALYSIS_API_URL = os.getenv("ANALYSIS_API_URL", "")
+# Métricas do processo (LLM, SQL, caches e pool): METRICS_PORT expõe
+# /metrics; METRICS_FILE grava um .prom para o textfile collector
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+
+
+def create_database_manager():
+    """Gerenciador de banco da sessão, com os limites de consulta do ambiente."""
+    max_vm_steps = os.getenv("QUERY_MAX_VM_STEPS")
+    return DatabaseManager(
+        str(DB_PATH),
+        query_timeout=float(os.getenv("QUERY_TIMEOUT", "60")),
+        max_vm_steps=int(max_vm_steps) if max_vm_steps else None
+    )
+
 
-@st.cache_data
 def quick_database_check():
+    """
+    Verificação rápida do banco usando o gerenciador da sessão.
+
+    Usa o modo "fast" do health_check: conectividade e contagens pelos
+    metadados do catálogo, sem COUNT(*) nas tabelas.
+    """
     if not DB_PATH.exists():
         return False, f"Arquivo não encontrado: {DB_PATH}", 0
 
@@ -498,21 +559,114 @@ def quick_database_check():
         return False, "Arquivo do banco está vazio", 0
 
     try:
-        with DatabaseManager(str(DB_PATH)) as db:
-            health = db.health_check()
-            if not health["connected"]:
-                return False, "Falha na conexão", 0
-            if health["total_records"] == 0:
-                return False, "Banco sem dados", 0
-            return True, f"✅ {
-                health['tables_count']} tabelas, {
-                health['total_records']:,} registros", health["total_records"]
+        if "db" not in st.session_state:
+            st.session_state.db = create_database_manager()
+        health = st.session_state.db.health_check(mode="fast")
+        if not health["connected"]:
+            return False, "Falha na conexão", 0
+        if health["total_records"] == 0:
+            return False, "Banco sem dados", 0
+        approx = "" if health["counts"]["exact"] else "~"
+        return True, f"✅ {
+            health['tables_count']} tabelas, {approx}{
+            health['total_records']:,} registros", health["total_records"]
     except Exception as e:
         return False, f"Erro: {str(e)}", 0
 
 
 db_ok, db_message, total_records = quick_database_check()
 
+
+@st.cache_resource
+def get_llm_cache():
+    """Cache semântico de interpretações e SQL, compartilhado entre sessões."""
+    # LLM_CACHE_SIMILARITY=off mantém apenas os acertos por igualdade exata
+    similarity = os.getenv("LLM_CACHE_SIMILARITY", "0.92").strip().lower()
+    return SemanticCache(
+        PROJECT_ROOT / 'data' / 'llm_cache.db',
+        similarity_threshold=(None if similarity in ("", "0", "off", "none")
+                              else float(similarity))
+    )
+
+
+def get_query_executor():
+    """
+    Threads que executam as consultas desta sessão, deixando a interface
+    livre para cancelar.
+
+    Cada sessão tem seu executor, com uma thread por leitor do seu pool de
+    conexões: consultas de uma sessão não esperam as de outras. As threads
+    terminam quando a sessão é descartada e o executor é coletado.
+    """
+    if "query_executor" not in st.session_state:
+        st.session_state.query_executor = ThreadPoolExecutor(
+            max_workers=st.session_state.db.pool_size,
+            thread_name_prefix="query")
+    return st.session_state.query_executor
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def check_analysis_service(url):
+    """Consulta o /health do serviço de análise."""
+    try:
+        health = AnalysisClient(url).health()
+        return True, f"{health['in_flight']} em andamento, {health['rejected']} recusadas"
+    except Exception as e:
+        return False, str(e)
+
+
+# Etapas paralelas de cada análise (insights e resposta formatada)
+ANALYSIS_STAGES = 2
+
+
+def get_analysis_executor():
+    """
+    Threads das etapas posteriores à consulta (insights, resumo e gráficos).
+
+    Como o executor de consultas, é um por sessão: as etapas de uma análise
+    não esperam as chamadas ao LLM de outras sessões. Cabem duas análises,
+    para que etapas de uma análise abandonada que ainda estejam terminando
+    não atrasem a próxima.
+    """
+    if "analysis_executor" not in st.session_state:
+        st.session_state.analysis_executor = ThreadPoolExecutor(
+            max_workers=2 * ANALYSIS_STAGES, thread_name_prefix="analysis")
+    return st.session_state.analysis_executor
+
+
+@st.cache_resource
+def get_session_store():
+    """Últimas respostas de todas as sessões, com limite de memória comum."""
+    return SessionStore(
+        budget_bytes=int(SESSION_MEMORY_BUDGET_MB * 1024 * 1024),
+        idle_seconds=SESSION_IDLE_SECONDS or None,
+        forget_seconds=SESSION_FORGET_SECONDS or None,
+        spill_dir=SESSION_SPILL_DIR or None)
+
+
+def session_key():
+    """Identificador desta sessão no armazenamento de respostas."""
+    if "session_key" not in st.session_state:
+        st.session_state.session_key = uuid.uuid4().hex
+    return st.session_state.session_key
+
+
+@st.cache_resource
+def start_metrics_export():
+    """Inicia a exportação das métricas uma vez por processo."""
+    if METRICS_PORT:
+        try:
+            start_metrics_server(METRICS_PORT, host=os.getenv("METRICS_HOST", "127.0.0.1"))
+        except OSError as e:
+            st.warning(f"⚠️ Métricas indisponíveis na porta {METRICS_PORT}: {e}")
+    if METRICS_FILE:
+        start_textfile_writer(METRICS_FILE)
+    return True
+
+
+start_metrics_export()
+
+
 if not db_ok:
     st.error(f"❌ **Problema no banco de dados**: {db_message}")
     st.stop()
@@ -522,7 +676,8 @@ else:
 # Inicialização do sistema
 try:
     if "db" not in st.session_state:
-        st.session_state.db = DatabaseManager(str(DB_PATH))
+        st.session_state.db = create_database_manager()
+    if not st.session_state.db.pool:
         if not st.session_state.db.connect():
             st.error("Falha ao conectar ao banco de dados")
             st.stop()
@@ -535,38 +690,49 @@ with st.sidebar:
     st.header("⚙️ Configurações")
 
     openai_key = os.getenv("OPENAI_API_KEY", "")
-    key_input = st.text_input(
-        "🔑 Chave OpenAI",
-        type="password",
-        value=openai_key,
-        help="Insira sua chave da OpenAI (sk-...)",
-        placeholder="sk-..."
-    )
-    openai_key = key_input or openai_key
-
-    if openai_key:
-        if openai_key.startswith('sk-') and len(openai_key) > 20:
-            st.success("✅ Chave válida")
-            api_configured = True
+    if ANALYSIS_API_URL:
+        service_ok, service_message = check_analysis_service(ANALYSIS_API_URL)
+        if service_ok:
+            st.success(f"🔗 Serviço de análise: {ANALYSIS_API_URL}")
+            st.caption(service_message)
         else:
-            st.error("❌ Chave inválida")
-            api_configured = False
+            st.error(f"❌ Serviço de análise indisponível: {service_message}")
+        api_configured = service_ok
     else:
-        st.warning("⚠️ Configure sua chave OpenAI")
-        api_configured = False
+        key_input = st.text_input(
+            "🔑 Chave OpenAI",
+            type="password",
+            value=openai_key,
+            help="Insira sua chave da OpenAI (sk-...)",
+            placeholder="sk-..."
+        )
+        openai_key = key_input or openai_key
+
+        if openai_key:
+            if openai_key.startswith('sk-') and len(openai_key) > 20:
+                st.success("✅ Chave válida")
+                api_configured = True
+            else:
+                st.error("❌ Chave inválida")
+                api_configured = False
+        else:
+            st.warning("⚠️ Configure sua chave OpenAI")
+            api_configured = False
 
     st.divider()
 
     # Informações do banco
     st.subheader("📊 Informações do Banco")
     try:
+        # Catálogo em cache: sem varrer as tabelas a cada interação
         schema = st.session_state.db.get_database_schema()
 
         if not schema:
             st.warning("⚠️ Nenhuma tabela encontrada")
         else:
             for table_name, table_info in schema.items():
-                with st.expander(f"📋 {table_name} ({table_info.get('count', 0):,} registros)"):
+                approx = "" if table_info.get('count_exact') else "~"
+                with st.expander(f"📋 {table_name} ({approx}{table_info.get('count', 0):,} registros)"):
                     st.markdown("**Colunas:**")
                     columns = table_info.get('columns', [])
                     types = table_info.get('types', [])
@@ -582,6 +748,23 @@ with st.sidebar:
                     else:
                         st.write("Nenhuma coluna encontrada")
 
+            if not all(info.get('count_exact') for info in schema.values()):
+                st.caption("~ contagem estimada pelos metadados do banco")
+                catalog = st.session_state.db.catalog
+                if catalog is not None and catalog.refreshing:
+                    st.caption("⏳ Contagem exata em andamento...")
+                elif st.button("🔢 Contagem exata", help="Conta as linhas de todas as tabelas em segundo plano"):
+                    st.session_state.db.refresh_row_counts(background=True)
+                    st.caption("⏳ Contagem exata iniciada; atualize a página em instantes.")
+
+        if st.button("🩺 Verificar integridade", help="Executa PRAGMA quick_check no banco"):
+            with st.spinner("Verificando integridade..."):
+                integrity = st.session_state.db.quick_check()
+            if integrity["ok"]:
+                st.success(f"✅ Integridade OK ({integrity['elapsed']:.2f}s)")
+            else:
+                st.error("❌ Problemas encontrados:\n\n" + "\n".join(integrity["messages"]))
+
     except Exception as e:
         st.error(f"Erro ao carregar schema: {e}")
         st.write("Tentando diagnóstico alternativo...")
@@ -635,8 +818,8 @@ with st.container():
 
     with col2:
         # Limite de registros para análise com base no total disponível
-        # Usa o total real do banco ou 10k, o menor
-        max_records = min(total_records, 10000)
+        # Usa o total real do banco ou MAX_RECORD_LIMIT, o menor
+        max_records = min(total_records, MAX_RECORD_LIMIT)
         # Padrão é 1000 ou o máximo disponível
         default_limit = min(1000, max_records)
 
@@ -735,65 +918,54 @@ def apply_table_sorting(df, sort_column, sort_order):
 def apply_record_limit(sql_query, limit):
     """Aplica limite de registros à query SQL"""
     if limit and limit > 0:
-        # Verifica se já tem LIMIT na query
-        if "LIMIT" not in sql_query.upper():
-            sql_query += f" LIMIT {limit}"
-        else:
-            # Substitui o LIMIT existente
-            import re
-            sql_query = re.sub(
-                r'LIMIT\s+\d+',
-                f'LIMIT {limit}',
-                sql_query,
-                flags=re.IGNORECASE)
+        # Substitui apenas o LIMIT da query externa, preservando subqueries/CTEs
+        sql_query = apply_limit(sql_query, limit)
 
     return sql_query
 
 
+@timed("generate_insights")
 def generate_agent_insights(
         data,
         user_query,
         agents_manager,
         record_limit,
-        total_available):
-    """Gera insights elaborados pelo agente baseado nos dados"""
+        total_available,
+        chunks=None,
+        on_token=None,
+        first_token_timeout=None,
+        stop=None):
+    """
+    Gera insights elaborados pelo agente baseado nos dados
+
+    As estatísticas são acumuladas bloco a bloco a partir de ``chunks``
+    (ex.: ``execute_query_iter``) quando informado; caso contrário, de ``data``.
+    Com ``on_token`` a resposta do LLM é transmitida trecho a trecho; se o
+    primeiro trecho não chegar em ``first_token_timeout`` segundos, os
+    insights básicos são usados. ``stop`` (``threading.Event``) encerra a
+    transmissão quando a análise é abandonada.
+    """
     if data.empty:
         return "Nenhum dado disponível para análise."
 
+    stats = ChunkedStats().consume(chunks if chunks is not None else data)
+
     # Preparar contexto dos dados para o agente
     data_context = {
-        "total_records": len(data),
+        "total_records": stats.rows,
         "total_available": total_available,
         "record_limit": record_limit,
-        "limited_analysis": len(data) >= record_limit and total_available > record_limit,
-        "columns": list(
-            data.columns),
-        "numeric_columns": list(
-            data.select_dtypes(
-                include=['number']).columns),
-        "categorical_columns": list(
-            data.select_dtypes(
-                include=['object']).columns),
+        "limited_analysis": stats.rows >= record_limit and total_available > record_limit,
+        "columns": stats.columns,
+        "numeric_columns": stats.numeric_columns,
+        "categorical_columns": stats.categorical_columns,
     }
 
     # Calcular estatísticas básicas se houver colunas numéricas
-    numeric_stats = {}
-    for col in data_context["numeric_columns"]:
-        numeric_stats[col] = {
-            "total": float(data[col].sum()),
-            "average": float(data[col].mean()),
-            "max": float(data[col].max()),
-            "min": float(data[col].min()),
-            "std": float(data[col].std()) if len(data) > 1 else 0
-        }
+    numeric_stats = stats.numeric_stats()
 
     # Top valores para colunas categóricas
-    categorical_insights = {}
-    for col in data_context["categorical_columns"]:
-        if col in data.columns:
-            top_values = data[col].value_counts().head(3).to_dict()
-            categorical_insights[col] = {
-                str(k): int(v) for k, v in top_values.items()}
+    categorical_insights = stats.top_values(3)
 
     # Construir prompt para o agente gerar insights
     limitation_note = ""
@@ -835,7 +1007,12 @@ def generate_agent_insights(
 
     try:
         # Usar o agente para gerar insights
-        insights_response = agents_manager.llm(insights_prompt)
+        if on_token is None:
+            insights_response = agents_manager.llm(insights_prompt)
+        else:
+            insights_response = "".join(agents_manager.stream_llm(
+                insights_prompt, on_token=on_token,
+                first_token_timeout=first_token_timeout, stop=stop))
         return insights_response.strip()
     except Exception as e:
         # Fallback para insights básicos se o agente falhar
@@ -845,7 +1022,8 @@ def generate_agent_insights(
             categorical_insights,
             data_context["limited_analysis"],
             record_limit,
-            total_available)
+            total_available,
+            stats.rows)
 
 
 def generate_basic_insights(
@@ -854,20 +1032,23 @@ def generate_basic_insights(
         categorical_insights,
         is_limited,
         record_limit,
-        total_available):
+        total_available,
+        analyzed_records=None):
     """Gera insights básicos como fallback"""
     insights = []
+    if analyzed_records is None:
+        analyzed_records = len(data)
 
     if is_limited:
         insights.append(
             f"Esta análise examinou {
-                len(data):,    } registros (amostra de {
-                total_available:,        } disponíveis) com {
+                analyzed_records:,} registros (amostra de {
+                total_available:,} disponíveis) com {
                 len(
                     data.columns)} variáveis.")
     else:
         insights.append(
-            f"Esta análise examinou {len(data):,} registros com {len(data.columns)} variáveis.")
+            f"Esta análise examinou {analyzed_records:,} registros com {len(data.columns)} variáveis.")
 
     if numeric_stats:
         main_numeric = list(numeric_stats.keys())[0]
@@ -897,7 +1078,7 @@ def generate_basic_insights(
             f"Em '{main_categorical}', '{
                 top_category[0]}' representa {
                 percentage:.1f}% dos casos ({
-                top_category[1]:,            } registros).")
+                top_category[1]:,} registros).")
 
     if is_limited:
         insights.append(
@@ -926,8 +1107,233 @@ def format_analysis_summary(agent_insights, data):
     return formatted_summary
 
 
-# Botão de análise
-if st.button("🚀 Analisar Dados", type="primary", disabled=not api_configured):
+def cancel_running_query():
+    """Interrompe a consulta em andamento desta sessão."""
+    if "db" in st.session_state:
+        st.session_state.db.cancel()
+    st.session_state.query_cancelled = True
+
+
+def run_cancellable_query(func, *args, **kwargs):
+    """
+    Executa uma consulta em outra thread enquanto a interface acompanha o tempo.
+
+    Se a execução do script for interrompida (ex.: clique em "Cancelar
+    consulta"), a query em andamento é interrompida no SQLite em vez de
+    continuar ocupando uma conexão.
+    """
+    # O contexto é copiado para os tempos da consulta irem para a análise atual
+    future = get_query_executor().submit(
+        contextvars.copy_context().run, func, *args, **kwargs)
+    status = st.empty()
+    start = time.perf_counter()
+    try:
+        while True:
+            try:
+                return future.result(timeout=0.25)
+            except FutureTimeoutError:
+                status.caption(
+                    f"⏳ Executando consulta... {time.perf_counter() - start:.1f}s")
+    finally:
+        status.empty()
+        # Ainda na fila: sai sem rodar; já em execução: interrompe o SQLite
+        if not future.cancel() and not future.done():
+            st.session_state.db.cancel()
+
+
+def join_analysis_stages(stages, on_ready, on_tick=None, stop=None):
+    """
+    Aguarda etapas submetidas ao executor, na ordem em que terminam.
+
+    ``on_ready(nome, resultado)`` é chamado assim que cada etapa fica
+    pronta, permitindo exibir resultados parciais. Se a execução do script
+    for interrompida, etapas ainda na fila são canceladas, ``stop`` é
+    sinalizado para encerrar o stream do LLM e consultas em andamento são
+    interrompidas no SQLite.
+
+    Args:
+        stages: Dict nome -> Future
+        on_ready: Função chamada com o nome e o resultado de cada etapa
+        on_tick: Função chamada a cada verificação (ex.: exibir trechos)
+        stop: ``threading.Event`` repassado às etapas que transmitem do LLM
+
+    Returns:
+        Dict nome -> resultado
+    """
+    pending = {future: name for name, future in stages.items()}
+    results = {}
+    status = st.empty()
+    start = time.perf_counter()
+    try:
+        while pending:
+            done, _ = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            if on_tick is not None:
+                on_tick()
+            for future in done:
+                name = pending.pop(future)
+                results[name] = future.result()
+                on_ready(name, results[name])
+            if pending:
+                status.caption(
+                    f"⏳ Aguardando {', '.join(pending.values())}... "
+                    f"{time.perf_counter() - start:.1f}s")
+    finally:
+        status.empty()
+        if pending:
+            for future in pending:
+                future.cancel()
+            if stop is not None:
+                stop.set()
+            st.session_state.db.cancel()
+    return results
+
+
+def render_timings(timings):
+    """Exibe os tempos por etapa da última análise (painel de depuração)."""
+    with st.expander("⏱️ Tempos por etapa (debug)"):
+        stages = pd.DataFrame(
+            [{"Etapa": name, "Tempo (s)": seconds}
+             for name, seconds in timings.get("stages", {}).items()])
+        st.caption(f"Tempo total: {timings.get('total', 0):.3f}s")
+        if not stages.empty:
+            st.dataframe(stages.sort_values("Tempo (s)", ascending=False),
+                         use_container_width=True, hide_index=True)
+        spans = timings.get("spans", [])
+        if spans:
+            st.write("**Linha do tempo:**")
+            st.dataframe(pd.DataFrame(spans), use_container_width=True,
+                         hide_index=True)
+        st.download_button(
+            "📥 Baixar tempos (JSON)",
+            data=json.dumps(timings, ensure_ascii=False, indent=2),
+            file_name="tempos_analise.json",
+            mime="application/json")
+
+
+def render_memory(memory, memory_bytes):
+    """Exibe o perfil de memória da última análise (painel de depuração)."""
+    mb = 1024 * 1024
+    with st.expander("🧠 Memória por etapa (debug)"):
+        st.caption(
+            f"Pico: {memory.get('peak', 0) / mb:.1f} MB | "
+            f"Retida: {memory.get('retained', 0) / mb:.1f} MB | "
+            f"Resposta guardada na sessão: {(memory_bytes or 0) / mb:.1f} MB")
+        stages = pd.DataFrame(
+            [{"Etapa": name, "Chamadas": entry["calls"],
+              "Pico (MB)": round(entry["peak"] / mb, 3),
+              "Retida (MB)": round(entry["retained"] / mb, 3)}
+             for name, entry in memory.get("stages", {}).items()])
+        if not stages.empty:
+            st.dataframe(stages.sort_values("Pico (MB)", ascending=False),
+                         use_container_width=True, hide_index=True)
+        sites = memory.get("top_sites", [])
+        if sites:
+            st.write("**Maiores alocações retidas:**")
+            st.dataframe(pd.DataFrame(sites), use_container_width=True,
+                         hide_index=True)
+        st.download_button(
+            "📥 Baixar perfil de memória (JSON)",
+            data=json.dumps(memory, ensure_ascii=False, indent=2),
+            file_name="memoria_analise.json",
+            mime="application/json")
+
+
+def render_evicted_response(compact):
+    """
+    Exibe o resumo de uma análise cujos dados saíram da memória e oferece
+    reexecutar a consulta (só o SQL; o resumo e os insights são mantidos).
+    """
+    st.info(
+        f"💤 Os dados desta análise ({compact.get('rows', 0):,} registros) "
+        "foram liberados da memória. O resumo continua disponível.")
+    st.markdown(format_analysis_summary(compact.get("summary", ""), None),
+                unsafe_allow_html=True)
+    rerun = compact.get("rerun")
+    if not rerun or not st.button("🔄 Recarregar dados", key="reload_response"):
+        return
+
+    try:
+        results, total_available = run_cancellable_query(
+            st.session_state.db.execute_query_with_total,
+            rerun["base_query"],
+            min(rerun["record_limit"], IN_MEMORY_ROWS))
+    except QueryCancelledError as e:
+        st.warning(f"⏹️ {e}")
+        return
+    if results is None:
+        st.error("❌ Não foi possível reexecutar a consulta.")
+        return
+
+    get_session_store().restore(
+        session_key(), results,
+        total_available=total_available,
+        analyzed_records=min(rerun["record_limit"], total_available),
+        is_limited=total_available > rerun["record_limit"])
+    # Nova execução para exibir a resposta completa no lugar do aviso
+    st.rerun()
+
+
+def clear_export(state_key):
+    """Descarta uma exportação preparada e seu arquivo temporário."""
+    discard_export(st.session_state.pop(state_key, None))
+
+
+def render_lazy_export(key, label, produce, help_text, signature):
+    """
+    Exportação sob demanda.
+
+    Nada é serializado até o clique em "Preparar"; o arquivo gerado é
+    oferecido para download e descartado após o download ou quando os
+    dados de origem (``signature``) mudam.
+    """
+    state_key = f"export_{key}"
+    export = st.session_state.get(state_key)
+    if export is not None and export["signature"] != signature:
+        clear_export(state_key)
+        export = None
+
+    if export is None:
+        if not st.button(f"⚙️ Preparar {label}", key=f"prepare_{key}",
+                         help=help_text):
+            return
+        try:
+            export = run_cancellable_query(produce)
+        except QueryCancelledError as e:
+            st.warning(f"⏹️ Exportação interrompida: {e}")
+            return
+        except Exception as e:
+            st.error(f"❌ Erro na exportação: {e}")
+            return
+        export["signature"] = signature
+        st.session_state[state_key] = export
+
+    size = export["bytes"]
+    size_text = (f"{size / 1024 / 1024:.1f} MB" if size >= 1024 * 1024
+                 else f"{size / 1024:.0f} KB")
+    with open(export["path"], "rb") as f:
+        st.download_button(
+            f"📥 Baixar {label} ({export['rows']:,} reg., {size_text})",
+            f,
+            file_name=export["file_name"],
+            mime=export["mime"],
+            key=f"download_{key}",
+            on_click=clear_export,
+            args=(state_key,))
+
+
+# Botões de análise e cancelamento
+col_run, col_cancel = st.columns([4, 1])
+with col_cancel:
+    st.button("⏹️ Cancelar consulta", on_click=cancel_running_query,
+              help="Interrompe a consulta SQL em execução")
+with col_run:
+    run_analysis = st.button(
+        "🚀 Analisar Dados", type="primary", disabled=not api_configured)
+
+if st.session_state.pop("query_cancelled", False):
+    st.warning("⏹️ Consulta cancelada.")
+
+if run_analysis:
     if not user_input.strip():
         st.warning("⚠️ Por favor, descreva sua análise!")
         st.stop()
@@ -935,23 +1341,36 @@ if st.button("🚀 Analisar Dados", type="primary", disabled=not api_configured)
     # Inicializar LLM e Agents
     try:
         if "llm" not in st.session_state or "agents" not in st.session_state:
-            with st.spinner("🔧 Inicializando IA..."):
-                st.session_state.llm = OpenAI(
-                    openai_api_key=openai_key,
-                    temperature=0.3,
-                    max_tokens=2000,
-                    model="gpt-3.5-turbo-instruct"
-                )
-                st.session_state.agents = AgentsManager(
-                    st.session_state.llm,
-                    st.session_state.db
-                )
+            if ANALYSIS_API_URL:
+                # LLM e caches ficam no serviço; resumo e gráficos, locais
+                st.session_state.llm = None
+                st.session_state.agents = AnalysisClient(
+                    ANALYSIS_API_URL,
+                    renderer=AgentsManager(None, st.session_state.db))
+            else:
+                with st.spinner("🔧 Inicializando IA..."):
+                    # LangChain é carregado apenas na primeira análise
+                    from langchain.llms import OpenAI
+
+                    st.session_state.llm = OpenAI(
+                        openai_api_key=openai_key,
+                        temperature=0.3,
+                        max_tokens=2000,
+                        model="gpt-3.5-turbo-instruct"
+                    )
+                    st.session_state.agents = AgentsManager(
+                        st.session_state.llm,
+                        st.session_state.db,
+                        llm_cache=get_llm_cache()
+                    )
     except Exception as e:
         st.error(f"❌ Erro ao inicializar IA: {e}")
         st.stop()
 
     # Processamento da análise
-    with st.spinner("🔄 Processando sua solicitação..."):
+    with st.spinner("🔄 Processando sua solicitação..."), \
+            collect_timings(label=user_input) as timings, \
+            profile_memory(label=user_input) as memory:
         try:
             processed_input = preprocess_user_query(user_input)
             interpretation = st.session_state.agents.interpret_request(
@@ -981,26 +1400,16 @@ if st.button("🚀 Analisar Dados", type="primary", disabled=not api_configured)
 
             sql_query = st.session_state.agents.generate_sql(interpretation)
 
-            # Obter total de registros disponíveis antes de aplicar o limite
-            count_query = f"SELECT COUNT(*) as total FROM ({
-                sql_query.split('LIMIT')[0].strip()}) as subquery"
-            try:
-                count_result = st.session_state.db.execute_query(count_query)
-                total_available = count_result.iloc[0]['total'] if count_result is not None and len(
-                    count_result) > 0 else 0
-            except BaseException:
-                # Fallback: executar query original sem LIMIT e contar
-                try:
-                    temp_query = sql_query.split('LIMIT')[0].strip()
-                    temp_result = st.session_state.db.execute_query(temp_query)
-                    total_available = len(
-                        temp_result) if temp_result is not None else 0
-                except BaseException:
-                    total_available = 0
-
             # Aplicar limite de registros à query
             limited_sql_query = apply_record_limit(sql_query, record_limit)
-            results = st.session_state.db.execute_query(limited_sql_query)
+
+            # Obter as primeiras linhas e o total disponível em uma única execução
+            base_query = strip_limit(sql_query)
+            # Acima de IN_MEMORY_ROWS só uma prévia fica em memória
+            results, total_available = run_cancellable_query(
+                st.session_state.db.execute_query_with_total,
+                base_query, min(record_limit, IN_MEMORY_ROWS))
+            analyzed_records = min(record_limit, total_available)
 
             if results is None or (
                 isinstance(
@@ -1036,27 +1445,111 @@ if st.button("🚀 Analisar Dados", type="primary", disabled=not api_configured)
 
                 st.stop()
 
-            # Gerar insights elaborados pelo agente
-            with st.spinner("🧠 Gerando insights inteligentes..."):
-                agent_insights = generate_agent_insights(
-                    results, user_input, st.session_state.agents, record_limit, total_available)
+            # Insights (LLM) e resposta formatada (resumo, tabela e gráficos)
+            # rodam em paralelo; a prévia é exibida à medida que ficam prontos
+            chunks = None
+            if analyzed_records > len(results):
+                chunks = st.session_state.db.execute_query_iter(
+                    limited_sql_query, chunksize=QUERY_CHUNKSIZE)
+            agents = st.session_state.agents
+            executor = get_analysis_executor()
+            # Trechos dos insights chegam da thread do LLM por esta fila
+            tokens = queue.Queue()
+            streamed = []
+            stop_stream = threading.Event()
+            stages = {
+                "gráficos": executor.submit(
+                    contextvars.copy_context().run,
+                    agents.format_complete_response,
+                    results, interpretation, user_input),
+                "insights": executor.submit(
+                    contextvars.copy_context().run,
+                    generate_agent_insights,
+                    results, user_input, agents, record_limit,
+                    total_available, chunks=chunks,
+                    on_token=tokens.put,
+                    first_token_timeout=LLM_FIRST_TOKEN_TIMEOUT,
+                    stop=stop_stream),
+            }
 
-            response = st.session_state.agents.format_complete_response(
-                results, interpretation, user_input
-            )
+            preview = st.empty()
+            with preview.container():
+                st.caption("📋 Prévia dos dados")
+                st.dataframe(results.head(100), use_container_width=True)
+                chart_slot = st.empty()
+                insights_slot = st.empty()
+            insights_slot.info("🧠 Gerando insights inteligentes...")
+
+            def show_stage(name, result):
+                if name == "gráficos" and result.get("plotly_fig") is not None:
+                    chart_slot.plotly_chart(
+                        result["plotly_fig"], use_container_width=True)
+                elif name == "insights":
+                    insights_slot.markdown(
+                        format_analysis_summary(result, results),
+                        unsafe_allow_html=True)
+
+            def show_tokens():
+                received = False
+                while not tokens.empty():
+                    streamed.append(tokens.get_nowait())
+                    received = True
+                if received:
+                    insights_slot.markdown(
+                        format_analysis_summary("".join(streamed) + "▌", results),
+                        unsafe_allow_html=True)
+
+            stage_results = join_analysis_stages(
+                stages, show_stage, on_tick=show_tokens, stop=stop_stream)
+            response = stage_results["gráficos"]
+            agent_insights = stage_results["insights"]
+            preview.empty()
 
             # Substituir o summary original pelos insights do agente
             response["summary"] = agent_insights
             response["total_available"] = total_available
             response["record_limit"] = record_limit
-            response["is_limited"] = len(
-                results) >= record_limit and total_available > record_limit
-
-            st.session_state.last_response = response
+            response["analyzed_records"] = analyzed_records
+            response["is_limited"] = total_available > record_limit
+            response["timings"] = timings.to_dict()
+            timings.log(sql_query=limited_sql_query,
+                        success=response["success"])
+            # Medida por format_complete_response; insights e metadados
+            # acrescentados aqui são só texto
+            if "memory_bytes" not in response:
+                response["memory_bytes"] = response_bytes(response)
+            if memory.enabled:
+                memory.stop()
+                response["memory"] = memory.to_dict()
+                memory.log(sql_query=limited_sql_query,
+                           memory_bytes=response["memory_bytes"])
+
+            get_session_store().put(session_key(), response, rerun={
+                "base_query": base_query,
+                "record_limit": record_limit,
+            })
             st.session_state.last_query = limited_sql_query
+            st.session_state.last_base_query = base_query
+            for export_key in ("export_displayed", "export_full"):
+                clear_export(export_key)
             st.session_state.interpretation = interpretation
             st.session_state.output_type = output_type
 
+        except ServiceBusyError as e:
+            st.warning(f"⏳ {e}")
+            st.stop()
+
+        except QueryCancelledError as e:
+            st.warning(f"⏹️ {e}")
+            with st.expander("Detalhes da interrupção"):
+                st.json(e.to_dict())
+                st.code(e.query or limited_sql_query, language="sql")
+            if e.reason != "cancelled":
+                st.info(
+                    "💡 Refine a pergunta com filtros ou agregações para "
+                    "reduzir o volume processado.")
+            st.stop()
+
         except Exception as e:
             st.error(f"❌ Erro no processamento: {str(e)}")
             st.subheader("🔍 Detalhes do Erro:")
@@ -1090,8 +1583,12 @@ if st.button("🚀 Analisar Dados", type="primary", disabled=not api_configured)
             st.stop()
 
 # Exibição dos resultados
-if 'last_response' in st.session_state:
-    response = st.session_state.last_response
+response = get_session_store().get(session_key())
+if response is not None and response.get("evicted"):
+    render_evicted_response(response)
+    response = None
+
+if response is not None:
     output_type = st.session_state.get('output_type', '📋 Tabela')
 
     if not response["success"]:
@@ -1133,12 +1630,18 @@ if 'last_response' in st.session_state:
         total_available = response.get(
             'total_available', len(
                 response['data']))
+        analyzed_records = response.get(
+            'analyzed_records', len(response['data']))
+        if analyzed_records > len(response['data']):
+            st.caption(
+                f"ℹ️ Tabela e gráficos usam as primeiras {len(response['data']):,} "
+                f"linhas; estatísticas e exportação consideram os "
+                f"{analyzed_records:,} registros analisados.")
         if response.get("is_limited", False):
             st.info(
                 f"📊 **{
-                    len(
-                        response['data']):,                           }** registros analisados de **{
-                    total_available:,                                                                                                            }** disponíveis | **{
+                    analyzed_records:,}** registros analisados de **{
+                    total_available:,}** disponíveis | **{
                     len(
                         response['data'].columns)}** colunas")
         else:
@@ -1155,9 +1658,8 @@ if 'last_response' in st.session_state:
                 if response.get("is_limited", False):
                     st.metric(
                         "📋 Registros Analisados", f"{
-                            len(
-                                response['data']):,                                 }", delta=f"de {
-                            total_available:,                                          } total")
+                            analyzed_records:,}", delta=f"de {
+                            total_available:,} total")
                 else:
                     st.metric(
                         "📋 Total de Registros", f"{
@@ -1270,17 +1772,17 @@ if 'last_response' in st.session_state:
             if sort_column != "Não ordenar":
                 order_text = "crescente" if "Crescente" in sort_order else "decrescente"
                 info_text = f"📊 Tabela ordenada por **{sort_column}** em ordem **{order_text}** | Exibindo **{
-                    len(display_df):,                }** de **{
+                    len(display_df):,}** de **{
                     len(
-                        response['data']):,                    }** registros"
+                        response['data']):,}** registros"
                 if response.get("is_limited", False):
                     info_text += f" (de {total_available:,} total no banco)"
                 st.info(info_text)
             else:
                 info_text = f"📊 Exibindo **{
-                    len(display_df):,                                            }** de **{
+                    len(display_df):,}** de **{
                     len(
-                        response['data']):,                                                                                                                   }** registros"
+                        response['data']):,}** registros"
                 if response.get("is_limited", False):
                     info_text += f" (de {total_available:,} total no banco)"
                 st.info(info_text)
@@ -1299,32 +1801,46 @@ if 'last_response' in st.session_state:
             col_download1, col_download2 = st.columns(2)
 
             with col_download1:
-                csv_displayed = display_df.to_csv(
-                    index=False, encoding='utf-8-sig')
-                st.download_button(
-                    "📥 Exportar Dados Exibidos",
-                    csv_displayed,
-                    file_name=f"analise_exibida_{
-                        datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                    help="Baixe apenas os dados exibidos na tabela (com ordenação aplicada)")
+                render_lazy_export(
+                    "displayed",
+                    "Dados Exibidos",
+                    lambda: export_to_file(
+                        display_df, "csv", name="analise_exibida"),
+                    help_text="Baixe apenas os dados exibidos na tabela (com ordenação aplicada)",
+                    signature=(st.session_state.last_query, sort_column,
+                               sort_order, display_limit))
 
             with col_download2:
-                csv_all = response["data"].to_csv(
-                    index=False, encoding='utf-8-sig')
-                download_text = "📥 Exportar Dados Analisados"
-                help_text = "Baixe todos os dados da consulta atual"
-                if response.get("is_limited", False):
-                    download_text += f" ({len(response['data']):,} reg.)"
-                    help_text += f" (limitado a {len(response['data']):,} registros)"
-
-                st.download_button(
-                    download_text,
-                    csv_all,
-                    file_name=f"analise_completa_{
-                        datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                    help=help_text)
+                export_scope = st.radio(
+                    "📦 Escopo da exportação:",
+                    options=["Dados analisados", "Consulta completa (sem limite)"],
+                    horizontal=True,
+                    key="export_scope_select")
+                export_format = st.selectbox(
+                    "📄 Formato:",
+                    options=list(available_formats()),
+                    key="export_format_select")
+
+                if export_scope == "Dados analisados":
+                    export_sql = st.session_state.last_query
+                    help_text = f"Baixe os {analyzed_records:,} registros analisados"
+                else:
+                    export_sql = st.session_state.get(
+                        "last_base_query", st.session_state.last_query)
+                    help_text = (f"Baixe todos os {total_available:,} registros "
+                                 f"da consulta, sem o limite de registros")
+
+                # O arquivo é gerado direto do cursor, apenas no clique
+                # (em outra thread, sem acesso ao st.session_state)
+                db = st.session_state.db
+                render_lazy_export(
+                    "full",
+                    "Dados da Consulta",
+                    lambda: export_query(
+                        db, export_sql, export_format,
+                        chunksize=QUERY_CHUNKSIZE, name="analise_completa"),
+                    help_text=help_text,
+                    signature=(export_sql, export_format))
 
         elif output_type == "📊 Gráfico":
             st.subheader("📊 Visualização Gráfica")
@@ -1341,7 +1857,7 @@ if 'last_response' in st.session_state:
                     if response.get("is_limited", False):
                         title_suffix = f" (amostra de {
                             len(
-                                response['data']):,                            } registros)"
+                                response['data']):,} registros)"
 
                     # Informação sobre o tipo de gráfico selecionado
                     st.info(
@@ -1446,6 +1962,11 @@ if 'last_response' in st.session_state:
                             st.write(
                                 f"  - {value}: {count:,} ({percentage:.1f}%)")
 
+        if response.get("timings"):
+            render_timings(response["timings"])
+        if response.get("memory"):
+            render_memory(response["memory"], response.get("memory_bytes"))
+
         st.markdown('</div>', unsafe_allow_html=True)
 
 # Rodapé
@@ -0,0 +1 @@
+"""Scripts de medição de desempenho do projeto."""
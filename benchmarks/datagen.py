@@ -0,0 +1,266 @@
+"""
+Gerador determinístico de bancos CRM sintéticos para benchmarks.
+
+Cria ``clientes``, ``compras``, ``suporte`` e ``campanhas_marketing`` com o
+mesmo schema do banco da aplicação. A escala é o número de linhas de
+``compras`` (a maior tabela); as demais são proporcionais. A mesma semente
+gera sempre o mesmo banco.
+
+Uso:
+    python -m benchmarks.datagen --scale 1m -o data/bench_1m.db
+"""
+import argparse
+import logging
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCALES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+
+# Linhas de cada tabela por linha de ``compras``
+TABLE_RATIOS = {"clientes": 0.25, "suporte": 0.2, "campanhas_marketing": 0.5}
+
+CHUNK_ROWS = 100_000
+START_DATE = np.datetime64("2023-01-01")
+DAYS = 730
+
+SCHEMA = """
+CREATE TABLE clientes (
+    id INTEGER PRIMARY KEY,
+    nome TEXT,
+    email TEXT,
+    idade INTEGER,
+    cidade TEXT,
+    estado TEXT,
+    profissao TEXT,
+    genero TEXT
+);
+CREATE TABLE compras (
+    id INTEGER PRIMARY KEY,
+    cliente_id INTEGER REFERENCES clientes(id),
+    data_compra TEXT,
+    valor REAL,
+    categoria TEXT,
+    canal TEXT
+);
+CREATE TABLE suporte (
+    id INTEGER PRIMARY KEY,
+    cliente_id INTEGER REFERENCES clientes(id),
+    data_contato TEXT,
+    tipo_contato TEXT,
+    resolvido BOOLEAN,
+    canal TEXT
+);
+CREATE TABLE campanhas_marketing (
+    id INTEGER PRIMARY KEY,
+    cliente_id INTEGER REFERENCES clientes(id),
+    nome_campanha TEXT,
+    data_envio TEXT,
+    interagiu BOOLEAN,
+    canal TEXT
+);
+CREATE INDEX idx_compras_cliente ON compras(cliente_id);
+CREATE INDEX idx_suporte_cliente ON suporte(cliente_id);
+CREATE INDEX idx_campanhas_cliente ON campanhas_marketing(cliente_id);
+"""
+
+CIDADES = {
+    "SP": ["São Paulo", "Campinas", "Santos", "Ribeirão Preto"],
+    "RJ": ["Rio de Janeiro", "Niterói", "Petrópolis"],
+    "MG": ["Belo Horizonte", "Uberlândia", "Juiz de Fora"],
+    "RS": ["Porto Alegre", "Caxias do Sul"],
+    "PR": ["Curitiba", "Londrina", "Maringá"],
+    "SC": ["Florianópolis", "Joinville"],
+    "BA": ["Salvador", "Feira de Santana"],
+    "PE": ["Recife", "Olinda"],
+    "CE": ["Fortaleza"],
+    "DF": ["Brasília"],
+    "GO": ["Goiânia"],
+    "AM": ["Manaus"],
+}
+# Distribuição aproximada da população por estado
+ESTADO_PESOS = [0.28, 0.14, 0.13, 0.07, 0.07, 0.05, 0.08, 0.05, 0.05,
+                0.03, 0.03, 0.02]
+PROFISSOES = ["Engenheiro", "Professor", "Médico", "Advogado", "Designer",
+              "Analista", "Vendedor", "Estudante", "Autônomo", "Aposentado"]
+GENEROS = ["Feminino", "Masculino", "Outro"]
+GENERO_PESOS = [0.51, 0.47, 0.02]
+CATEGORIAS = ["Eletrônicos", "Roupas", "Casa", "Livros", "Esportes",
+              "Beleza", "Alimentos", "Brinquedos"]
+CANAIS_COMPRA = ["online", "loja", "app", "telefone"]
+CANAL_COMPRA_PESOS = [0.45, 0.3, 0.2, 0.05]
+TIPOS_CONTATO = ["Reclamação", "Dúvida", "Troca", "Elogio", "Cancelamento"]
+CANAIS_SUPORTE = ["email", "chat", "telefone", "whatsapp"]
+CAMPANHAS = ["Black Friday", "Natal", "Dia das Mães", "Volta às Aulas",
+             "Aniversário", "Liquidação de Verão"]
+CANAIS_CAMPANHA = ["email", "sms", "push", "whatsapp"]
+
+
+def table_sizes(scale: Union[str, int]) -> Dict[str, int]:
+    """
+    Número de linhas de cada tabela para uma escala.
+
+    Args:
+        scale: "10k", "1m", "10m" ou o número de linhas de ``compras``
+
+    Returns:
+        Dict tabela -> linhas
+    """
+    rows = SCALES[scale.lower()] if isinstance(scale, str) else int(scale)
+    if rows < 1:
+        raise ValueError("A escala deve ter pelo menos uma linha")
+    sizes = {"compras": rows}
+    for table, ratio in TABLE_RATIOS.items():
+        sizes[table] = max(1, int(rows * ratio))
+    return sizes
+
+
+def _dates(rng: np.random.Generator, n: int) -> np.ndarray:
+    return (START_DATE + rng.integers(0, DAYS, n)).astype(str)
+
+
+def _choice(rng: np.random.Generator, values: List[str], n: int,
+            p: List[float] = None) -> np.ndarray:
+    return np.asarray(values, dtype=object)[rng.choice(len(values), n, p=p)]
+
+
+def _clientes(rng: np.random.Generator, start: int, n: int) -> Iterator[Tuple]:
+    ids = np.arange(start, start + n)
+    estados = rng.choice(len(CIDADES), n, p=ESTADO_PESOS)
+    siglas = list(CIDADES)
+    cidades = [CIDADES[siglas[e]][i % len(CIDADES[siglas[e]])]
+               for e, i in zip(estados, rng.integers(0, 1000, n))]
+    idades = rng.integers(18, 80, n)
+    profissoes = _choice(rng, PROFISSOES, n)
+    generos = _choice(rng, GENEROS, n, GENERO_PESOS)
+    for k in range(n):
+        cid = int(ids[k])
+        yield (cid, f"Cliente {cid}", f"cliente{cid}@exemplo.com",
+               int(idades[k]), cidades[k], siglas[estados[k]],
+               profissoes[k], generos[k])
+
+
+def _compras(rng: np.random.Generator, start: int, n: int,
+             clientes: int) -> Iterator[Tuple]:
+    cliente_ids = rng.integers(1, clientes + 1, n)
+    datas = _dates(rng, n)
+    valores = np.round(rng.lognormal(mean=5.0, sigma=0.8, size=n), 2)
+    categorias = _choice(rng, CATEGORIAS, n)
+    canais = _choice(rng, CANAIS_COMPRA, n, CANAL_COMPRA_PESOS)
+    return zip(range(start, start + n), cliente_ids.tolist(), datas.tolist(),
+               valores.tolist(), categorias, canais)
+
+
+def _suporte(rng: np.random.Generator, start: int, n: int,
+             clientes: int) -> Iterator[Tuple]:
+    return zip(range(start, start + n),
+               rng.integers(1, clientes + 1, n).tolist(),
+               _dates(rng, n).tolist(),
+               _choice(rng, TIPOS_CONTATO, n),
+               (rng.random(n) < 0.8).astype(int).tolist(),
+               _choice(rng, CANAIS_SUPORTE, n))
+
+
+def _campanhas(rng: np.random.Generator, start: int, n: int,
+               clientes: int) -> Iterator[Tuple]:
+    return zip(range(start, start + n),
+               rng.integers(1, clientes + 1, n).tolist(),
+               _choice(rng, CAMPANHAS, n),
+               _dates(rng, n).tolist(),
+               (rng.random(n) < 0.25).astype(int).tolist(),
+               _choice(rng, CANAIS_CAMPANHA, n))
+
+
+def generate_database(path: Union[str, Path], scale: Union[str, int] = "10k",
+                      seed: int = 42, force: bool = False) -> Dict[str, int]:
+    """
+    Gera o banco sintético.
+
+    O arquivo é montado ao lado do destino e renomeado no final, então um
+    banco interrompido no meio nunca é reaproveitado.
+
+    Args:
+        path: Arquivo SQLite de destino
+        scale: "10k", "1m", "10m" ou o número de linhas de ``compras``
+        seed: Semente do gerador
+        force: Recria o banco mesmo que ele já exista
+
+    Returns:
+        Dict tabela -> linhas geradas
+    """
+    path = Path(path)
+    sizes = table_sizes(scale)
+    if path.exists() and not force:
+        logger.info(f"Banco já existe, mantido: {path}")
+        return sizes
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    conn = sqlite3.connect(str(tmp))
+    try:
+        # Arquivo temporário: durabilidade não importa durante a carga
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(SCHEMA)
+
+        builders = {
+            "clientes": (_clientes, 8),
+            "compras": (_compras, 6),
+            "suporte": (_suporte, 6),
+            "campanhas_marketing": (_campanhas, 6),
+        }
+        for table in ("clientes", "compras", "suporte", "campanhas_marketing"):
+            build, columns = builders[table]
+            insert = (f"INSERT INTO {table} VALUES "
+                      f"({', '.join('?' * columns)})")
+            for offset in range(0, sizes[table], CHUNK_ROWS):
+                n = min(CHUNK_ROWS, sizes[table] - offset)
+                if table == "clientes":
+                    rows = build(rng, offset + 1, n)
+                else:
+                    rows = build(rng, offset + 1, n, sizes["clientes"])
+                conn.executemany(insert, rows)
+            conn.commit()
+            logger.info(f"{table}: {sizes[table]:,} linhas")
+
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+    os.replace(tmp, path)
+    logger.info(f"Banco gerado em {time.perf_counter() - start:.1f}s: {path}")
+    return sizes
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", default="10k",
+                        help="10k, 1m, 10m ou número de linhas de compras")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="Arquivo de destino (padrão: data/bench_<escala>.db)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--force", action="store_true",
+                        help="Recria o banco se já existir")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    scale = args.scale if args.scale.lower() in SCALES else int(args.scale)
+    output = args.output or Path("data") / f"bench_{str(args.scale).lower()}.db"
+    generate_database(output, scale, seed=args.seed, force=args.force)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
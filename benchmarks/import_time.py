@@ -0,0 +1,130 @@
+"""
+Orçamento de tempo de importação.
+
+Mede ``python -X importtime`` dos módulos principais em processos novos e
+falha (código de saída 1) se o tempo passar do orçamento ou se bibliotecas
+de visualização/LLM forem carregadas na importação.
+
+Uso:
+    python -m benchmarks.import_time [--budget-ms 1500] [--runs 3] [módulos...]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = ["src.agents", "src.utils", "src.database"]
+
+# Só devem ser importadas ao gerar gráficos ou chamar o LLM
+DEFERRED_PACKAGES = ["matplotlib", "seaborn", "plotly", "langchain",
+                     "langchain_community", "openai"]
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    Interpreta a saída de ``-X importtime``.
+
+    Args:
+        stderr: Saída de erro do processo
+
+    Returns:
+        Lista de dicts com module, self_us, cumulative_us e depth
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append({
+            "module": name.strip(),
+            "self_us": int(self_us),
+            "cumulative_us": int(cumulative_us),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+        })
+    return entries
+
+
+def measure(module: str, python: str = sys.executable) -> Dict[str, Any]:
+    """
+    Importa um módulo em um processo novo e mede o tempo.
+
+    Args:
+        module: Nome do módulo (ex.: "src.agents")
+        python: Interpretador usado
+
+    Returns:
+        Dict com total_ms, módulos mais lentos e pacotes adiados carregados
+    """
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps(sorted(sys.modules)))")
+    result = subprocess.run(
+        [python, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    if result.returncode != 0:
+        raise RuntimeError(
+            f"Falha ao importar {module}: {result.stderr.strip()[-500:]}")
+
+    entries = parse_importtime(result.stderr)
+    total_us = next((e["cumulative_us"] for e in entries
+                     if e["module"] == module), 0)
+    loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    deferred = sorted({name.split(".")[0] for name in loaded
+                       if name.split(".")[0] in DEFERRED_PACKAGES})
+    slowest = sorted(entries, key=lambda e: e["self_us"], reverse=True)[:10]
+
+    return {
+        "module": module,
+        "total_ms": total_us / 1000,
+        "deferred_loaded": deferred,
+        "slowest": [{"module": e["module"], "self_ms": e["self_us"] / 1000}
+                    for e in slowest],
+    }
+
+
+def run(modules: List[str], budget_ms: float, runs: int = 3) -> bool:
+    """
+    Mede cada módulo ``runs`` vezes (menor tempo) e compara com o orçamento.
+
+    Args:
+        modules: Módulos a medir
+        budget_ms: Tempo máximo de importação por módulo
+        runs: Repetições por módulo
+
+    Returns:
+        True se todos os módulos respeitaram o orçamento
+    """
+    ok = True
+    for module in modules:
+        best = min((measure(module) for _ in range(runs)),
+                   key=lambda r: r["total_ms"])
+        within = best["total_ms"] <= budget_ms and not best["deferred_loaded"]
+        ok = ok and within
+
+        status = "✅" if within else "❌"
+        print(f"{status} {module}: {best['total_ms']:.0f} ms "
+              f"(orçamento {budget_ms:.0f} ms)")
+        if best["deferred_loaded"]:
+            print(f"   carregados na importação: {', '.join(best['deferred_loaded'])}")
+        for entry in best["slowest"][:5]:
+            print(f"   {entry['self_ms']:8.1f} ms  {entry['module']}")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float,
+                        default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+    return 0 if run(args.modules, args.budget_ms, args.runs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
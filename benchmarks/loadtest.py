@@ -0,0 +1,438 @@
+"""
+Teste de carga com sessões de analistas simultâneas.
+
+Cada sessão é uma thread com o seu próprio AgentsManager (como uma sessão
+do Streamlit), ou um cliente do serviço HTTP (``--url``), fazendo perguntas
+sorteadas de um corpus JSONL com o MockLLM de latência log-normal. Para
+cada nível de concorrência são relatados latência p50/p95/p99, vazão,
+erros de "database is locked" e crescimento do RSS.
+
+Uso:
+    python -m benchmarks.loadtest --sessions 1 4 16 32 --duration 30
+    python -m benchmarks.loadtest --url http://127.0.0.1:8765 --sessions 8 32
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Gráficos sem janela, antes de qualquer importação do pyplot
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from src.agents import AgentsManager
+from src.database import DatabaseManager
+from src.server import AnalysisClient, ServiceBusyError
+
+from .datagen import generate_database
+from .mock_llm import MockLLM
+from .scenarios import PROJECT_ROOT, QUESTIONS
+
+LOCKED = "database is locked"
+
+# Uma sessão é uma função pergunta -> resposta e outra que a encerra
+Session = Tuple[Callable[[str], Dict[str, Any]], Callable[[], None]]
+
+
+def load_corpus(path: Optional[Path]) -> List[Tuple[str, float]]:
+    """
+    Lê o corpus de perguntas.
+
+    Cada linha é um objeto JSON com ``question`` e, opcionalmente,
+    ``weight`` (frequência relativa, padrão 1).
+
+    Args:
+        path: Arquivo JSONL (None usa as perguntas de benchmarks.scenarios)
+
+    Returns:
+        Lista de (pergunta, peso)
+    """
+    if path is None:
+        return [(question, 1.0) for question in QUESTIONS]
+    corpus = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not item.get("question"):
+                raise ValueError(f"Linha {number} sem 'question'")
+            corpus.append((item["question"], float(item.get("weight", 1.0))))
+    if not corpus:
+        raise ValueError(f"Corpus vazio: {path}")
+    return corpus
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil ``q`` (0-100) por interpolação linear."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def rss_bytes() -> int:
+    """Memória residente atual do processo."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Sem /proc (ex.: macOS) resta o pico, em bytes no macOS e KiB no Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Amostra o RSS do processo em uma thread de fundo."""
+
+    def __init__(self, interval: float = 0.25):
+        self.interval = interval
+        self.samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler",
+                                        daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.samples.append(rss_bytes())
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(rss_bytes())
+
+    def report(self) -> Dict[str, float]:
+        mb = 1024 * 1024
+        return {
+            "rss_start_mb": self.samples[0] / mb,
+            "rss_peak_mb": max(self.samples) / mb,
+            "rss_end_mb": self.samples[-1] / mb,
+            "rss_growth_mb": (self.samples[-1] - self.samples[0]) / mb,
+        }
+
+
+class LockErrorCounter(logging.Handler):
+    """Conta logs de "database is locked" (os gerenciadores os registram e seguem)."""
+
+    def __init__(self):
+        super().__init__(level=logging.WARNING)
+        self.count = 0
+        self._lock_count = threading.Lock()
+
+    def emit(self, record: logging.LogRecord):
+        if LOCKED in record.getMessage():
+            with self._lock_count:
+                self.count += 1
+
+
+def writer_loop(db_path: Path, stop: threading.Event, interval: float,
+                busy_timeout: float, stats: Counter):
+    """
+    Insere compras continuamente, disputando o lock de escrita do SQLite.
+
+    Args:
+        db_path: Banco alvo (as linhas inseridas permanecem nele)
+        stop: Sinal de parada
+        interval: Pausa entre transações (segundos)
+        busy_timeout: Espera pelo lock antes do erro (segundos)
+        stats: Contadores compartilhados (writes, write_locked)
+    """
+    conn = sqlite3.connect(str(db_path), timeout=busy_timeout)
+    try:
+        while not stop.is_set():
+            try:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO compras (cliente_id, data_compra, valor, categoria, canal) "
+                        "VALUES (1, date('now'), 99.9, 'Casa', 'online')")
+                stats["writes"] += 1
+            except sqlite3.OperationalError as e:
+                if LOCKED in str(e):
+                    stats["write_locked"] += 1
+                else:
+                    raise
+            stop.wait(interval)
+    finally:
+        conn.close()
+
+
+def run_level(sessions: List[Session], corpus: List[Tuple[str, float]],
+              duration: Optional[float] = 30.0,
+              requests_per_session: Optional[int] = None,
+              think_time: float = 0.0, seed: int = 0) -> Dict[str, Any]:
+    """
+    Executa um nível de concorrência: uma thread por sessão.
+
+    Args:
+        sessions: Sessões já abertas
+        corpus: Perguntas e pesos
+        duration: Duração do nível (segundos), se ``requests_per_session`` for None
+        requests_per_session: Número fixo de perguntas por sessão
+        think_time: Pausa média entre perguntas (exponencial, segundos)
+        seed: Semente do sorteio das perguntas
+
+    Returns:
+        Dict com latências, vazão, falhas e erros por tipo
+    """
+    questions = [question for question, _ in corpus]
+    weights = [weight for _, weight in corpus]
+    latencies: List[float] = []
+    outcomes = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+    deadline = None if requests_per_session else time.monotonic() + duration
+    barrier = threading.Barrier(len(sessions))
+
+    def session_loop(index: int, ask: Callable[[str], Dict[str, Any]]):
+        rng = random.Random(seed * 100003 + index)
+        barrier.wait()
+        done = 0
+        while True:
+            if requests_per_session is not None and done >= requests_per_session:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            question = rng.choices(questions, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = ask(question)
+                outcome = "ok" if response.get("success") else "failed"
+                error = response.get("error")
+            except ServiceBusyError:
+                outcome, error = "rejected", "ServiceBusyError"
+            except Exception as e:
+                outcome, error = "error", f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                outcomes[outcome] += 1
+                if error:
+                    errors[str(error)[:120]] += 1
+            done += 1
+            if think_time > 0:
+                time.sleep(rng.expovariate(1 / think_time))
+
+    threads = [threading.Thread(target=session_loop, args=(i, ask),
+                                name=f"session-{i}")
+               for i, (ask, _) in enumerate(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "sessions": len(sessions),
+        "elapsed": elapsed,
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "latency": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+            "max": max(latencies, default=0.0),
+        },
+        "errors": dict(errors.most_common(10)),
+    }
+
+
+def inprocess_factory(db_path: Path, shared_db: bool, result_cache: bool,
+                      llm_latency: float, llm_sigma: float,
+                      seed: int) -> Callable[[int], Session]:
+    """
+    Sessões locais: um AgentsManager por sessão, como no app.
+
+    Args:
+        db_path: Banco SQLite
+        shared_db: Um DatabaseManager para todas as sessões (padrão do app:
+            um por sessão)
+        result_cache: Mantém o cache de resultados de cada gerenciador
+        llm_latency: Latência mediana do MockLLM (segundos)
+        llm_sigma: Dispersão log-normal da latência
+        seed: Semente base das latências
+    """
+    shared = DatabaseManager(str(db_path), cache_results=result_cache) if shared_db else None
+
+    def make(index: int) -> Session:
+        database = shared or DatabaseManager(str(db_path), cache_results=result_cache)
+        llm = MockLLM(latency=llm_latency, sigma=llm_sigma, seed=seed + index)
+        agents = AgentsManager(llm, database_manager=database)
+        close = (lambda: None) if shared else database.disconnect
+        return agents.execute_analysis, close
+
+    return make
+
+
+def http_factory(url: str) -> Callable[[int], Session]:
+    """Sessões remotas: um AnalysisClient por sessão (rota /analyze)."""
+    def make(index: int) -> Session:
+        client = AnalysisClient(url)
+        return client.analyze, lambda: None
+    return make
+
+
+def run(levels: List[int], make_session: Callable[[int], Session],
+        corpus: List[Tuple[str, float]], duration: Optional[float],
+        requests_per_session: Optional[int], think_time: float, seed: int,
+        db_path: Optional[Path] = None, writers: int = 0,
+        write_interval: float = 0.05, busy_timeout: float = 5.0) -> List[Dict[str, Any]]:
+    """
+    Executa os níveis de concorrência em sequência.
+
+    Returns:
+        Relatório de cada nível
+    """
+    lock_counter = LockErrorCounter()
+    logging.getLogger().addHandler(lock_counter)
+    reports = []
+    try:
+        for level in levels:
+            sessions = [make_session(i) for i in range(level)]
+            write_stats = Counter()
+            stop = threading.Event()
+            writer_threads = [
+                threading.Thread(target=writer_loop, name=f"writer-{i}", daemon=True,
+                                 args=(db_path, stop, write_interval, busy_timeout,
+                                       write_stats))
+                for i in range(writers if db_path is not None else 0)]
+            locked_before = lock_counter.count
+            try:
+                with RSSSampler() as sampler:
+                    for thread in writer_threads:
+                        thread.start()
+                    report = run_level(sessions, corpus, duration,
+                                       requests_per_session, think_time, seed)
+                    stop.set()
+                    for thread in writer_threads:
+                        thread.join()
+            finally:
+                for _, close in sessions:
+                    close()
+            report.update(sampler.report())
+            report["lock_errors"] = lock_counter.count - locked_before
+            report["writes"] = write_stats["writes"]
+            report["write_lock_errors"] = write_stats["write_locked"]
+            reports.append(report)
+            print(_format_row(report), flush=True)
+    finally:
+        logging.getLogger().removeHandler(lock_counter)
+    return reports
+
+
+def _format_row(report: Dict[str, Any]) -> str:
+    latency = report["latency"]
+    failures = report["requests"] - report["outcomes"].get("ok", 0)
+    return (f"{report['sessions']:>8d} {report['requests']:>8d} "
+            f"{report['throughput_rps']:>8.2f} {latency['p50'] * 1000:>8.0f} "
+            f"{latency['p95'] * 1000:>8.0f} {latency['p99'] * 1000:>8.0f} "
+            f"{failures:>7d} {report['lock_errors'] + report['write_lock_errors']:>6d} "
+            f"{report['rss_peak_mb']:>8.0f} {report['rss_growth_mb']:>+8.1f}")
+
+
+HEADER = (f"{'sessões':>8s} {'reqs':>8s} {'req/s':>8s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s} {'p99 ms':>8s} {'falhas':>7s} {'locks':>6s} "
+          f"{'RSS MB':>8s} {'ΔRSS MB':>8s}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16],
+                        help="Níveis de concorrência, executados em sequência")
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="Duração de cada nível (segundos)")
+    parser.add_argument("--requests", type=int,
+                        help="Perguntas por sessão (substitui --duration)")
+    parser.add_argument("--corpus", type=Path, help="JSONL com question e weight")
+    parser.add_argument("--url", help="Testa o serviço HTTP em vez de sessões locais")
+    parser.add_argument("--db", type=Path,
+                        help="Banco (padrão: data/bench_<escala>.db, gerado se faltar)")
+    parser.add_argument("--scale", default="10k")
+    parser.add_argument("--shared-db", action="store_true",
+                        help="Um DatabaseManager para todas as sessões")
+    parser.add_argument("--no-result-cache", action="store_true",
+                        help="Desliga o cache de resultados (toda pergunta vai ao SQLite)")
+    parser.add_argument("--llm-latency", type=float, default=0.8,
+                        help="Latência mediana de cada chamada ao LLM (segundos)")
+    parser.add_argument("--llm-sigma", type=float, default=0.5,
+                        help="Dispersão log-normal da latência do LLM")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="Pausa média do analista entre perguntas (segundos)")
+    parser.add_argument("--writers", type=int, default=0,
+                        help="Threads inserindo em compras durante o teste")
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    parser.add_argument("--busy-timeout", type=float, default=5.0,
+                        help="Espera dos escritores pelo lock (segundos)")
+    parser.add_argument("--slo-p95", type=float,
+                        help="p95 máximo aceitável (segundos) para o resumo final")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, help="Relatório JSON")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    # src.database já configura o logging em INFO ao ser importado
+    logging.getLogger().setLevel(logging.ERROR)
+    corpus = load_corpus(args.corpus)
+
+    db_path = None
+    if args.url:
+        make_session = http_factory(args.url)
+    else:
+        scale = args.scale.lower() if args.scale.lower() in ("10k", "1m", "10m") else int(args.scale)
+        db_path = args.db or PROJECT_ROOT / "data" / f"bench_{scale}.db"
+        if not db_path.exists():
+            print(f"Gerando banco sintético ({scale}) em {db_path}...")
+            generate_database(db_path, scale, seed=42)
+        make_session = inprocess_factory(
+            db_path, args.shared_db, not args.no_result_cache,
+            args.llm_latency, args.llm_sigma, args.seed)
+
+    print(HEADER)
+    reports = run(args.sessions, make_session, corpus,
+                  None if args.requests else args.duration, args.requests,
+                  args.think_time, args.seed, db_path=db_path,
+                  writers=args.writers, write_interval=args.write_interval,
+                  busy_timeout=args.busy_timeout)
+
+    supported = None
+    if args.slo_p95 is not None:
+        within = [r["sessions"] for r in reports
+                  if r["latency"]["p95"] <= args.slo_p95
+                  and r["outcomes"].get("ok", 0) == r["requests"]]
+        supported = max(within, default=0)
+        print(f"\nMaior nível dentro do SLO (p95 ≤ {args.slo_p95:.1f}s, sem falhas): "
+              f"{supported} sessões")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({
+            "config": {key: str(value) if isinstance(value, Path) else value
+                       for key, value in vars(args).items()},
+            "levels": reports,
+            "supported_sessions": supported,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Relatório em {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+LLM determinístico para benchmarks e testes de carga.
+
+Responde aos prompts do AgentsManager sem rede: a interpretação é escolhida
+por palavras-chave da pergunta, o SQL vem da interpretação e os insights
+são um texto fixo. A latência é configurável (fixa ou log-normal, com
+semente) para simular um provedor real.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# (palavras-chave, interpretação, SQL); a primeira que casar é usada
+CANNED: List[Tuple[Tuple[str, ...], Dict[str, Any], str]] = [
+    (("estado", "uf"),
+     {"intencao": "valor total de compras por estado", "tipo_analise": "ranking",
+      "tabelas": ["clientes", "compras"], "metricas": ["SUM(valor)"],
+      "dimensoes": ["estado"], "tipo_grafico": "barras"},
+     "SELECT c.estado, SUM(p.valor) AS valor_total, COUNT(*) AS total_compras "
+     "FROM clientes c INNER JOIN compras p ON p.cliente_id = c.id "
+     "GROUP BY c.estado ORDER BY valor_total DESC"),
+    (("categoria",),
+     {"intencao": "valor total por categoria de produto", "tipo_analise": "ranking",
+      "tabelas": ["compras"], "metricas": ["SUM(valor)"],
+      "dimensoes": ["categoria"], "tipo_grafico": "barras"},
+     "SELECT categoria, SUM(valor) AS valor_total, COUNT(*) AS total_compras "
+     "FROM compras GROUP BY categoria ORDER BY valor_total DESC"),
+    (("mês", "mes", "mensal", "tendência", "tendencia", "evolução"),
+     {"intencao": "evolução mensal do valor de compras", "tipo_analise": "tendencia",
+      "tabelas": ["compras"], "metricas": ["SUM(valor)"],
+      "dimensoes": ["mes"], "tipo_grafico": "linha"},
+     "SELECT strftime('%Y-%m', data_compra) AS mes, SUM(valor) AS valor_total "
+     "FROM compras GROUP BY mes ORDER BY mes"),
+    (("canal",),
+     {"intencao": "distribuição das compras por canal", "tipo_analise": "distribuicao",
+      "tabelas": ["compras"], "metricas": ["COUNT(*)"],
+      "dimensoes": ["canal"], "tipo_grafico": "pizza"},
+     "SELECT canal, COUNT(*) AS total_compras, SUM(valor) AS valor_total "
+     "FROM compras GROUP BY canal ORDER BY total_compras DESC"),
+    (("suporte", "resolvid", "atendimento"),
+     {"intencao": "taxa de resolução do suporte por tipo de contato",
+      "tipo_analise": "comparacao", "tabelas": ["suporte"],
+      "metricas": ["AVG(resolvido)"], "dimensoes": ["tipo_contato"],
+      "tipo_grafico": "barras"},
+     "SELECT tipo_contato, COUNT(*) AS total_contatos, "
+     "ROUND(AVG(resolvido) * 100, 1) AS taxa_resolucao "
+     "FROM suporte GROUP BY tipo_contato ORDER BY total_contatos DESC"),
+    (("campanha", "marketing"),
+     {"intencao": "taxa de interação por campanha", "tipo_analise": "comparacao",
+      "tabelas": ["campanhas_marketing"], "metricas": ["AVG(interagiu)"],
+      "dimensoes": ["nome_campanha"], "tipo_grafico": "barras"},
+     "SELECT nome_campanha, COUNT(*) AS envios, "
+     "ROUND(AVG(interagiu) * 100, 1) AS taxa_interacao "
+     "FROM campanhas_marketing GROUP BY nome_campanha ORDER BY taxa_interacao DESC"),
+    (("idade", "faixa"),
+     {"intencao": "valor médio de compra por faixa etária", "tipo_analise": "distribuicao",
+      "tabelas": ["clientes", "compras"], "metricas": ["AVG(valor)"],
+      "dimensoes": ["faixa_etaria"], "tipo_grafico": "barras"},
+     "SELECT (c.idade / 10) * 10 AS faixa_etaria, AVG(p.valor) AS valor_medio, "
+     "COUNT(*) AS total_compras FROM clientes c "
+     "INNER JOIN compras p ON p.cliente_id = c.id "
+     "GROUP BY faixa_etaria ORDER BY faixa_etaria"),
+    ((),
+     {"intencao": "top clientes por valor de compras", "tipo_analise": "ranking",
+      "tabelas": ["clientes", "compras"], "metricas": ["SUM(valor)"],
+      "dimensoes": ["nome"], "tipo_grafico": "barras"},
+     "SELECT c.nome, c.estado, SUM(p.valor) AS valor_total "
+     "FROM clientes c INNER JOIN compras p ON p.cliente_id = c.id "
+     "GROUP BY c.id ORDER BY valor_total DESC LIMIT 10"),
+]
+
+INSIGHTS_TEXT = (
+    "📊 **Principais insights**\n\n"
+    "- Os resultados concentram-se nos primeiros grupos do ranking.\n"
+    "- A diferença entre o maior e o menor valor indica oportunidades "
+    "de segmentação.\n"
+    "- Recomenda-se acompanhar a evolução mensal desses indicadores."
+)
+
+_QUESTION = re.compile(r'Solicitação(?: do Usuário)?:\s*"(.*?)"\s*$',
+                       re.MULTILINE | re.DOTALL)
+
+
+class MockLLM:
+    """
+    LLM falso com respostas fixas e latência configurável.
+
+    Compatível com o que o AgentsManager usa de um LLM do LangChain:
+    chamada direta, ``stream`` e ``ainvoke``.
+    """
+
+    def __init__(self, latency: float = 0.0, sigma: float = 0.0,
+                 token_delay: float = 0.0, seed: int = 0):
+        """
+        Args:
+            latency: Latência mediana de cada chamada (segundos)
+            sigma: Dispersão log-normal da latência (0 = sempre ``latency``)
+            token_delay: Intervalo entre trechos no ``stream`` (segundos)
+            seed: Semente do sorteio das latências
+        """
+        self.latency = latency
+        self.sigma = sigma
+        self.token_delay = token_delay
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = Counter()
+
+    def _delay(self) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.sigma <= 0:
+            return self.latency
+        with self._lock:
+            return self.latency * self._rng.lognormvariate(0.0, self.sigma)
+
+    @staticmethod
+    def classify(prompt: str) -> str:
+        """Tipo do prompt: "insights", "sql" ou "interpretation"."""
+        if "(JSON)" in prompt:
+            return "insights"
+        if "Gere uma query SQL" in prompt or "especialista em SQLite" in prompt:
+            return "sql"
+        return "interpretation"
+
+    @staticmethod
+    def match(text: str) -> Tuple[Dict[str, Any], str]:
+        """Interpretação e SQL fixos para uma pergunta ou prompt de SQL."""
+        lowered = text.lower()
+        for keywords, interpretation, sql in CANNED:
+            if not keywords or any(word in lowered for word in keywords):
+                return interpretation, sql
+        return CANNED[-1][1], CANNED[-1][2]
+
+    def respond(self, prompt: str) -> str:
+        """Resposta determinística para o prompt, sem latência."""
+        prompt = str(prompt)
+        kind = self.classify(prompt)
+        with self._lock:
+            self.calls[kind] += 1
+
+        if kind == "insights":
+            return INSIGHTS_TEXT
+        if kind == "sql":
+            # O prompt de SQL traz a interpretação, cuja intenção é única
+            for _, interpretation, sql in CANNED:
+                intencao = interpretation["intencao"]
+                if intencao in prompt or json.dumps(intencao)[1:-1] in prompt:
+                    return sql
+            return CANNED[-1][2]
+
+        found = _QUESTION.search(prompt)
+        interpretation, _ = self.match(found.group(1) if found else prompt)
+        return json.dumps({**interpretation, "filtros": [], "limite": 10,
+                           "formato_saida": "completo"}, ensure_ascii=False)
+
+    def __call__(self, prompt: str) -> str:
+        time.sleep(self._delay())
+        return self.respond(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        time.sleep(self._delay())
+        words = self.respond(prompt).split(" ")
+        for i, word in enumerate(words):
+            if i and self.token_delay:
+                time.sleep(self.token_delay)
+            yield word if i == len(words) - 1 else word + " "
+
+    async def ainvoke(self, prompt: str) -> str:
+        await asyncio.sleep(self._delay())
+        return self.respond(prompt)
+
+
+def make(latency: Optional[float] = None) -> MockLLM:
+    """
+    Fábrica para ``--llm benchmarks.mock_llm:make`` (src.batch, src.server).
+
+    A latência vem de ``MOCK_LLM_LATENCY``/``MOCK_LLM_SIGMA`` se não for
+    informada.
+    """
+    if latency is None:
+        latency = float(os.getenv("MOCK_LLM_LATENCY", "0"))
+    return MockLLM(latency=latency, sigma=float(os.getenv("MOCK_LLM_SIGMA", "0")),
+                   seed=int(os.getenv("MOCK_LLM_SEED", "0")))
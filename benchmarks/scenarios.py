@@ -0,0 +1,283 @@
+"""
+Cenários cronometrados do pipeline de análise.
+
+Gera (ou reaproveita) um banco sintético, usa o MockLLM determinístico e
+mede carga do schema, ``execute_analysis`` completo, resumo, tabela HTML e
+gráficos. O resultado vai para um JSON que pode ser comparado com o de
+outro commit (``--compare``).
+
+Uso:
+    python -m benchmarks.scenarios --scale 10k --repeat 5
+    python -m benchmarks.scenarios --scale 1m --compare benchmarks/results/1m-abc1234.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Gráficos sem janela, antes de qualquer importação do pyplot
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from src.agents import AgentsManager, DatabaseManager
+
+from .datagen import generate_database, table_sizes
+from .mock_llm import MockLLM
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = PROJECT_ROOT / "benchmarks" / "results"
+
+QUESTIONS = [
+    "Qual o valor total de compras por estado?",
+    "Valor vendido por categoria de produto",
+    "Evolução mensal do valor de compras",
+    "Distribuição das compras por canal",
+    "Taxa de resolução do suporte por tipo de contato",
+    "Qual campanha de marketing teve mais interação?",
+    "Valor médio de compra por faixa de idade",
+    "Top 10 clientes que mais compraram",
+]
+
+SCENARIOS = ["schema_cold", "schema_warm", "execute_analysis",
+             "summary", "table_html", "charts"]
+
+
+def time_call(func: Callable[[], Any], repeat: int = 5,
+              warmup: int = 1) -> List[float]:
+    """
+    Mede ``func`` várias vezes.
+
+    Args:
+        func: Função sem argumentos
+        repeat: Execuções medidas
+        warmup: Execuções descartadas antes das medidas
+
+    Returns:
+        Durações em segundos
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    """Estatísticas de uma série de durações (segundos)."""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "runs": len(samples),
+        "min": ordered[0],
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "p95": p95,
+        "max": ordered[-1],
+        "stdev": statistics.stdev(ordered) if len(ordered) > 1 else 0.0,
+    }
+
+
+def _close_figures():
+    import matplotlib.pyplot as plt
+    plt.close("all")
+
+
+def _git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+            capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def run_scenarios(db_path: Path, scenarios: List[str], repeat: int = 5,
+                  warmup: int = 1, llm: Optional[MockLLM] = None,
+                  questions: List[str] = QUESTIONS) -> Dict[str, Any]:
+    """
+    Executa os cenários contra um banco.
+
+    O cache de resultados fica desligado para que cada execução chegue ao
+    SQLite; o cache semântico do LLM não é usado.
+
+    Args:
+        db_path: Banco gerado por ``benchmarks.datagen``
+        scenarios: Cenários a executar (ver ``SCENARIOS``)
+        repeat: Execuções medidas por cenário
+        warmup: Execuções descartadas
+        llm: LLM usado (padrão: MockLLM sem latência)
+        questions: Perguntas de ``execute_analysis``
+
+    Returns:
+        Dict cenário -> estatísticas
+    """
+    llm = llm or MockLLM()
+    database = DatabaseManager(str(db_path), cache_results=False)
+    agents = AgentsManager(llm, database_manager=database)
+    results = {}
+
+    try:
+        if "schema_cold" in scenarios:
+            def load_cold():
+                fresh = DatabaseManager(str(db_path), cache_results=False)
+                try:
+                    fresh.get_schema()
+                finally:
+                    fresh.close()
+            results["schema_cold"] = summarize(time_call(load_cold, repeat, warmup))
+
+        if "schema_warm" in scenarios:
+            results["schema_warm"] = summarize(
+                time_call(database.get_schema, repeat, warmup))
+
+        if "execute_analysis" in scenarios:
+            stages: Dict[str, List[float]] = {}
+
+            def analyze_all():
+                for question in questions:
+                    response = agents.execute_analysis(question)
+                    if not response["success"]:
+                        raise RuntimeError(
+                            f"Análise falhou: {question}: {response.get('error')}")
+                    for stage, seconds in response["timings"]["stages"].items():
+                        stages.setdefault(stage, []).append(seconds)
+                _close_figures()
+
+            stats = summarize(time_call(analyze_all, repeat, warmup))
+            stats["questions"] = len(questions)
+            # Medianas por etapa, por pergunta (inclui o aquecimento)
+            stats["stages"] = {stage: statistics.median(values)
+                               for stage, values in sorted(stages.items())}
+            results["execute_analysis"] = stats
+
+        inputs = []
+        if {"summary", "table_html", "charts"} & set(scenarios):
+            for question in questions:
+                interpretation = agents.interpret_request(question)
+                df = database.execute_query(agents.generate_sql(interpretation))
+                inputs.append((df, interpretation))
+
+        if "summary" in scenarios:
+            results["summary"] = summarize(time_call(
+                lambda: [agents.generate_summary(df, i) for df, i in inputs],
+                repeat, warmup))
+
+        if "table_html" in scenarios:
+            results["table_html"] = summarize(time_call(
+                lambda: [agents._format_table_html(df) for df, _ in inputs],
+                repeat, warmup))
+
+        if "charts" in scenarios:
+            def draw_all():
+                for df, interpretation in inputs:
+                    agents.create_visualizations(df, interpretation)
+                _close_figures()
+            results["charts"] = summarize(time_call(draw_all, repeat, warmup))
+
+    finally:
+        database.close()
+
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Razão entre as medianas atuais e as da referência, por cenário.
+
+    Returns:
+        Dict cenário -> atual / referência (> 1 é mais lento)
+    """
+    ratios = {}
+    for name, stats in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if before and before["median"] > 0:
+            ratios[name] = stats["median"] / before["median"]
+    return ratios
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", default="10k",
+                        help="10k, 1m, 10m ou número de linhas de compras")
+    parser.add_argument("--db", type=Path,
+                        help="Banco a usar (padrão: data/bench_<escala>.db, gerado se faltar)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="Latência simulada de cada chamada ao LLM (segundos)")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="JSON de saída (padrão: benchmarks/results/<escala>-<commit>.json)")
+    parser.add_argument("--compare", type=Path,
+                        help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--max-regression", type=float,
+                        help="Falha se algum cenário ficar mais lento que isso (ex.: 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    # src.database já configura o logging em INFO ao ser importado
+    logging.getLogger().setLevel(logging.WARNING)
+    scale = args.scale.lower() if args.scale.lower() in ("10k", "1m", "10m") else int(args.scale)
+    db_path = args.db or PROJECT_ROOT / "data" / f"bench_{str(scale)}.db"
+    if not db_path.exists():
+        print(f"Gerando banco sintético ({scale}) em {db_path}...")
+        generate_database(db_path, scale, seed=args.seed)
+
+    revision = _git_revision()
+    report = {
+        "meta": {
+            **revision,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": str(scale),
+            "tables": table_sizes(scale) if args.db is None else None,
+            "seed": args.seed,
+            "db": str(db_path),
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "llm_latency": args.llm_latency,
+        },
+        "scenarios": run_scenarios(
+            db_path, args.scenarios, repeat=args.repeat, warmup=args.warmup,
+            llm=MockLLM(latency=args.llm_latency, seed=args.seed)),
+    }
+
+    output = args.output or RESULTS_DIR / f"{scale}-{revision['commit'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    for name, stats in report["scenarios"].items():
+        print(f"{name:18s} mediana {stats['median'] * 1000:9.1f} ms  "
+              f"p95 {stats['p95'] * 1000:9.1f} ms")
+    print(f"Resultados em {output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        ratios = compare(baseline, report)
+        print(f"\nComparação com {baseline['meta'].get('commit')}:")
+        for name, ratio in ratios.items():
+            print(f"{name:18s} {ratio:6.2f}x  ({(ratio - 1) * 100:+.1f}%)")
+        if args.max_regression is not None and any(
+                ratio > 1 + args.max_regression for ratio in ratios.values()):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
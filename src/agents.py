@@ -1,23 +1,76 @@
 # agents.py
 import json
+import asyncio
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
 import re
 from datetime import datetime
 import logging
 import os
+import time
 from pathlib import Path
 import sqlite3
+import queue
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
 
 try:
-    from .prompts import INTERPRETATION_PROMPT, SQL_PROMPT, FORMATTING_PROMPT, ERROR_PROMPT
+    from .pool import ConnectionPool, DEFAULT_PRAGMA_PROFILE, resolve_pragmas
+    from .cache import QueryResultCache, make_cache_key, file_version
+    from .llm_cache import SemanticCache, schema_fingerprint
+    from .query_guard import QueryCancelledError, QueryRegistry
+    from .chunks import head_and_count
+    from .catalog import SchemaCatalog
+    from .lazy import lazy_module
+    from .timing import timed, with_timings
+    from .memory import with_memory_profile
+    from .figures import FigureFactory, close_figure
+    from .metrics import LLM_FIRST_TOKEN, SQL_GENERATED, SQL_ROWS, record_llm_call
 except ImportError:
+    from pool import ConnectionPool, DEFAULT_PRAGMA_PROFILE, resolve_pragmas
+    from cache import QueryResultCache, make_cache_key, file_version
+    from llm_cache import SemanticCache, schema_fingerprint
+    from query_guard import QueryCancelledError, QueryRegistry
+    from chunks import head_and_count
+    from catalog import SchemaCatalog
+    from lazy import lazy_module
+    from timing import timed, with_timings
+    from memory import with_memory_profile
+    from figures import FigureFactory, close_figure
+    from metrics import LLM_FIRST_TOKEN, SQL_GENERATED, SQL_ROWS, record_llm_call
+
+
+# Bibliotecas de visualização só são importadas ao gerar o primeiro gráfico
+px = lazy_module("plotly.express")
+
+# Gráficos que ``create_visualizations`` sabe gerar
+CHART_KINDS = ("matplotlib", "plotly")
+# Gerados nas respostas completas: as interfaces exibem apenas o Plotly
+RESPONSE_CHARTS = ("plotly",)
+
+_prompts = None
+
+
+def _get_prompts():
+    """
+    Carrega os templates de prompt (e o LangChain) no primeiro uso.
+
+    Returns:
+        Módulo ``prompts`` ou, se não puder ser importado, templates básicos
+    """
+    global _prompts
+    if _prompts is not None:
+        return _prompts
+
+    try:
+        from . import prompts
+        _prompts = prompts
+        return _prompts
+    except ImportError:
+        pass
+
     # Fallback se não conseguir importar
     from langchain.prompts import PromptTemplate
 
@@ -65,20 +118,72 @@ except ImportError:
         """
     )
 
+    FORMATTING_PROMPT = PromptTemplate(
+        input_variables=["original_question", "query_results"],
+        template="""
+        Resuma os resultados abaixo em até 250 palavras, destacando os
+        principais insights.
+
+        Pergunta: {original_question}
+        Dados (JSON): {query_results}
+        """
+    )
+
+    _prompts = SimpleNamespace(
+        INTERPRETATION_PROMPT=INTERPRETATION_PROMPT,
+        SQL_PROMPT=SQL_PROMPT,
+        FORMATTING_PROMPT=FORMATTING_PROMPT)
+    return _prompts
+
 
 class DatabaseManager:
     """Gerenciador de conexão e operações com o banco de dados."""
 
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+    self,
+    db_path: Optional[str] = None,
+    pool_size: int = 4,
+    connection_lifetime: Optional[float] = 3600.0,
+    cached_statements: int = 256,
+    pragma_profile: Optional[str] = DEFAULT_PRAGMA_PROFILE,
+    pragmas: Optional[Dict] = None,
+    result_cache: Optional[QueryResultCache] = None,
+    cache_results: bool = True,
+    query_timeout: Optional[float] = 60.0,
+     max_vm_steps: Optional[int] = None):
         """
         Inicializa o gerenciador do banco de dados.
 
         Args:
             db_path: Caminho para o banco de dados. Se None, usa o padrão.
+            pool_size: Máximo de conexões abertas simultaneamente
+            connection_lifetime: Segundos até uma conexão ser reaberta
+                (None mantém a conexão enquanto o gerenciador existir)
+            cached_statements: Tamanho do cache de statements por conexão
+            pragma_profile: Perfil de PRAGMAs aplicado nas conexões
+            pragmas: PRAGMAs que sobrescrevem o perfil
+            result_cache: Cache de resultados compartilhado (opcional)
+            cache_results: Habilita o cache de resultados de execute_query
+            query_timeout: Tempo máximo de cada query em segundos (None = sem limite)
+            max_vm_steps: Máximo de instruções da VM por query (None = sem limite)
         """
         self.db_path = self._get_db_path(db_path)
         self.logger = logging.getLogger(__name__)
-        self._schema_cache = None
+        self._catalog = None
+        self._pool = None
+        # Servidor e lote compartilham o gerenciador entre threads
+        self._pool_lock = threading.Lock()
+        self.pool_size = pool_size
+        self.connection_lifetime = connection_lifetime
+        self.cached_statements = cached_statements
+        self.pragma_profile = pragma_profile
+        self.pragmas = resolve_pragmas(pragma_profile, pragmas)
+        self.result_cache = None
+        if cache_results:
+            self.result_cache = result_cache or QueryResultCache()
+        self.query_timeout = query_timeout
+        self.max_vm_steps = max_vm_steps
+        self._queries = QueryRegistry()
 
         # Verificar se o banco existe
         if not self.db_path.exists():
@@ -106,78 +211,231 @@ class DatabaseManager:
         current_dir = Path(__file__).parent
         return current_dir / "data" / "clientes_completo.db"
 
-    def get_connection(self) -> sqlite3.Connection:
+    def _get_pool(self) -> ConnectionPool:
+        """Cria o pool de conexões persistentes na primeira utilização."""
+        pool = self._pool
+        if pool is not None:
+            return pool
+        with self._pool_lock:
+            if self._pool is None:
+                pool = ConnectionPool(
+                    self.db_path,
+                    max_readers=self.pool_size,
+                    max_lifetime=self.connection_lifetime,
+                    cached_statements=self.cached_statements,
+                    pragmas=self.pragmas
+                )
+                try:
+                    pool.initialize()
+                except sqlite3.Error as e:
+                    # Banco somente leitura: segue sem os PRAGMAs persistentes
+                    self.logger.warning(f"Não foi possível inicializar PRAGMAs: {e}")
+                # Só publicado depois de inicializado
+                self._pool = pool
+            return self._pool
+
+    def _get_catalog(self) -> SchemaCatalog:
+        """Catálogo de tabelas/colunas em cache, invalidado por schema_version."""
+        catalog = self._catalog
+        if catalog is not None:
+            return catalog
+        pool = self._get_pool()
+        with self._pool_lock:
+            if self._catalog is None:
+                self._catalog = SchemaCatalog(pool)
+            return self._catalog
+
+    def get_pragma_status(self) -> Dict[str, Any]:
         """
-        Cria e retorna uma conexão com o banco de dados.
+        Retorna o perfil de PRAGMAs e os valores efetivos nas conexões.
 
         Returns:
+            Dict com nome do perfil e configurações atuais
+        """
+        try:
+            settings = self._get_pool().pragma_status()
+        except Exception as e:
+            self.logger.error(f"Erro ao ler PRAGMAs: {e}")
+            settings = {}
+        return {"profile": self.pragma_profile, "settings": settings}
+
+    @contextmanager
+    def get_connection(self):
+        """
+        Empresta uma conexão persistente do pool.
+
+        A conexão é devolvida ao pool ao sair do bloco ``with``, mantendo
+        o cache de statements preparados entre chamadas.
+
+        Yields:
             Conexão SQLite
         """
         try:
-            conn = sqlite3.connect(str(self.db_path))
-            conn.row_factory = sqlite3.Row  # Para acessar colunas por nome
-            return conn
+            pool = self._get_pool()
         except Exception as e:
             self.logger.error(f"Erro ao conectar ao banco: {e}")
             raise
 
+        with pool.reader() as conn:
+            yield conn
+
+    def close(self):
+        """Fecha todas as conexões abertas pelo gerenciador."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            self._catalog = None
+        if pool is not None:
+            pool.close()
+            self.logger.info("Conexões com o banco fechadas")
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit."""
+        self.close()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores do cache de resultados.
+
+        Returns:
+            Dict com acertos, falhas, evicções e bytes ocupados
+        """
+        return self.result_cache.stats() if self.result_cache else {}
+
+    def cancel(self) -> int:
+        """
+        Interrompe todas as queries em execução neste gerenciador.
+
+        Returns:
+            Número de queries canceladas
+        """
+        cancelled = self._queries.cancel_all()
+        if cancelled:
+            self.logger.warning(f"{cancelled} query(s) cancelada(s)")
+        return cancelled
+
+    def _db_version(self) -> Tuple:
+        """Versão atual do banco usada para invalidar o cache de resultados."""
+        return (self._get_pool().data_version(), *file_version(self.db_path))
+
+    @timed("execute_query")
     def execute_query(
     self,
     query: str,
-     params: Optional[Tuple] = None) -> pd.DataFrame:
+    params: Optional[Tuple] = None,
+    use_cache: bool = True,
+    timeout: Optional[float] = None,
+     max_vm_steps: Optional[int] = None) -> pd.DataFrame:
         """
         Executa uma query e retorna os resultados como DataFrame.
 
         Args:
             query: Query SQL
             params: Parâmetros para a query (opcional)
+            use_cache: Consulta e alimenta o cache de resultados
+            timeout: Sobrescreve query_timeout (segundos)
+            max_vm_steps: Sobrescreve max_vm_steps
 
         Returns:
             DataFrame com os resultados
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
         """
         try:
-            with self.get_connection() as conn:
+            cache_key = version = None
+            if use_cache and self.result_cache is not None:
+                cache_key = make_cache_key(query, params)
+                version = self._db_version()
+                cached = self.result_cache.get(cache_key, version)
+                if cached is not None:
+                    self.logger.info("Query servida do cache de resultados.")
+                    return cached
+
+            with self.get_connection() as conn, self._queries.guard(
+                    conn,
+                    timeout=self.query_timeout if timeout is None else timeout,
+                    max_vm_steps=self.max_vm_steps if max_vm_steps is None else max_vm_steps,
+                    query=query):
                 df = pd.read_sql_query(query, conn, params=params)
+                SQL_ROWS.observe(len(df))
                 self.logger.info(
     f"Query executada com sucesso. {
         len(df)} registros retornados.")
-                return df
+
+            if cache_key is not None:
+                self.result_cache.put(cache_key, version, df)
+            return df
+        except QueryCancelledError:
+            raise
         except Exception as e:
             self.logger.error(f"Erro ao executar query: {e}")
             self.logger.error(f"Query: {query}")
             return pd.DataFrame()
 
+    def execute_query_iter(
+    self,
+    query: str,
+    params: Optional[Tuple] = None,
+     chunksize: int = 10000) -> Iterator[pd.DataFrame]:
+        """
+        Executa uma query e retorna os resultados em blocos de DataFrame.
+
+        Args:
+            query: Query SQL
+            params: Parâmetros para a query (opcional)
+            chunksize: Número de linhas por bloco
+
+        Yields:
+            DataFrames com até ``chunksize`` linhas
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
+        """
+        with self.get_connection() as conn, self._queries.guard(
+                conn, timeout=self.query_timeout,
+                max_vm_steps=self.max_vm_steps, query=query) as guard:
+            cursor = conn.cursor()
+            cursor.execute(query, params or ())
+            columns = [d[0] for d in cursor.description]
+            first = True
+            while True:
+                rows = [tuple(row) for row in cursor.fetchmany(chunksize)]
+                if not rows and not first:
+                    break
+                first = False
+                guard.pause()
+                try:
+                    yield pd.DataFrame.from_records(
+                        rows, columns=columns, coerce_float=True)
+                finally:
+                    guard.resume()
+                if len(rows) < chunksize:
+                    break
+            cursor.close()
+
     def get_schema(self, force_refresh: bool = False) -> Dict[str, List[str]]:
         """
         Obtém o schema do banco de dados (tabelas e colunas).
 
+        O catálogo só é relido quando ``PRAGMA schema_version`` muda.
+
         Args:
             force_refresh: Force atualização do cache
 
         Returns:
             Dict com tabelas e suas colunas
         """
-        if self._schema_cache is not None and not force_refresh:
-            return self._schema_cache
-
         schema = {}
         try:
-            with self.get_connection() as conn:
-                cursor = conn.cursor()
-
-                # Obter lista de tabelas
-                cursor.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table'")
-                tables = [row[0] for row in cursor.fetchall()]
-
-                # Para cada tabela, obter as colunas
-                for table in tables:
-                    cursor.execute(f"PRAGMA table_info({table})")
-                    columns = [col[1] for col in cursor.fetchall()]
-                    schema[table] = columns
-
-                self._schema_cache = schema
-                self.logger.info(f"Schema carregado: {list(schema.keys())}")
+            catalog = self._get_catalog()
+            if force_refresh:
+                catalog.invalidate()
+            schema = {name: info['columns']
+                      for name, info in catalog.tables().items()}
 
         except Exception as e:
             self.logger.error(f"Erro ao obter schema: {e}")
@@ -216,6 +474,7 @@ class DatabaseManager:
 
         return schema
 
+    @timed("validate_query")
     def validate_query(self, query: str) -> Tuple[bool, str]:
         """
         Valida uma query SQL sem executá-la.
@@ -258,7 +517,8 @@ class AgentsManager:
     self,
     llm,
     database_manager: Optional[DatabaseManager] = None,
-     db_path: Optional[str] = None):
+    db_path: Optional[str] = None,
+     llm_cache: Optional[SemanticCache] = None):
         """
         Inicializa o gerenciador de agentes com LLM e banco de dados.
 
@@ -266,8 +526,10 @@ class AgentsManager:
             llm: Modelo de linguagem (LangChain)
             database_manager: Instância do DatabaseManager (opcional)
             db_path: Caminho do banco de dados (usado se database_manager não fornecido)
+            llm_cache: Cache semântico para interpretações e SQL (opcional)
         """
         self.llm = llm
+        self.llm_cache = llm_cache
 
         # Inicializar gerenciador do banco de dados
         if database_manager:
@@ -277,121 +539,18 @@ class AgentsManager:
 
         self.logger = logging.getLogger(__name__)
 
-        # Configurar estilo dos gráficos
-        try:
-            plt.style.use('seaborn-v0_8')
-        except BaseException:
-            plt.style.use('default')
+        # Figuras do matplotlib sem o pyplot; o estilo é aplicado quando o
+        # matplotlib é carregado, apenas se algum gráfico for gerado
+        self.figures = FigureFactory()
 
-        try:
-            sns.set_palette("husl")
-        except BaseException:
-            pass
-
-
-<< << << < HEAD
-       # Schema do banco para referência
-   self.schema = {
-        "clientes": {
-    "columns": [
-        {"name": "id",
-    "type": "INTEGER",
-    "description": "Chave primária",
-     "primary_key": True},
-        {"name": "nome", "type": "TEXT", "description": "Nome completo do cliente"},
-        {"name": "email", "type": "TEXT", "description": "E-mail único do cliente"},
-        {"name": "idade", "type": "INTEGER", "description": "Idade em anos"},
-        {"name": "cidade", "type": "TEXT", "description": "Cidade de residência"},
-        {"name": "estado", "type": "TEXT",
-            "description": "Sigla do estado (ex: SP, RJ)"},
-        {"name": "profissao", "type": "TEXT", "description": "Profissão/ocupação"},
-        {"name": "genero", "type": "TEXT", "description": "Identidade de gênero"}
-    ],
-    "description": "Tabela de cadastro de clientes",
-    "foreign_keys": []
-},
-        "compras": {
-    "columns": [
-        {"name": "id",
-    "type": "INTEGER",
-    "description": "Chave primária",
-     "primary_key": True},
-        {"name": "cliente_id",
-    "type": "INTEGER",
-    "description": "Chave estrangeira para clientes",
-     "foreign_key": "clientes.id"},
-        {"name": "data_compra", "type": "TEXT",
-            "description": "Data no formato ISO (YYYY-MM-DD)"},
-        {"name": "valor", "type": "REAL", "description": "Valor total da compra"},
-        {"name": "categoria", "type": "TEXT",
-            "description": "Categoria do produto/serviço"},
-        {"name": "canal", "type": "TEXT",
-            "description": "Canal de venda (online/loja/telefone)"}
-    ],
-    "description": "Registro de transações de compras",
-    "foreign_keys": ["cliente_id"]
-},
-        "suporte": {
-    "columns": [
-        {"name": "id",
-    "type": "INTEGER",
-    "description": "Chave primária",
-     "primary_key": True},
-        {"name": "cliente_id",
-    "type": "INTEGER",
-    "description": "Chave estrangeira para clientes",
-     "foreign_key": "clientes.id"},
-        {"name": "data_contato", "type": "TEXT",
-            "description": "Data no formato ISO (YYYY-MM-DD)"},
-        {"name": "tipo_contato", "type": "TEXT",
-            "description": "Tipo de solicitação (reclamação/duvida/elogio)"},
-        {"name": "resolvido", "type": "BOOLEAN",
-            "description": "Indica se o ticket foi resolvido (0/1)"},
-        {"name": "canal", "type": "TEXT",
-            "description": "Canal de atendimento (email/telefone/chat)"}
-    ],
-    "description": "Registro de atendimentos ao cliente",
-    "foreign_keys": ["cliente_id"]
-},
-        "campanhas_marketing": {
-    "columns": [
-        {"name": "id",
-    "type": "INTEGER",
-    "description": "Chave primária",
-     "primary_key": True},
-        {"name": "cliente_id",
-    "type": "INTEGER",
-    "description": "Chave estrangeira para clientes",
-     "foreign_key": "clientes.id"},
-        {"name": "nome_campanha", "type": "TEXT",
-            "description": "Nome/identificador da campanha"},
-        {"name": "data_envio", "type": "TEXT",
-            "description": "Data no formato ISO (YYYY-MM-DD)"},
-        {"name": "interagiu", "type": "BOOLEAN",
-            "description": "Se o cliente interagiu com a campanha (0/1)"},
-        {"name": "canal", "type": "TEXT",
-            "description": "Canal de marketing (email/sms/push/whatsapp)"}
-    ],
-    "description": "Registro de campanhas de marketing enviadas",
-    "foreign_keys": ["cliente_id"]
-},
-        "metadata": {
-    "database_type": "SQLite",
-    "date_format": "ISO 8601 (YYYY-MM-DD)",
-    "version": "1.0",
-    "description": "Esquema para sistema de CRM e vendas"
-}
-        }
-== == == =
-   # Obter schema dinâmico do banco
-   self.schema = self.db.get_schema()
-    self.logger.info(
-    f"AgentsManager inicializado com tabelas: {
-        list(
-            self.schema.keys())}")
->>>>>> > dab40b277b91c7dfd8ab814e069056bf0ee0e959
-
-   def interpret_request(self, user_input: str) -> Dict[str, Any]:
+        # Obter schema dinâmico do banco
+        self.schema = self.db.get_schema()
+        self.schema_fingerprint = schema_fingerprint(self.schema)
+        self.logger.info(
+            f"AgentsManager inicializado com tabelas: {list(self.schema.keys())}")
+
+    @timed("interpret_request")
+    def interpret_request(self, user_input: str) -> Dict[str, Any]:
         """
         Interpreta a solicitação do usuário e determina o tipo de análise.
 
@@ -402,33 +561,248 @@ class AgentsManager:
             Dict com interpretação estruturada
         """
         try:
-            # Preparar informações do schema para o LLM
-            schema_info = self._format_schema_for_llm()
+            cached = self._cached_interpretation(user_input)
+            if cached is not None:
+                return cached
 
-            # Usar o prompt template com schema
-            prompt = INTERPRETATION_PROMPT.format(
-                user_input=user_input,
-                schema_info=schema_info
-            )
-            response = self.llm(prompt)
+            response = self._call_llm(
+                "interpret", self._interpretation_prompt(user_input))
+            return self._parse_interpretation(response, user_input)
 
-            # Limpar e parsear resposta
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                interpretation = json.loads(json_match.group())
-                # Validar se as tabelas existem
-                interpretation = self._validate_interpretation(interpretation)
-            else:
-                # Fallback para interpretação básica
-                interpretation = self._fallback_interpretation(user_input)
+        except Exception as e:
+            self.logger.error(f"Erro na interpretação: {e}")
+            return self._fallback_interpretation(user_input)
+
+    @timed("interpret_request")
+    async def interpret_request_async(self, user_input: str) -> Dict[str, Any]:
+        """
+        Versão assíncrona de ``interpret_request``.
 
-            self.logger.info(f"Interpretação gerada: {interpretation}")
-            return interpretation
+        Args:
+            user_input: Pergunta do usuário
+
+        Returns:
+            Dict com interpretação estruturada
+        """
+        try:
+            cached = await asyncio.to_thread(
+                self._cached_interpretation, user_input)
+            if cached is not None:
+                return cached
+
+            response = await self._allm(
+                self._interpretation_prompt(user_input), stage="interpret")
+            return await asyncio.to_thread(
+                self._parse_interpretation, response, user_input)
 
         except Exception as e:
             self.logger.error(f"Erro na interpretação: {e}")
             return self._fallback_interpretation(user_input)
 
+    def _cached_interpretation(self, user_input: str) -> Optional[Dict[str, Any]]:
+        """Interpretação guardada no cache semântico, se houver."""
+        cached = self._cache_lookup("interpretation", user_input)
+        if cached is None:
+            return None
+        interpretation = json.loads(cached)
+        self.logger.info(f"Interpretação obtida do cache: {interpretation}")
+        return interpretation
+
+    def _interpretation_prompt(self, user_input: str) -> str:
+        """Monta o prompt de interpretação com o schema atual."""
+        # Preparar informações do schema para o LLM
+        schema_info = self._format_schema_for_llm()
+
+        # Usar o prompt template com schema
+        return _get_prompts().INTERPRETATION_PROMPT.format(
+            user_input=user_input,
+            schema_info=schema_info
+        )
+
+    def _parse_interpretation(self, response: str,
+                              user_input: str) -> Dict[str, Any]:
+        """Extrai, valida e guarda em cache o JSON retornado pelo LLM."""
+        # Limpar e parsear resposta
+        json_match = re.search(r'\{.*\}', response, re.DOTALL)
+        if json_match:
+            interpretation = json.loads(json_match.group())
+            # Validar se as tabelas existem
+            interpretation = self._validate_interpretation(interpretation)
+            self._cache_store(
+                "interpretation", user_input,
+                json.dumps(interpretation, ensure_ascii=False))
+        else:
+            # Fallback para interpretação básica
+            interpretation = self._fallback_interpretation(user_input)
+
+        self.logger.info(f"Interpretação gerada: {interpretation}")
+        return interpretation
+
+    def stream_llm(self, prompt: str,
+                   on_token: Optional[Callable[[str], None]] = None,
+                   first_token_timeout: Optional[float] = None,
+                   stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Transmite a resposta do LLM em pedaços à medida que são gerados.
+
+        Usa ``llm.stream`` quando disponível; caso contrário a resposta
+        completa é entregue como um único pedaço. Com
+        ``first_token_timeout`` a chamada roda em uma thread e, se nenhum
+        pedaço chegar no prazo, ``TimeoutError`` é levantado. Quando
+        ``stop`` é sinalizado, o stream é encerrado no próximo pedaço.
+
+        Args:
+            prompt: Prompt completo
+            on_token: Função chamada com cada pedaço recebido
+            first_token_timeout: Prazo em segundos para o primeiro pedaço
+            stop: Evento que interrompe a transmissão
+
+        Yields:
+            Pedaços de texto da resposta
+
+        Raises:
+            TimeoutError: Primeiro pedaço não chegou no prazo
+        """
+        tokens = self._llm_tokens(prompt)
+        if first_token_timeout is not None:
+            tokens = self._first_token_deadline(tokens, first_token_timeout)
+
+        try:
+            for token in tokens:
+                if stop is not None and stop.is_set():
+                    self.logger.info("Stream do LLM interrompido")
+                    break
+                if on_token is not None:
+                    on_token(token)
+                yield token
+        finally:
+            tokens.close()
+
+    def _llm_tokens(self, prompt: str, stage: str = "stream") -> Iterator[str]:
+        if not hasattr(self.llm, "stream"):
+            yield str(self._call_llm(stage, prompt))
+            return
+
+        start = time.perf_counter()
+        received = []
+        try:
+            for chunk in self.llm.stream(prompt):
+                # Modelos de chat transmitem mensagens; LLMs de texto, strings
+                content = getattr(chunk, "content", chunk)
+                if content:
+                    if not received:
+                        LLM_FIRST_TOKEN.observe(
+                            time.perf_counter() - start, stage=stage)
+                    text = content if isinstance(content, str) else str(content)
+                    received.append(text)
+                    yield text
+        except Exception:
+            record_llm_call(stage, time.perf_counter() - start, prompt, error=True)
+            raise
+        record_llm_call(stage, time.perf_counter() - start, prompt,
+                        "".join(received))
+
+    def _first_token_deadline(self, tokens: Iterator[str],
+                              timeout: float) -> Iterator[str]:
+        """Consome ``tokens`` em uma thread, exigindo o primeiro pedaço no prazo."""
+        done = object()
+        buffer = queue.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                for token in tokens:
+                    if stop.is_set():
+                        break
+                    buffer.put(token)
+            except Exception as e:
+                buffer.put(e)
+            finally:
+                tokens.close()
+                buffer.put(done)
+
+        threading.Thread(target=produce, name="llm-stream", daemon=True).start()
+        try:
+            try:
+                item = buffer.get(timeout=timeout)
+            except queue.Empty:
+                self.logger.warning(
+                    f"LLM sem resposta após {timeout:.1f}s; stream abandonado")
+                raise TimeoutError(
+                    f"Primeiro trecho do LLM não chegou em {timeout:.1f}s")
+            while item is not done:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                item = buffer.get()
+        finally:
+            # Encerra o produtor se o consumidor desistir antes do fim
+            stop.set()
+
+    def _call_llm(self, stage: str, prompt: str):
+        """
+        Chama o LLM registrando latência e tokens nas métricas.
+
+        Args:
+            stage: Etapa da análise (ex.: "interpret", "sql")
+            prompt: Prompt completo
+
+        Returns:
+            Resposta do LLM
+        """
+        start = time.perf_counter()
+        try:
+            response = self.llm(prompt)
+        except Exception:
+            record_llm_call(stage, time.perf_counter() - start, prompt, error=True)
+            raise
+        record_llm_call(stage, time.perf_counter() - start, prompt, response)
+        return response
+
+    async def _allm(self, prompt: str, stage: str = "llm") -> str:
+        """
+        Chama o LLM sem bloquear o event loop.
+
+        Usa a API assíncrona do cliente (``ainvoke``/``apredict``) quando
+        disponível; caso contrário executa a chamada síncrona em uma thread.
+
+        Args:
+            prompt: Prompt completo
+            stage: Etapa da análise, usada nas métricas
+
+        Returns:
+            Texto da resposta
+        """
+        start = time.perf_counter()
+        try:
+            if hasattr(self.llm, "ainvoke"):
+                result = await self.llm.ainvoke(prompt)
+            elif hasattr(self.llm, "apredict"):
+                result = await self.llm.apredict(prompt)
+            else:
+                result = await asyncio.to_thread(self.llm, prompt)
+        except Exception:
+            record_llm_call(stage, time.perf_counter() - start, prompt, error=True)
+            raise
+        record_llm_call(stage, time.perf_counter() - start, prompt, result)
+
+        # Modelos de chat retornam mensagens; LLMs de texto, strings
+        content = getattr(result, "content", result)
+        return content if isinstance(content, str) else str(content)
+
+    def _cache_lookup(self, kind: str, key: str,
+                      allow_similar: bool = True) -> Optional[str]:
+        """Consulta o cache semântico, se configurado."""
+        if self.llm_cache is None:
+            return None
+        return self.llm_cache.lookup(
+            kind, key, self.schema_fingerprint, allow_similar=allow_similar)
+
+    def _cache_store(self, kind: str, key: str, payload: str):
+        """Grava uma resposta no cache semântico, se configurado."""
+        if self.llm_cache is not None:
+            self.llm_cache.store(kind, key, self.schema_fingerprint, payload)
+
     def _format_schema_for_llm(self) -> str:
         """Formata o schema do banco para uso no prompt do LLM."""
         schema_lines = []
@@ -502,6 +876,7 @@ class AgentsManager:
             "formato_saida": "completo"
         }
 
+    @timed("generate_sql")
     def generate_sql(self, interpretation: Dict[str, Any]) -> str:
         """
         Gera query SQL baseada na interpretação.
@@ -513,41 +888,103 @@ class AgentsManager:
             String SQL válida
         """
         try:
-            # Preparar informações do schema
-            schema_info = self._format_schema_for_llm()
+            cached_sql = self._cached_sql(interpretation)
+            if cached_sql is not None:
+                return cached_sql
 
-            # Usar o prompt template
-            prompt = SQL_PROMPT.format(
-                interpretation=json.dumps(interpretation, indent=2),
-                schema_info=schema_info
-            )
-            response = self.llm(prompt)
+            response = self._call_llm("sql", self._sql_prompt(interpretation))
+            return self._finalize_sql(response, interpretation)
 
-            # Limpar resposta
-            sql_query = re.sub(
-                r'^```sql\s*|\s*```$',
-                '',
-                response.strip(),
-                flags=re.MULTILINE)
-            sql_query = sql_query.strip()
-
-            # Validar query
-            is_valid, error_msg = self.db.validate_query(sql_query)
-            if not is_valid:
-                self.logger.error(f"Query inválida: {error_msg}")
-                # Tentar uma query básica como fallback
-                first_table = list(self.schema.keys())[0]
-                sql_query = f"SELECT * FROM {first_table} LIMIT 10"
-
-            self.logger.info(f"Query SQL gerada: {sql_query}")
-            return sql_query
+        except Exception as e:
+            self.logger.error(f"Erro na geração SQL: {e}")
+            return self._fallback_sql()
+
+    @timed("generate_sql")
+    async def generate_sql_async(self, interpretation: Dict[str, Any]) -> str:
+        """
+        Versão assíncrona de ``generate_sql``; a validação no SQLite roda
+        em uma thread.
+
+        Args:
+            interpretation: Dicionário com a interpretação
+
+        Returns:
+            String SQL válida
+        """
+        try:
+            cached_sql = await asyncio.to_thread(self._cached_sql, interpretation)
+            if cached_sql is not None:
+                return cached_sql
+
+            response = await self._allm(
+                self._sql_prompt(interpretation), stage="sql")
+            return await asyncio.to_thread(
+                self._finalize_sql, response, interpretation)
 
         except Exception as e:
             self.logger.error(f"Erro na geração SQL: {e}")
-            # Fallback para query básica
-            first_table = list(self.schema.keys())[0]
-            return f"SELECT * FROM {first_table} LIMIT 10"
+            return self._fallback_sql()
+
+    def _sql_cache_key(self, interpretation: Dict[str, Any]) -> str:
+        return json.dumps(interpretation, sort_keys=True, ensure_ascii=False)
+
+    def _cached_sql(self, interpretation: Dict[str, Any]) -> Optional[str]:
+        """SQL guardado no cache para esta interpretação, se ainda válido."""
+        # A interpretação já é deduplicada por similaridade no primeiro
+        # nível; aqui só reaproveitamos SQL de interpretações idênticas
+        cached_sql = self._cache_lookup(
+            "sql", self._sql_cache_key(interpretation), allow_similar=False)
+        if cached_sql is not None:
+            is_valid, _ = self.db.validate_query(cached_sql)
+            if is_valid:
+                self.logger.info(f"Query SQL obtida do cache: {cached_sql}")
+                SQL_GENERATED.inc(source="cache")
+                return cached_sql
+        return None
+
+    def _sql_prompt(self, interpretation: Dict[str, Any]) -> str:
+        """Monta o prompt de geração SQL com o schema atual."""
+        # Preparar informações do schema
+        schema_info = self._format_schema_for_llm()
+
+        # Usar o prompt template
+        return _get_prompts().SQL_PROMPT.format(
+            interpretation=json.dumps(interpretation, indent=2),
+            schema_info=schema_info
+        )
+
+    def _finalize_sql(self, response: str,
+                      interpretation: Dict[str, Any]) -> str:
+        """Limpa e valida o SQL do LLM, guardando-o no cache se válido."""
+        # Limpar resposta
+        sql_query = re.sub(
+            r'^```sql\s*|\s*```$',
+            '',
+            response.strip(),
+            flags=re.MULTILINE)
+        sql_query = sql_query.strip()
+
+        # Validar query
+        is_valid, error_msg = self.db.validate_query(sql_query)
+        if not is_valid:
+            self.logger.error(f"Query inválida: {error_msg}")
+            # Tentar uma query básica como fallback
+            sql_query = self._fallback_sql()
+        else:
+            self._cache_store("sql", self._sql_cache_key(interpretation), sql_query)
+            SQL_GENERATED.inc(source="llm")
+
+        self.logger.info(f"Query SQL gerada: {sql_query}")
+        return sql_query
 
+    def _fallback_sql(self) -> str:
+        """Query básica usada quando o SQL do LLM não pode ser usado."""
+        SQL_GENERATED.inc(source="fallback")
+        first_table = list(self.schema.keys())[0]
+        return f"SELECT * FROM {first_table} LIMIT 10"
+
+    @with_memory_profile
+    @with_timings
     def execute_analysis(self, user_input: str) -> Dict[str, Any]:
         """
         Executa análise completa: interpretação, geração SQL, execução e formatação.
@@ -575,16 +1012,112 @@ class AgentsManager:
 
             return response
 
+        except QueryCancelledError as e:
+            return self._cancelled_response(e)
         except Exception as e:
             self.logger.error(f"Erro na análise completa: {e}")
-            return {
-                "success": False,
-                "error": str(e),
-                "summary": f"❌ **Erro na análise**: {str(e)}",
-                "data": pd.DataFrame(),
-                "sql_query": "",
-                "interpretation": {}
-            }
+            return self._error_response(e)
+
+    @with_memory_profile
+    @with_timings
+    async def execute_analysis_async(self, user_input: str,
+                                     with_insights: bool = True) -> Dict[str, Any]:
+        """
+        Versão assíncrona de ``execute_analysis``.
+
+        Interpretação e SQL usam a API assíncrona do LLM e o SQLite roda em
+        uma thread. Com o DataFrame pronto, resumo, tabela HTML, gráficos e
+        insights do LLM são gerados em paralelo.
+
+        Args:
+            user_input: Pergunta do usuário
+            with_insights: Gera também a narrativa do LLM (``insights``)
+
+        Returns:
+            Dict com resultado completo da análise
+        """
+        try:
+            interpretation = await self.interpret_request_async(user_input)
+            sql_query = await self.generate_sql_async(interpretation)
+            df = await asyncio.to_thread(self.db.execute_query, sql_query)
+
+            response = await self.format_complete_response_async(
+                df, interpretation, user_input, with_insights=with_insights)
+            response["sql_query"] = sql_query
+
+            return response
+
+        except QueryCancelledError as e:
+            return self._cancelled_response(e)
+        except Exception as e:
+            self.logger.error(f"Erro na análise completa: {e}")
+            return self._error_response(e)
+
+    def _cancelled_response(self, error: QueryCancelledError) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": str(error),
+            "error_details": error.to_dict(),
+            "summary": f"⏹️ **Consulta interrompida**: {str(error)}",
+            "data": pd.DataFrame(),
+            "sql_query": error.query or "",
+            "interpretation": {}
+        }
+
+    def _error_response(self, error: Exception) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": str(error),
+            "summary": f"❌ **Erro na análise**: {str(error)}",
+            "data": pd.DataFrame(),
+            "sql_query": "",
+            "interpretation": {}
+        }
+
+    def _insights_prompt(self, df: pd.DataFrame, user_input: str,
+                         max_rows: int = 50) -> str:
+        """Monta o prompt de insights com as primeiras linhas do resultado."""
+        return _get_prompts().FORMATTING_PROMPT.format(
+            original_question=user_input,
+            query_results=df.head(max_rows).to_json(
+                orient="records", force_ascii=False))
+
+    @timed("generate_insights")
+    def generate_insights(self, df: pd.DataFrame, user_input: str,
+                          max_rows: int = 50) -> str:
+        """
+        Gera uma narrativa dos resultados com o LLM.
+
+        Args:
+            df: DataFrame com os resultados
+            user_input: Pergunta original do usuário
+            max_rows: Linhas enviadas ao LLM
+
+        Returns:
+            Texto em Markdown ou string vazia em caso de erro
+        """
+        if df.empty:
+            return ""
+        try:
+            return str(self._call_llm(
+                "insights", self._insights_prompt(df, user_input, max_rows)))
+        except Exception as e:
+            self.logger.error(f"Erro na geração de insights: {e}")
+            return ""
+
+    @timed("generate_insights")
+    async def generate_insights_async(self, df: pd.DataFrame, user_input: str,
+                                      max_rows: int = 50) -> str:
+        """Versão assíncrona de ``generate_insights``."""
+        if df.empty:
+            return ""
+        try:
+            prompt = await asyncio.to_thread(
+                self._insights_prompt, df, user_input, max_rows)
+            return await self._allm(prompt, stage="insights")
+        except Exception as e:
+            self.logger.error(f"Erro na geração de insights: {e}")
+            return ""
 
     def format_response(self, query_results_json: str, user_input: str) -> str:
         """
@@ -621,24 +1154,34 @@ class AgentsManager:
             self.logger.error(f"Erro na formatação: {e}")
             return "⚠️ **Dados processados com sucesso**, mas houve erro na formatação."
 
+    @timed("create_visualizations")
     def create_visualizations(self,
-    df: pd.DataFrame,
-    interpretation: Dict[str,
-    Any]) -> Tuple[Optional[Any],
-     Optional[Any]]:
+                              df: pd.DataFrame,
+                              interpretation: Dict[str, Any],
+                              charts: Iterable[str] = CHART_KINDS
+                              ) -> Tuple[Optional[Any], Optional[Any]]:
         """
-        Cria visualizações matplotlib e plotly baseadas nos dados.
+        Cria visualizações matplotlib e/ou plotly baseadas nos dados.
+
+        Só os gráficos pedidos em ``charts`` são criados. A figura do
+        matplotlib vem da ``FigureFactory`` (sem o estado global do pyplot),
+        então pode ser gerada em qualquer thread e não precisa de
+        ``plt.close``; ``figures.close_figure`` a libera antes do coletor
+        de lixo.
 
         Args:
             df: DataFrame com os dados
             interpretation: Interpretação da solicitação
+            charts: "matplotlib" e/ou "plotly"
 
         Returns:
-            Tuple[matplotlib.figure, plotly.figure]
+            Tuple[matplotlib.figure, plotly.figure] (None nos não pedidos)
         """
-        if df.empty:
+        charts = set(charts)
+        if df.empty or not charts & set(CHART_KINDS):
             return None, None
 
+        fig_mpl = None
         try:
             tipo_grafico = interpretation.get("tipo_grafico", "barras")
 
@@ -646,154 +1189,142 @@ class AgentsManager:
             x_col = df.columns[0]
             y_col = df.columns[1] if len(df.columns) > 1 else df.columns[0]
 
-            # Matplotlib Figure
-            fig_mpl, ax = plt.subplots(figsize=(12, 8))
-
-            # Plotly Figure
-            fig_plotly = None
-
-            if tipo_grafico == "barras":
-                fig_mpl, fig_plotly = self._create_bar_charts(
-                    df, x_col, y_col, ax)
-            elif tipo_grafico == "pizza":
-                fig_mpl, fig_plotly = self._create_pie_charts(
-                    df, x_col, y_col, ax)
-            elif tipo_grafico == "linha":
-                fig_mpl, fig_plotly = self._create_line_charts(
-                    df, x_col, y_col, ax)
-            elif tipo_grafico == "scatter":
-                fig_mpl, fig_plotly = self._create_scatter_charts(
-                    df, x_col, y_col, ax)
-            else:
-                # Default para barras
-                fig_mpl, fig_plotly = self._create_bar_charts(
-                    df, x_col, y_col, ax)
-
-            # Configurações gerais matplotlib
-            plt.title(
-                interpretation.get("intencao", "Análise de Dados"),
-                fontsize=16,
-                fontweight='bold'
-            )
-            plt.tight_layout()
+            ax = None
+            if "matplotlib" in charts:
+                fig_mpl, ax = self.figures.create()
+
+            builders = {
+                "barras": self._create_bar_charts,
+                "pizza": self._create_pie_charts,
+                "linha": self._create_line_charts,
+                "scatter": self._create_scatter_charts,
+            }
+            # Default para barras
+            build = builders.get(tipo_grafico, self._create_bar_charts)
+            fig_plotly = build(df, x_col, y_col, ax, "plotly" in charts)
+
+            if fig_mpl is not None:
+                # Configurações gerais matplotlib
+                ax.set_title(
+                    interpretation.get("intencao", "Análise de Dados"),
+                    fontsize=16,
+                    fontweight='bold'
+                )
+                fig_mpl.tight_layout()
 
             return fig_mpl, fig_plotly
 
         except Exception as e:
             self.logger.error(f"Erro na criação de visualizações: {e}")
+            close_figure(fig_mpl)
             return None, None
 
-    def _create_bar_charts(self, df: pd.DataFrame,
-                           x_col: str, y_col: str, ax) -> Tuple[Any, Any]:
-        """Cria gráficos de barras matplotlib e plotly."""
+    def _create_bar_charts(self, df: pd.DataFrame, x_col: str, y_col: str,
+                           ax, with_plotly: bool = True) -> Optional[Any]:
+        """Desenha barras em ``ax`` (se houver) e cria o gráfico plotly."""
         try:
-            # Matplotlib
-            colors = plt.cm.Set3(np.linspace(0, 1, len(df)))
-            bars = ax.bar(df[x_col], df[y_col], color=colors)
-            ax.set_xlabel(x_col.replace('_', ' ').title())
-            ax.set_ylabel(y_col.replace('_', ' ').title())
-
-            # Adicionar valores nas barras
-            for bar in bars:
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width() / 2., height,
-                        f'{height:,.0f}', ha='center', va='bottom')
-
-            # Rotacionar labels se necessário
-            if len(df) > 5:
-                plt.xticks(rotation=45, ha='right')
-
-            # Plotly
+            if ax is not None:
+                colors = FigureFactory.colors(len(df))
+                bars = ax.bar(df[x_col], df[y_col], color=colors)
+                ax.set_xlabel(x_col.replace('_', ' ').title())
+                ax.set_ylabel(y_col.replace('_', ' ').title())
+
+                # Adicionar valores nas barras
+                for bar in bars:
+                    height = bar.get_height()
+                    ax.text(bar.get_x() + bar.get_width() / 2., height,
+                            f'{height:,.0f}', ha='center', va='bottom')
+
+                # Rotacionar labels se necessário
+                if len(df) > 5:
+                    ax.tick_params(axis='x', labelrotation=45)
+                    for label in ax.get_xticklabels():
+                        label.set_horizontalalignment('right')
+
+            if not with_plotly:
+                return None
             fig_plotly = px.bar(
                 df, x=x_col, y=y_col,
                 title=f"{y_col.replace('_', ' ').title()} por {x_col.replace('_', ' ').title()}"
             )
             fig_plotly.update_traces(
-    texttemplate='%{y:,.0f}',
-     textposition='outside')
-
-            return plt.gcf(), fig_plotly
+                texttemplate='%{y:,.0f}',
+                textposition='outside')
+            return fig_plotly
         except Exception as e:
             self.logger.error(f"Erro nos gráficos de barras: {e}")
-            return plt.gcf(), None
+            return None
 
-    def _create_pie_charts(self, df: pd.DataFrame,
-                           x_col: str, y_col: str, ax) -> Tuple[Any, Any]:
-        """Cria gráficos de pizza matplotlib e plotly."""
+    def _create_pie_charts(self, df: pd.DataFrame, x_col: str, y_col: str,
+                           ax, with_plotly: bool = True) -> Optional[Any]:
+        """Desenha pizza em ``ax`` (se houver) e cria o gráfico plotly."""
         try:
-            # Matplotlib
-            colors = plt.cm.Set3(np.linspace(0, 1, len(df)))
-            wedges, texts, autotexts = ax.pie(
-                df[y_col], labels=df[x_col], autopct='%1.1f%%',
-                colors=colors
-            )
-            ax.axis('equal')
-
-            # Plotly
+            if ax is not None:
+                colors = FigureFactory.colors(len(df))
+                ax.pie(df[y_col], labels=df[x_col], autopct='%1.1f%%',
+                       colors=colors)
+                ax.axis('equal')
+
+            if not with_plotly:
+                return None
             fig_plotly = px.pie(
                 df, values=y_col, names=x_col,
                 title=f"Distribuição de {y_col.replace('_', ' ').title()}"
             )
             fig_plotly.update_traces(
-    textposition='inside',
-     textinfo='percent+label')
-
-            return plt.gcf(), fig_plotly
+                textposition='inside',
+                textinfo='percent+label')
+            return fig_plotly
         except Exception as e:
             self.logger.error(f"Erro nos gráficos de pizza: {e}")
-            return plt.gcf(), None
+            return None
 
-    def _create_line_charts(self, df: pd.DataFrame,
-                            x_col: str, y_col: str, ax) -> Tuple[Any, Any]:
-        """Cria gráficos de linha matplotlib e plotly."""
+    def _create_line_charts(self, df: pd.DataFrame, x_col: str, y_col: str,
+                            ax, with_plotly: bool = True) -> Optional[Any]:
+        """Desenha linha em ``ax`` (se houver) e cria o gráfico plotly."""
         try:
-            # Matplotlib
-            ax.plot(
-    df[x_col],
-    df[y_col],
-    marker='o',
-    linewidth=2,
-     markersize=6)
-            ax.set_xlabel(x_col.replace('_', ' ').title())
-            ax.set_ylabel(y_col.replace('_', ' ').title())
-            ax.grid(True, alpha=0.3)
-
-            # Plotly
+            if ax is not None:
+                ax.plot(df[x_col], df[y_col], marker='o', linewidth=2,
+                        markersize=6)
+                ax.set_xlabel(x_col.replace('_', ' ').title())
+                ax.set_ylabel(y_col.replace('_', ' ').title())
+                ax.grid(True, alpha=0.3)
+
+            if not with_plotly:
+                return None
             fig_plotly = px.line(
                 df, x=x_col, y=y_col,
                 title=f"Tendência de {y_col.replace('_', ' ').title()}",
                 markers=True
             )
             fig_plotly.update_traces(line=dict(width=3), marker=dict(size=8))
-
-            return plt.gcf(), fig_plotly
+            return fig_plotly
         except Exception as e:
             self.logger.error(f"Erro nos gráficos de linha: {e}")
-            return plt.gcf(), None
+            return None
 
-    def _create_scatter_charts(
-        self, df: pd.DataFrame, x_col: str, y_col: str, ax) -> Tuple[Any, Any]:
-        """Cria gráficos de dispersão matplotlib e plotly."""
+    def _create_scatter_charts(self, df: pd.DataFrame, x_col: str, y_col: str,
+                               ax, with_plotly: bool = True) -> Optional[Any]:
+        """Desenha dispersão em ``ax`` (se houver) e cria o gráfico plotly."""
         try:
-            # Matplotlib
-            ax.scatter(df[x_col], df[y_col], alpha=0.6, s=60)
-            ax.set_xlabel(x_col.replace('_', ' ').title())
-            ax.set_ylabel(y_col.replace('_', ' ').title())
-            ax.grid(True, alpha=0.3)
-
-            # Plotly
+            if ax is not None:
+                ax.scatter(df[x_col], df[y_col], alpha=0.6, s=60)
+                ax.set_xlabel(x_col.replace('_', ' ').title())
+                ax.set_ylabel(y_col.replace('_', ' ').title())
+                ax.grid(True, alpha=0.3)
+
+            if not with_plotly:
+                return None
             fig_plotly = px.scatter(
-    df, x=x_col, y=y_col, title=f"Correlação: {
-        x_col.replace(
-            '_', ' ').title()} vs {
-                y_col.replace(
-                    '_', ' ').title()}" )
-
-            return plt.gcf(), fig_plotly
+                df, x=x_col, y=y_col,
+                title=f"Correlação: {x_col.replace('_', ' ').title()} vs "
+                      f"{y_col.replace('_', ' ').title()}")
+            return fig_plotly
         except Exception as e:
             self.logger.error(f"Erro nos gráficos de dispersão: {e}")
-            return plt.gcf(), None
+            return None
 
+    @timed("generate_summary")
     def generate_summary(self, df: pd.DataFrame,
                          interpretation: Dict[str, Any]) -> str:
         """
@@ -854,11 +1385,14 @@ class AgentsManager:
             return f"⚠️ **Dados obtidos**: {
     len(df)} registros. Resumo detalhado indisponível."
 
+    @with_memory_profile
+    @with_timings
     def format_complete_response(self,
     df: pd.DataFrame,
     interpretation: Dict[str,
     Any],
-    user_input: str) -> Dict[str,
+    user_input: str,
+    charts: Iterable[str] = RESPONSE_CHARTS) -> Dict[str,
      Any]:
         """
         Formata resposta completa com tabela, resumo e gráficos.
@@ -867,6 +1401,7 @@ class AgentsManager:
             df: DataFrame com os dados
             interpretation: Interpretação da solicitação
             user_input: Pergunta original do usuário
+            charts: Gráficos a gerar (ver ``create_visualizations``)
 
         Returns:
             Dict com todos os componentes da resposta
@@ -895,7 +1430,7 @@ class AgentsManager:
 
             # Criar visualizações
             mpl_fig, plotly_fig = self.create_visualizations(
-                df, interpretation)
+                df, interpretation, charts)
             response["matplotlib_fig"] = mpl_fig
             response["plotly_fig"] = plotly_fig
 
@@ -911,11 +1446,87 @@ class AgentsManager:
 
         return response
 
-    def _format_table_html(self, df: pd.DataFrame) -> str:
-        """Formata DataFrame como HTML table responsiva."""
+    @with_memory_profile
+    @with_timings
+    async def format_complete_response_async(
+            self, df: pd.DataFrame, interpretation: Dict[str, Any],
+            user_input: str, with_insights: bool = True,
+            charts: Iterable[str] = RESPONSE_CHARTS) -> Dict[str, Any]:
+        """
+        Versão assíncrona de ``format_complete_response``.
+
+        Resumo, tabela HTML e gráficos rodam em threads e os insights usam
+        a API assíncrona do LLM, todos ao mesmo tempo. Uma etapa que falha
+        não descarta as demais.
+
+        Args:
+            df: DataFrame com os dados
+            interpretation: Interpretação da solicitação
+            user_input: Pergunta original do usuário
+            with_insights: Gera também a narrativa do LLM
+            charts: Gráficos a gerar (ver ``create_visualizations``)
+
+        Returns:
+            Dict com todos os componentes da resposta (mais ``insights``)
+        """
+        response = {
+            "success": not df.empty,
+            "data": df,
+            "summary": "",
+            "table_html": "",
+            "matplotlib_fig": None,
+            "plotly_fig": None,
+            "insights": "",
+            "interpretation": interpretation,
+            "total_records": len(df)
+        }
+
+        if df.empty:
+            response["summary"] = "❌ **Nenhum resultado encontrado** para sua consulta."
+            return response
+
+        tasks = [
+            asyncio.to_thread(self.generate_summary, df, interpretation),
+            asyncio.to_thread(self._format_table_html, df),
+            asyncio.to_thread(self.create_visualizations, df, interpretation, charts),
+        ]
+        if with_insights:
+            tasks.append(self.generate_insights_async(df, user_input))
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                self.logger.error(f"Erro na formatação da resposta: {result}")
+
+        summary, table_html, figures = results[:3]
+        if isinstance(summary, BaseException):
+            response["summary"] = f"⚠️ **Dados obtidos**: {len(df)} registros. Erro na formatação: {summary}"
+        else:
+            response["summary"] = summary
+        if not isinstance(table_html, BaseException):
+            response["table_html"] = table_html
+        if not isinstance(figures, BaseException):
+            response["matplotlib_fig"], response["plotly_fig"] = figures
+        if with_insights and not isinstance(results[3], BaseException):
+            response["insights"] = results[3]
+
+        self.logger.info(f"Resposta completa gerada com {len(df)} registros")
+        return response
+
+    @timed("_format_table_html")
+    def _format_table_html(self,
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+     max_rows: int = 20) -> str:
+        """
+        Formata DataFrame como HTML table responsiva.
+
+        Aceita também um iterável de blocos (ex.: ``execute_query_iter``);
+        apenas as primeiras ``max_rows`` linhas são mantidas em memória.
+        """
+        display_df = pd.DataFrame()
         try:
-            # Limitar a 20 linhas para exibição
-            display_df = df.head(20)
+            # Limitar a max_rows linhas para exibição, contando o restante
+            display_df, total_rows = head_and_count(data, max_rows)
 
             # Formatação especial para colunas numéricas
             formatted_df = display_df.copy()
@@ -937,15 +1548,15 @@ class AgentsManager:
             )
 
             # Adicionar indicador se há mais dados
-            if len(df) > 20:
-                html += f"<p><small><i>Mostrando 20 de {
-    len(df)} registros totais</i></small></p>"
+            if total_rows > max_rows:
+                html += f"<p><small><i>Mostrando {max_rows} de {
+    total_rows} registros totais</i></small></p>"
 
             return html
 
         except Exception as e:
             self.logger.error(f"Erro na formatação da tabela: {e}")
-            return df.head(10).to_html(index=False)
+            return display_df.head(10).to_html(index=False)
 
     def get_database_info(self) -> Dict[str, Any]:
         """
@@ -1015,7 +1626,8 @@ class AgentsManager:
         "tables_available": list(
             schema.keys()),
             "sample_query_successful": not sample_data.empty,
-             "total_tables": len(schema) }
+            "total_tables": len(schema),
+             "pragmas": self.db.get_pragma_status() if hasattr(self.db, "get_pragma_status") else {} }
 
         except Exception as e:
             self.logger.error(f"Erro no teste de conexão: {e}")
@@ -1032,6 +1644,7 @@ class AgentsManager:
         """Força atualização do schema do banco de dados."""
         try:
             self.schema = self.db.get_schema(force_refresh=True)
+            self.schema_fingerprint = schema_fingerprint(self.schema)
             self.logger.info(f"Schema atualizado: {list(self.schema.keys())}")
         except Exception as e:
             self.logger.error(f"Erro ao atualizar schema: {e}")
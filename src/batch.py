@@ -0,0 +1,472 @@
+"""
+Modo em lote: responde um arquivo JSONL de perguntas sem a interface.
+
+Cada linha do arquivo de entrada é um objeto com ``question`` (ou
+``pergunta``) e, opcionalmente, ``id``. Interpretação, geração de SQL e
+consulta rodam em um pool de threads (E/S do LLM e do SQLite); resumo e
+gráficos rodam em um pool de processos. Cada resultado concluído é gravado
+imediatamente, de modo que uma execução interrompida pode ser retomada.
+
+Uso:
+    python -m src.batch perguntas.jsonl --workers 8 -o resultados.jsonl
+    python -m src.batch perguntas.jsonl --format parquet --charts-dir graficos
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import importlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+import pandas as pd
+
+from .agents import AgentsManager, DatabaseManager
+from .query_guard import QueryCancelledError
+from .metrics import REGISTRY
+from .figures import close_figure
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = PROJECT_ROOT / "data" / "clientes_completo.db"
+
+
+def load_questions(path: Path) -> List[Dict[str, str]]:
+    """
+    Lê as perguntas de um arquivo JSONL.
+
+    Args:
+        path: Arquivo com um objeto JSON por linha
+
+    Returns:
+        Lista de dicts com id e question
+
+    Raises:
+        ValueError: Linha sem pergunta ou ids repetidos
+    """
+    questions = []
+    seen = set()
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            question = item.get("question") or item.get("pergunta")
+            if not question:
+                raise ValueError(f"Linha {number} sem pergunta: {line[:80]}")
+            item_id = str(item.get("id", number))
+            if item_id in seen:
+                raise ValueError(f"Id repetido na linha {number}: {item_id}")
+            seen.add(item_id)
+            questions.append({"id": item_id, "question": question})
+    return questions
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Lê os resultados já gravados em um checkpoint JSONL.
+
+    Uma última linha incompleta (execução interrompida no meio da escrita)
+    é descartada e removida do arquivo.
+
+    Args:
+        path: Arquivo JSONL de resultados
+
+    Returns:
+        Dict id -> resultado
+    """
+    records = {}
+    if not path.exists():
+        return records
+
+    valid_bytes = 0
+    with open(path, "rb") as f:
+        for raw in f:
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                logger.warning(f"Linha incompleta descartada em {path}")
+                break
+            records[str(record["id"])] = record
+            valid_bytes += len(raw)
+
+    if valid_bytes < path.stat().st_size:
+        with open(path, "r+b") as f:
+            f.truncate(valid_bytes)
+    return records
+
+
+class CheckpointWriter:
+    """Grava cada resultado como uma linha JSONL, com flush imediato."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# Estado de cada processo de renderização
+_renderer: Optional[AgentsManager] = None
+
+
+def _init_renderer(db_path: str):
+    """Inicializa o AgentsManager usado para resumos e gráficos no processo."""
+    global _renderer
+    # Processos de lote não têm interface gráfica
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    _renderer = AgentsManager(None, db_path=db_path)
+
+
+def render_result(df: pd.DataFrame, interpretation: Dict[str, Any],
+                  chart_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Gera o resumo e, opcionalmente, o gráfico de um resultado.
+
+    Executado no pool de processos (ou na própria thread com
+    ``--processes 0``), após ``_init_renderer``.
+
+    Args:
+        df: Resultado da consulta
+        interpretation: Interpretação da pergunta
+        chart_path: Arquivo PNG de destino do gráfico (None = sem gráfico)
+
+    Returns:
+        Dict com summary e chart (caminho do arquivo ou None)
+    """
+    summary = _renderer.generate_summary(df, interpretation)
+    chart = None
+    if chart_path and not df.empty:
+        fig, _ = _renderer.create_visualizations(
+            df, interpretation, charts=("matplotlib",))
+        if fig is not None:
+            fig.savefig(chart_path, dpi=100, bbox_inches="tight")
+            chart = chart_path
+            close_figure(fig)
+    return {"summary": summary, "chart": chart}
+
+
+def _records_json(df: pd.DataFrame, max_rows: int) -> List[Dict[str, Any]]:
+    """Linhas do resultado em tipos JSON nativos."""
+    if df.empty or max_rows <= 0:
+        return []
+    return json.loads(df.head(max_rows).to_json(
+        orient="records", date_format="iso", force_ascii=False))
+
+
+def answer_question(agents: AgentsManager, item: Dict[str, str],
+                    render_pool=None, charts_dir: Optional[Path] = None,
+                    max_rows: int = 100,
+                    with_insights: bool = False) -> Dict[str, Any]:
+    """
+    Responde uma pergunta e monta o registro de saída.
+
+    Args:
+        agents: AgentsManager compartilhado entre as threads
+        item: Dict com id e question
+        render_pool: Pool de processos para resumo e gráficos (None = local)
+        charts_dir: Diretório dos gráficos PNG (None = sem gráficos)
+        max_rows: Linhas do resultado incluídas no registro
+        with_insights: Gera também a narrativa do LLM
+
+    Returns:
+        Dict com sql_query, linhas, resumo, tempos e erro (se houver)
+    """
+    record = {
+        "id": item["id"],
+        "question": item["question"],
+        "success": False,
+        "sql_query": "",
+        "row_count": 0,
+        "rows": [],
+        "summary": "",
+        "insights": "",
+        "chart": None,
+        "interpretation": {},
+        "error": None,
+        "timings": {},
+    }
+    timings = record["timings"]
+    start = time.perf_counter()
+
+    def mark(stage, since):
+        now = time.perf_counter()
+        timings[stage] = round(now - since, 4)
+        return now
+
+    try:
+        step = start
+        interpretation = agents.interpret_request(item["question"])
+        record["interpretation"] = interpretation
+        step = mark("interpret", step)
+
+        sql_query = agents.generate_sql(interpretation)
+        record["sql_query"] = sql_query
+        step = mark("sql", step)
+
+        df = agents.db.execute_query(sql_query)
+        record["row_count"] = len(df)
+        record["rows"] = _records_json(df, max_rows)
+        step = mark("query", step)
+
+        chart_path = None
+        if charts_dir is not None:
+            chart_path = str(charts_dir / f"{item['id']}.png")
+        if render_pool is not None:
+            rendered = render_pool.submit(
+                render_result, df, interpretation, chart_path).result()
+        else:
+            rendered = render_result(df, interpretation, chart_path)
+        record.update(rendered)
+        step = mark("render", step)
+
+        if with_insights:
+            record["insights"] = agents.generate_insights(df, item["question"])
+            step = mark("insights", step)
+
+        record["success"] = not df.empty
+
+    except QueryCancelledError as e:
+        record["error"] = str(e)
+        record["error_details"] = e.to_dict()
+    except Exception as e:
+        logger.error(f"Erro na pergunta {item['id']}: {e}")
+        record["error"] = str(e)
+
+    timings["total"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def write_parquet(records: List[Dict[str, Any]], path: Path):
+    """
+    Grava os resultados em Parquet, com campos aninhados como JSON.
+
+    Args:
+        records: Resultados
+        path: Arquivo de destino
+    """
+    rows = []
+    for record in records:
+        row = dict(record)
+        for key in ("rows", "interpretation", "timings", "error_details"):
+            if key in row:
+                row[key] = json.dumps(row[key], ensure_ascii=False, default=str)
+        for stage, seconds in record.get("timings", {}).items():
+            row[f"time_{stage}"] = seconds
+        rows.append(row)
+    pd.DataFrame(rows).to_parquet(path, index=False)
+
+
+def build_llm(spec: Optional[str] = None):
+    """
+    Cria o LLM usado no lote.
+
+    Args:
+        spec: "módulo:função" que retorna o LLM; None usa OpenAI com a
+            chave de OPENAI_API_KEY
+
+    Returns:
+        Objeto LLM compatível com AgentsManager
+    """
+    if spec:
+        module_name, _, factory = spec.partition(":")
+        return getattr(importlib.import_module(module_name), factory)()
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Defina OPENAI_API_KEY ou use --llm módulo:função")
+    from langchain.llms import OpenAI
+    return OpenAI(
+        openai_api_key=api_key,
+        temperature=0.3,
+        max_tokens=2000,
+        model="gpt-3.5-turbo-instruct"
+    )
+
+
+def run_batch(questions: List[Dict[str, str]], agents: AgentsManager,
+              output: Path, fmt: str = "jsonl", workers: int = 8,
+              processes: int = 2, charts_dir: Optional[Path] = None,
+              max_rows: int = 100, with_insights: bool = False,
+              resume: bool = True, retry_failed: bool = False) -> Dict[str, Any]:
+    """
+    Responde as perguntas em paralelo, gravando um checkpoint por resultado.
+
+    Args:
+        questions: Perguntas (``load_questions``)
+        agents: AgentsManager compartilhado pelas threads
+        output: Arquivo de saída (.jsonl ou .parquet)
+        fmt: "jsonl" ou "parquet"
+        workers: Threads para LLM e banco
+        processes: Processos para resumo e gráficos (0 = nas threads)
+        charts_dir: Diretório dos gráficos PNG (None = sem gráficos)
+        max_rows: Linhas do resultado incluídas em cada registro
+        with_insights: Gera também a narrativa do LLM
+        resume: Reaproveita resultados de uma execução anterior
+        retry_failed: Refaz perguntas que falharam na execução anterior
+
+    Returns:
+        Dict com total, concluídas, puladas, falhas e tempo
+    """
+    # Em JSONL a própria saída é o checkpoint; Parquet é gerado no final
+    checkpoint = output if fmt == "jsonl" else output.with_suffix(".checkpoint.jsonl")
+    if not resume:
+        checkpoint.unlink(missing_ok=True)
+
+    previous = load_checkpoint(checkpoint)
+    if fmt == "parquet" and resume and output.exists() and not previous:
+        for record in pd.read_parquet(output).to_dict("records"):
+            for key in ("rows", "interpretation", "timings", "error_details"):
+                if isinstance(record.get(key), str):
+                    record[key] = json.loads(record[key])
+            record = {k: v for k, v in record.items()
+                      if not k.startswith("time_") and not (isinstance(v, float) and v != v)}
+            previous[str(record["id"])] = record
+
+    done: Set[str] = {
+        item_id for item_id, record in previous.items()
+        if record.get("error") is None or not retry_failed}
+    pending = [item for item in questions if item["id"] not in done]
+    logger.info(
+        f"Lote: {len(questions)} perguntas, {len(questions) - len(pending)} "
+        f"já respondidas, {len(pending)} pendentes")
+
+    if charts_dir is not None:
+        charts_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    results = {item_id: previous[item_id] for item_id in done if item_id in previous}
+    failures = 0
+    writer = CheckpointWriter(checkpoint)
+    render_pool = None
+    if processes > 0:
+        # spawn: o processo principal já tem threads (pool do banco, LLM)
+        render_pool = ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_renderer,
+            initargs=(str(agents.db.db_path),))
+    else:
+        _init_renderer(str(agents.db.db_path))
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix="batch") as executor:
+            futures = {
+                executor.submit(answer_question, agents, item, render_pool,
+                                charts_dir, max_rows, with_insights): item
+                for item in pending}
+            for count, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                writer.write(record)
+                results[record["id"]] = record
+                if record["error"] is not None:
+                    failures += 1
+                status = "ok" if record["error"] is None else f"erro: {record['error']}"
+                logger.info(
+                    f"[{count}/{len(pending)}] {record['id']} "
+                    f"{record['timings']['total']:.2f}s {status}")
+    finally:
+        writer.close()
+        if render_pool is not None:
+            render_pool.shutdown(cancel_futures=True)
+
+    if fmt == "parquet":
+        ordered = [results[item["id"]] for item in questions if item["id"] in results]
+        write_parquet(ordered, output)
+        checkpoint.unlink(missing_ok=True)
+
+    summary = {
+        "total": len(questions),
+        "completed": len(pending),
+        "skipped": len(questions) - len(pending),
+        "failed": failures,
+        "elapsed": round(time.perf_counter() - start, 3),
+        "output": str(output),
+    }
+    logger.info(f"Lote concluído: {summary}")
+    return summary
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Responde um arquivo JSONL de perguntas sem a interface.")
+    parser.add_argument("questions", type=Path, help="Arquivo JSONL de perguntas")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="Arquivo de saída (padrão: <entrada>.results.<formato>)")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None,
+                        help="Formato da saída (padrão: pela extensão ou jsonl)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Threads para LLM e banco")
+    parser.add_argument("--processes", type=int,
+                        default=min(4, os.cpu_count() or 1),
+                        help="Processos para resumo e gráficos (0 = nas threads)")
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH),
+                        help="Banco SQLite")
+    parser.add_argument("--charts-dir", type=Path,
+                        help="Salva um gráfico PNG por pergunta neste diretório")
+    parser.add_argument("--max-rows", type=int, default=100,
+                        help="Linhas do resultado incluídas em cada registro")
+    parser.add_argument("--insights", action="store_true",
+                        help="Gera também a narrativa do LLM")
+    parser.add_argument("--timeout", type=float,
+                        default=float(os.getenv("QUERY_TIMEOUT", "60")),
+                        help="Tempo máximo de cada query em segundos")
+    parser.add_argument("--llm", help="LLM alternativo no formato módulo:função")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Ignora resultados de uma execução anterior")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Refaz as perguntas que falharam antes")
+    parser.add_argument("--metrics-file", type=Path,
+                        help="Grava as métricas (formato Prometheus) ao final")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "parquet" if args.output and args.output.suffix == ".parquet" else "jsonl"
+    output = args.output or args.questions.with_suffix(f".results.{fmt}")
+
+    questions = load_questions(args.questions)
+    database = DatabaseManager(args.db, query_timeout=args.timeout)
+    agents = AgentsManager(build_llm(args.llm), database_manager=database)
+    try:
+        summary = run_batch(
+            questions, agents, output, fmt=fmt, workers=args.workers,
+            processes=args.processes, charts_dir=args.charts_dir,
+            max_rows=args.max_rows, with_insights=args.insights,
+            resume=not args.no_resume, retry_failed=args.retry_failed)
+    finally:
+        database.close()
+        if args.metrics_file:
+            REGISTRY.write_textfile(args.metrics_file)
+
+    print(json.dumps(summary, ensure_ascii=False))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
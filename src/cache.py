@@ -0,0 +1,222 @@
+import re
+import time
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional, Tuple, Union
+
+import pandas as pd
+
+try:
+    from .metrics import CACHE_REQUESTS
+except ImportError:
+    from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Literais de string e identificadores entre aspas não são normalizados
+_SQL_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normaliza uma query SQL para uso como chave de cache.
+
+    Colapsa espaços em branco e converte para minúsculas tudo o que está
+    fora de literais entre aspas, removendo o ponto e vírgula final.
+
+    Args:
+        query: Query SQL
+
+    Returns:
+        Query normalizada
+    """
+    parts = _SQL_QUOTED.split(query.strip().rstrip(';').strip())
+    normalized = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            normalized.append(part)
+        else:
+            normalized.append(re.sub(r"\s+", " ", part).lower())
+    return "".join(normalized).strip()
+
+
+def make_cache_key(query: str, params: Any = None) -> Tuple[str, str]:
+    """
+    Monta a chave de cache de uma query e seus parâmetros.
+
+    Args:
+        query: Query SQL
+        params: Parâmetros da query (opcional)
+
+    Returns:
+        Tuple (query normalizada, representação dos parâmetros)
+    """
+    return normalize_sql(query), repr(params) if params else ""
+
+
+def file_version(db_path: Union[str, Path]) -> Tuple[int, int]:
+    """
+    Retorna o mtime (ns) do arquivo do banco e do seu WAL.
+
+    Args:
+        db_path: Caminho do banco de dados
+
+    Returns:
+        Tuple (mtime do banco, mtime do -wal), 0 quando não existem
+    """
+    path = Path(db_path)
+    versions = []
+    for candidate in (path, path.with_name(path.name + "-wal")):
+        try:
+            versions.append(candidate.stat().st_mtime_ns)
+        except OSError:
+            versions.append(0)
+    return tuple(versions)
+
+
+def dataframe_nbytes(df: pd.DataFrame) -> int:
+    """Estimativa do tamanho em memória de um DataFrame."""
+    try:
+        return int(df.memory_usage(index=True, deep=True).sum())
+    except Exception:
+        return 0
+
+
+class QueryResultCache:
+    """
+    Cache LRU com TTL para resultados de queries.
+
+    As entradas pertencem a uma versão do banco (``PRAGMA data_version``
+    e mtime do arquivo); quando a versão muda, o cache inteiro é
+    invalidado. O total de bytes armazenados é limitado por ``max_bytes``.
+    """
+
+    def __init__(self,
+                 max_entries: int = 256,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 ttl: Optional[float] = 300.0):
+        """
+        Inicializa o cache.
+
+        Args:
+            max_entries: Número máximo de resultados armazenados
+            max_bytes: Limite de memória ocupada pelos DataFrames
+            ttl: Tempo de vida de cada entrada em segundos (None = sem TTL)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: Hashable):
+        """Descarta todas as entradas se a versão do banco mudou."""
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logger.info("Cache de resultados invalidado: banco alterado")
+            self._entries.clear()
+            self._bytes = 0
+            self._version = version
+
+    def _remove(self, key: Hashable):
+        _, nbytes, _ = self._entries.pop(key)
+        self._bytes -= nbytes
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[pd.DataFrame]:
+        """
+        Busca um resultado no cache.
+
+        Args:
+            key: Chave gerada por ``make_cache_key``
+            version: Versão atual do banco
+
+        Returns:
+            Cópia do DataFrame armazenado ou None
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="results", result="miss")
+                return None
+
+            df, _, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache="results", result="miss")
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_REQUESTS.inc(cache="results", result="hit")
+
+        return df.copy()
+
+    def put(self, key: Hashable, version: Hashable, df: pd.DataFrame):
+        """
+        Armazena um resultado no cache.
+
+        Args:
+            key: Chave gerada por ``make_cache_key``
+            version: Versão do banco em que o resultado foi obtido
+            df: Resultado da query
+        """
+        nbytes = dataframe_nbytes(df)
+        if nbytes > self.max_bytes:
+            return
+
+        with self._lock:
+            self._check_version(version)
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (df.copy(), nbytes, time.monotonic())
+            self._bytes += nbytes
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso do cache.
+
+        Returns:
+            Dict com acertos, falhas, evicções e ocupação
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
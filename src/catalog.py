@@ -0,0 +1,299 @@
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def quote_identifier(name: str) -> str:
+    """Escapa um nome de tabela/coluna para uso em SQL."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SchemaCatalog:
+    """
+    Catálogo em cache das tabelas, colunas e contagens de linhas.
+
+    A estrutura é recarregada apenas quando ``PRAGMA schema_version`` muda;
+    as contagens estimadas são recalculadas quando ``PRAGMA data_version``
+    muda. As estimativas vêm de ``sqlite_stat1`` (quando ANALYZE foi
+    executado) ou de ``max(rowid)``, ambas sem varrer as tabelas. Contagens
+    exatas (``COUNT(*)``) só são feitas sob demanda, opcionalmente em uma
+    thread de fundo, e valem até a próxima alteração dos dados.
+    """
+
+    def __init__(self, pool):
+        """
+        Args:
+            pool: ConnectionPool usado para ler o catálogo
+        """
+        self.pool = pool
+        self._lock = threading.RLock()
+
+        self._tables: Optional[Dict[str, Dict[str, List[str]]]] = None
+        self._schema_version = None
+        self._data_version = None
+        self._estimates: Dict[str, Dict[str, Any]] = {}
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+
+        self.schema_loads = 0
+        self.estimate_runs = 0
+        self.exact_runs = 0
+
+    def _load_tables(self, conn: sqlite3.Connection) -> Dict[str, Dict[str, List[str]]]:
+        """Lê tabelas e colunas em uma única consulta."""
+        rows = conn.execute("""
+            SELECT m.name, p.name, p.type
+            FROM sqlite_master AS m
+            JOIN pragma_table_info(m.name) AS p
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.name, p.cid
+        """).fetchall()
+
+        tables = {}
+        for table, column, col_type in rows:
+            info = tables.setdefault(table, {'columns': [], 'types': []})
+            info['columns'].append(column)
+            info['types'].append(col_type)
+        return tables
+
+    def _estimate_counts(self, conn: sqlite3.Connection,
+                         tables: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Estimativas baratas de linhas: sqlite_stat1 ou max(rowid)."""
+        stat1 = {}
+        try:
+            for table, stat in conn.execute(
+                    "SELECT tbl, stat FROM sqlite_stat1"):
+                # O primeiro número de ``stat`` é o total de linhas da tabela
+                first = (stat or "").split(" ", 1)[0]
+                if first.isdigit():
+                    stat1[table] = max(stat1.get(table, 0), int(first))
+        except sqlite3.Error:
+            pass  # ANALYZE nunca foi executado
+
+        now = time.time()
+        estimates = {}
+        for table in tables:
+            if table in stat1:
+                estimates[table] = {'count': stat1[table], 'source': 'stat1',
+                                    'updated_at': now}
+                continue
+            try:
+                row = conn.execute(
+                    f"SELECT max(rowid) FROM {quote_identifier(table)}").fetchone()
+                count = int(row[0] or 0)
+                source = 'rowid'
+            except sqlite3.Error:
+                # Tabelas WITHOUT ROWID não têm estimativa barata
+                count = None
+                source = 'unknown'
+            estimates[table] = {'count': count, 'source': source,
+                                'updated_at': now}
+        return estimates
+
+    def refresh(self, force: bool = False):
+        """
+        Recarrega o que estiver desatualizado.
+
+        A espera por uma conexão e as leituras rodam fora do lock; o lock só
+        protege a comparação de versões e a troca pelo catálogo novo, para
+        que consultas ao catálogo não fiquem presas atrás de um checkout
+        lento do pool.
+
+        Args:
+            force: Recarrega estrutura e estimativas mesmo sem mudanças
+        """
+        with self.pool.reader() as conn:
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            data_version = self.pool.data_version()
+
+            with self._lock:
+                schema_changed = force or schema_version != self._schema_version
+                if not schema_changed and data_version == self._data_version:
+                    return
+                tables = self._tables
+
+            if schema_changed:
+                tables = self._load_tables(conn)
+            estimates = self._estimate_counts(conn, tables)
+
+        with self._lock:
+            if not force:
+                if (self._schema_version is not None
+                        and schema_version < self._schema_version):
+                    return  # Outra thread já trocou por um schema mais novo
+                if (schema_version == self._schema_version
+                        and data_version == self._data_version):
+                    return  # Outra thread já carregou estas versões
+                if not schema_changed and schema_version != self._schema_version:
+                    return  # Estimativas feitas sobre uma estrutura antiga
+
+            if schema_changed:
+                self._tables = tables
+                self._schema_version = schema_version
+                self.schema_loads += 1
+                logger.info(f"Catálogo carregado: {list(tables)}")
+            self._estimates = estimates
+            self._data_version = data_version
+            self.estimate_runs += 1
+
+    def invalidate(self):
+        """Descarta o cache; a próxima leitura recarrega tudo."""
+        with self._lock:
+            self._schema_version = None
+            self._data_version = None
+            self._exact.clear()
+
+    def tables(self) -> Dict[str, Dict[str, List[str]]]:
+        """
+        Retorna a estrutura das tabelas.
+
+        Returns:
+            Dict tabela -> {'columns': [...], 'types': [...]}
+        """
+        self.refresh()
+        return {name: {'columns': list(info['columns']), 'types': list(info['types'])}
+                for name, info in self._tables.items()}
+
+    def table_names(self) -> List[str]:
+        """Nomes das tabelas em ordem alfabética."""
+        self.refresh()
+        return list(self._tables)
+
+    def row_counts(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Retorna a melhor contagem disponível de cada tabela.
+
+        Contagens exatas feitas na versão atual dos dados têm precedência
+        sobre as estimativas.
+
+        Returns:
+            Dict tabela -> {'count', 'source', 'exact', 'updated_at'}
+        """
+        self.refresh()
+        with self._lock:
+            counts = {}
+            for table in self._tables:
+                exact = self._exact.get(table)
+                if exact is not None and exact['data_version'] == self._data_version:
+                    counts[table] = {'count': exact['count'], 'source': 'exact',
+                                     'exact': True, 'updated_at': exact['updated_at']}
+                else:
+                    estimate = self._estimates.get(
+                        table, {'count': None, 'source': 'unknown', 'updated_at': None})
+                    counts[table] = {**estimate, 'exact': False}
+            return counts
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Estrutura e contagens no formato de ``get_database_schema``.
+
+        Returns:
+            Dict tabela -> columns, types, count, count_source, count_exact
+        """
+        tables = self.tables()
+        counts = self.row_counts()
+        return {
+            name: {
+                'columns': info['columns'],
+                'types': info['types'],
+                'count': counts[name]['count'] or 0,
+                'count_source': counts[name]['source'],
+                'count_exact': counts[name]['exact'],
+                'count_updated_at': counts[name]['updated_at'],
+            }
+            for name, info in tables.items()
+        }
+
+    def count_snapshot(self) -> Dict[str, Any]:
+        """
+        Resumo das contagens atuais, sem varrer tabelas.
+
+        Returns:
+            Dict com total_records, contagem por tabela, se todas são
+            exatas, origem e o instante da contagem mais antiga
+        """
+        counts = self.row_counts()
+        sources = {info['source'] for info in counts.values()}
+        timestamps = [info['updated_at'] for info in counts.values()
+                      if info['updated_at'] is not None]
+        return {
+            'total_records': sum(info['count'] or 0 for info in counts.values()),
+            'tables': {name: info['count'] for name, info in counts.items()},
+            'exact': bool(counts) and all(info['exact'] for info in counts.values()),
+            'source': sources.pop() if len(sources) == 1 else 'mixed',
+            'taken_at': min(timestamps) if timestamps else None,
+            'data_version': self._data_version,
+        }
+
+    def _count_exact(self, tables: List[str]):
+        """Executa COUNT(*) nas tabelas e guarda o resultado com a versão dos dados."""
+        for table in tables:
+            try:
+                data_version = self.pool.data_version()
+                with self.pool.reader() as conn:
+                    count = conn.execute(
+                        f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+                with self._lock:
+                    self._exact[table] = {'count': int(count),
+                                          'data_version': data_version,
+                                          'updated_at': time.time()}
+            except Exception as e:
+                logger.warning(f"Erro na contagem exata de {table}: {e}")
+        with self._lock:
+            self.exact_runs += 1
+        logger.info(f"Contagem exata concluída: {len(tables)} tabelas")
+
+    def refresh_exact_counts(self, background: bool = True,
+                             tables: Optional[List[str]] = None
+                             ) -> Optional[threading.Thread]:
+        """
+        Calcula as contagens exatas com COUNT(*).
+
+        Args:
+            background: Executa em uma thread daemon e retorna imediatamente
+            tables: Tabelas a contar (padrão: todas)
+
+        Returns:
+            Thread em execução (modo background) ou None
+        """
+        tables = list(tables) if tables is not None else self.table_names()
+
+        if not background:
+            self._count_exact(tables)
+            return None
+
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+            self._refresh_thread = threading.Thread(
+                target=self._count_exact, args=(tables,),
+                name="schema-exact-counts", daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+
+    @property
+    def refreshing(self) -> bool:
+        """Indica se há uma contagem exata em andamento."""
+        thread = self._refresh_thread
+        return thread is not None and thread.is_alive()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Contadores de recarga do catálogo.
+
+        Returns:
+            Dict com recargas de estrutura, estimativas e contagens exatas
+        """
+        with self._lock:
+            return {
+                'schema_version': self._schema_version,
+                'data_version': self._data_version,
+                'schema_loads': self.schema_loads,
+                'estimate_runs': self.estimate_runs,
+                'exact_runs': self.exact_runs,
+                'refreshing': self.refreshing,
+            }
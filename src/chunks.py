@@ -0,0 +1,200 @@
+import io
+import math
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+
+import pandas as pd
+
+DataChunks = Union[pd.DataFrame, Iterable[pd.DataFrame]]
+
+
+def iter_chunks(data: DataChunks) -> Iterator[pd.DataFrame]:
+    """
+    Normaliza a entrada para uma sequência de blocos.
+
+    Args:
+        data: DataFrame único ou iterável de DataFrames
+
+    Yields:
+        DataFrames
+    """
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+
+def head_and_count(data: DataChunks, n: int) -> Tuple[pd.DataFrame, int]:
+    """
+    Guarda apenas as primeiras ``n`` linhas e conta o total.
+
+    Args:
+        data: DataFrame ou iterável de DataFrames
+        n: Número de linhas a manter
+
+    Returns:
+        Tuple (primeiras linhas, total de linhas)
+    """
+    head = []
+    kept = 0
+    total = 0
+    columns = None
+    for chunk in iter_chunks(data):
+        if columns is None:
+            columns = chunk.columns
+        if kept < n:
+            part = chunk.head(n - kept)
+            head.append(part)
+            kept += len(part)
+        total += len(chunk)
+
+    if not head:
+        return pd.DataFrame(columns=columns), 0
+    return pd.concat(head, ignore_index=True), total
+
+
+def iter_csv(data: DataChunks, **to_csv_kwargs) -> Iterator[str]:
+    """
+    Serializa blocos em CSV, escrevendo o cabeçalho apenas uma vez.
+
+    Args:
+        data: DataFrame ou iterável de DataFrames
+        **to_csv_kwargs: Argumentos repassados a ``DataFrame.to_csv``
+
+    Yields:
+        Trechos de texto CSV
+    """
+    to_csv_kwargs.setdefault("index", False)
+    header = to_csv_kwargs.pop("header", True)
+    for chunk in iter_chunks(data):
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, header=header, **to_csv_kwargs)
+        header = False
+        yield buffer.getvalue()
+
+
+class ChunkedStats:
+    """
+    Estatísticas descritivas acumuladas bloco a bloco.
+
+    Mantém soma, mínimo, máximo, média e variância (Chan et al.) das
+    colunas numéricas e contagens de valores das colunas categóricas, de
+    modo que a memória depende do tamanho do bloco e não do resultado.
+    Colunas com mais de ``max_categories`` valores distintos têm as
+    contagens aproximadas (mantidos apenas os mais frequentes).
+    """
+
+    def __init__(self, max_categories: int = 10000):
+        """
+        Args:
+            max_categories: Máximo de valores distintos rastreados por coluna
+        """
+        self.max_categories = max_categories
+        self.rows = 0
+        self.columns: List[str] = []
+        self.numeric_columns: List[str] = []
+        self.categorical_columns: List[str] = []
+        self._numeric: Dict[str, Dict[str, float]] = {}
+        self._counts: Dict[str, Counter] = {}
+        self.approximate: set = set()
+
+    def _init_columns(self, chunk: pd.DataFrame):
+        self.columns = list(chunk.columns)
+        self.numeric_columns = list(
+            chunk.select_dtypes(include=['number']).columns)
+        self.categorical_columns = list(
+            chunk.select_dtypes(include=['object']).columns)
+        for col in self.numeric_columns:
+            self._numeric[col] = {
+                "count": 0, "sum": 0.0, "mean": 0.0, "m2": 0.0,
+                "min": math.inf, "max": -math.inf}
+        for col in self.categorical_columns:
+            self._counts[col] = Counter()
+
+    def update(self, chunk: pd.DataFrame):
+        """
+        Acumula um bloco.
+
+        Args:
+            chunk: DataFrame com as mesmas colunas dos blocos anteriores
+        """
+        if not self.columns:
+            if chunk.empty and not len(chunk.columns):
+                return
+            self._init_columns(chunk)
+        self.rows += len(chunk)
+
+        for col in self.numeric_columns:
+            values = pd.to_numeric(chunk[col], errors='coerce').dropna()
+            n = len(values)
+            if not n:
+                continue
+            acc = self._numeric[col]
+            mean = float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+            total = acc["count"] + n
+            delta = mean - acc["mean"]
+            acc["m2"] += m2 + delta ** 2 * acc["count"] * n / total
+            acc["mean"] += delta * n / total
+            acc["count"] = total
+            acc["sum"] += float(values.sum())
+            acc["min"] = min(acc["min"], float(values.min()))
+            acc["max"] = max(acc["max"], float(values.max()))
+
+        for col in self.categorical_columns:
+            counts = self._counts[col]
+            counts.update(chunk[col].value_counts().to_dict())
+            if len(counts) > self.max_categories:
+                self._counts[col] = Counter(
+                    dict(counts.most_common(self.max_categories)))
+                self.approximate.add(col)
+
+    def consume(self, data: DataChunks) -> "ChunkedStats":
+        """
+        Acumula todos os blocos de um iterável.
+
+        Args:
+            data: DataFrame ou iterável de DataFrames
+
+        Returns:
+            A própria instância
+        """
+        for chunk in iter_chunks(data):
+            self.update(chunk)
+        return self
+
+    def numeric_stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Retorna total, média, máximo, mínimo e desvio padrão por coluna.
+
+        Returns:
+            Dict no mesmo formato usado pelos insights do app
+        """
+        stats = {}
+        for col, acc in self._numeric.items():
+            if not acc["count"]:
+                continue
+            stats[col] = {
+                "total": acc["sum"],
+                "average": acc["mean"],
+                "max": acc["max"],
+                "min": acc["min"],
+                "std": math.sqrt(acc["m2"] / (acc["count"] - 1))
+                if acc["count"] > 1 else 0
+            }
+        return stats
+
+    def top_values(self, n: int = 3) -> Dict[str, Dict[str, int]]:
+        """
+        Retorna os valores mais frequentes de cada coluna categórica.
+
+        Args:
+            n: Quantidade de valores por coluna
+
+        Returns:
+            Dict coluna -> {valor: contagem}
+        """
+        return {
+            col: {str(value): int(count) for value, count in counts.most_common(n)}
+            for col, counts in self._counts.items()
+        }
@@ -1,8 +1,17 @@
 import sqlite3
+import time
 import pandas as pd
 from pathlib import Path
 import logging
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .pool import ConnectionPool, DEFAULT_PRAGMA_PROFILE, resolve_pragmas
+from .cache import QueryResultCache, make_cache_key, file_version
+from .sql_rewrite import SQLRewriteError, strip_limit
+from .query_guard import QueryCancelledError, QueryRegistry
+from .catalog import SchemaCatalog
+from .timing import timed
+from .metrics import SQL_ROWS, SQL_ROWS_AVAILABLE
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -12,15 +21,44 @@ logger = logging.getLogger(__name__)
 class DatabaseManager:
     """Gerenciador de conexão e operações com banco de dados SQLite."""
 
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pool_size: int = 8,
+                 checkout_timeout: float = 30.0,
+                 pragma_profile: Optional[str] = DEFAULT_PRAGMA_PROFILE,
+                 pragmas: Optional[Dict] = None,
+                 result_cache: Optional[QueryResultCache] = None,
+                 cache_results: bool = True,
+                 query_timeout: Optional[float] = 60.0,
+                 max_vm_steps: Optional[int] = None):
         """
         Inicializa o gerenciador de banco de dados.
 
         Args:
             db_path (str): Caminho para o arquivo do banco de dados
+            pool_size (int): Máximo de conexões de leitura simultâneas
+            checkout_timeout (float): Espera máxima por uma conexão livre (segundos)
+            pragma_profile (str, optional): Perfil de PRAGMAs aplicado nas conexões
+            pragmas (Dict, optional): PRAGMAs que sobrescrevem o perfil
+            result_cache (QueryResultCache, optional): Cache de resultados
+                compartilhado; se None, cria um cache próprio
+            cache_results (bool): Habilita o cache de resultados de execute_query
+            query_timeout (float, optional): Tempo máximo de execução de cada
+                query em segundos (None = sem limite)
+            max_vm_steps (int, optional): Máximo de instruções da VM do SQLite
+                por query (None = sem limite)
         """
         self.db_path = Path(db_path)
-        self.connection = None
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.pragma_profile = pragma_profile
+        self.pragmas = resolve_pragmas(pragma_profile, pragmas)
+        self.result_cache = None
+        if cache_results:
+            self.result_cache = result_cache or QueryResultCache()
+        self.query_timeout = query_timeout
+        self.max_vm_steps = max_vm_steps
+        self._queries = QueryRegistry()
+        self.pool = None
+        self.catalog = None
         self._ensure_db_exists()
 
     def _ensure_db_exists(self):
@@ -32,31 +70,93 @@ class DatabaseManager:
 
     def connect(self) -> bool:
         """
-        Estabelece conexão com o banco de dados.
+        Cria o pool de conexões com o banco de dados.
 
         Returns:
             bool: True se conexão foi estabelecida com sucesso
         """
+        if self.pool:
+            return True
+
         try:
-            self.connection = sqlite3.connect(
-                str(self.db_path),
-                check_same_thread=False,
-                timeout=30.0
+            pool = ConnectionPool(
+                self.db_path,
+                max_readers=self.pool_size,
+                timeout=30.0,
+                checkout_timeout=self.checkout_timeout,
+                pragmas=self.pragmas
             )
-            self.connection.row_factory = sqlite3.Row
-            logger.info(f"Conexão estabelecida com {self.db_path}")
+            # Validar abrindo a conexão de escrita (aplica journal_mode)
+            pool.initialize()
+            self.pool = pool
+            self.catalog = SchemaCatalog(pool)
+            logger.info(
+                f"Conexão estabelecida com {self.db_path} "
+                f"(pool de {self.pool_size} leitores)")
             return True
         except Exception as e:
             logger.error(f"Erro ao conectar ao banco: {e}")
             return False
 
     def disconnect(self):
-        """Fecha a conexão com o banco de dados."""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Fecha todas as conexões do pool."""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+            self.catalog = None
             logger.info("Conexão fechada")
 
+    def pool_metrics(self) -> Dict:
+        """
+        Retorna métricas do pool de conexões.
+
+        Returns:
+            Dict: Tamanho do pool, checkouts e tempos de espera
+        """
+        if not self.pool:
+            return {}
+        return self.pool.metrics()
+
+    def cache_stats(self) -> Dict:
+        """
+        Retorna contadores do cache de resultados.
+
+        Returns:
+            Dict: Acertos, falhas, evicções e bytes ocupados
+        """
+        if not self.result_cache:
+            return {}
+        return self.result_cache.stats()
+
+    def cancel(self) -> int:
+        """
+        Interrompe todas as queries em execução neste gerenciador.
+
+        As queries interrompidas levantam QueryCancelledError com
+        reason="cancelled".
+
+        Returns:
+            int: Número de queries canceladas
+        """
+        cancelled = self._queries.cancel_all()
+        if cancelled:
+            logger.warning(f"{cancelled} query(s) cancelada(s)")
+        return cancelled
+
+    def _guard(self, conn: sqlite3.Connection, query: str,
+               timeout: Optional[float] = None,
+               max_vm_steps: Optional[int] = None):
+        """Aplica os limites de tempo e de passos da VM a uma execução."""
+        return self._queries.guard(
+            conn,
+            timeout=self.query_timeout if timeout is None else timeout,
+            max_vm_steps=self.max_vm_steps if max_vm_steps is None else max_vm_steps,
+            query=query)
+
+    def _db_version(self) -> tuple:
+        """Versão atual do banco usada para invalidar o cache de resultados."""
+        return (self.pool.data_version(), *file_version(self.db_path))
+
     def __enter__(self):
         """Context manager entry."""
         self.connect()
@@ -66,39 +166,249 @@ class DatabaseManager:
         """Context manager exit."""
         self.disconnect()
 
-    def execute_query(self, query: str, params: tuple = None) -> Optional[pd.DataFrame]:
+    @timed("execute_query")
+    def execute_query(self, query: str, params: tuple = None,
+                      use_cache: bool = True,
+                      timeout: Optional[float] = None,
+                      max_vm_steps: Optional[int] = None) -> Optional[pd.DataFrame]:
         """
         Executa uma query SQL e retorna o resultado como DataFrame.
 
         Args:
             query (str): Query SQL para executar
             params (tuple, optional): Parâmetros para a query
+            use_cache (bool): Consulta e alimenta o cache de resultados
+            timeout (float, optional): Sobrescreve query_timeout
+            max_vm_steps (int, optional): Sobrescreve max_vm_steps
 
         Returns:
             pd.DataFrame: Resultado da query ou None se erro
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return None
 
         try:
+            cache_key = version = None
+            if use_cache and self.result_cache is not None:
+                cache_key = make_cache_key(query, params)
+                version = self._db_version()
+                cached = self.result_cache.get(cache_key, version)
+                if cached is not None:
+                    logger.info(f"Query servida do cache: {query[:100]}...")
+                    return cached
+
             logger.info(f"Executando query: {query[:100]}...")
 
-            if params:
-                result = pd.read_sql_query(query, self.connection, params=params)
-            else:
-                result = pd.read_sql_query(query, self.connection)
+            with self.pool.reader() as conn, \
+                    self._guard(conn, query, timeout, max_vm_steps):
+                if params:
+                    result = pd.read_sql_query(query, conn, params=params)
+                else:
+                    result = pd.read_sql_query(query, conn)
+            SQL_ROWS.observe(len(result))
 
             logger.info(
                 f"Query executada com sucesso. Resultados: {
                     len(result)} linhas")
+
+            if cache_key is not None:
+                self.result_cache.put(cache_key, version, result)
             return result
 
+        except QueryCancelledError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao executar query: {e}")
             logger.error(f"Query: {query}")
             return None
 
+    def execute_query_iter(self, query: str, params: tuple = None,
+                           chunksize: int = 10000,
+                           timeout: Optional[float] = None,
+                           max_vm_steps: Optional[int] = None
+                           ) -> Iterator[pd.DataFrame]:
+        """
+        Executa uma query e retorna o resultado em blocos de DataFrame.
+
+        A conexão fica emprestada enquanto o iterador estiver ativo e no
+        máximo ``chunksize`` linhas ficam em memória por vez. O tempo gasto
+        pelo consumidor entre blocos não conta para o tempo limite. Uma
+        query sem resultados produz um único bloco vazio com as colunas.
+
+        Args:
+            query (str): Query SQL para executar
+            params (tuple, optional): Parâmetros para a query
+            chunksize (int): Número de linhas por bloco
+            timeout (float, optional): Sobrescreve query_timeout
+            max_vm_steps (int, optional): Sobrescreve max_vm_steps
+
+        Yields:
+            pd.DataFrame: Blocos do resultado
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
+        """
+        for rows, columns in self._iter_rows(
+                query, params, chunksize, timeout, max_vm_steps):
+            yield pd.DataFrame.from_records(
+                rows, columns=columns, coerce_float=True)
+
+    def _iter_rows(self, query: str, params: Optional[tuple], batch_size: int,
+                   timeout: Optional[float], max_vm_steps: Optional[int]
+                   ) -> Iterator[Tuple[List[tuple], List[str]]]:
+        """Lê o resultado de uma query em lotes de tuplas a partir do cursor."""
+        if batch_size < 1:
+            raise ValueError("O tamanho do bloco deve ser pelo menos 1")
+
+        if not self.pool:
+            if not self.connect():
+                raise ConnectionError(f"Falha na conexão com {self.db_path}")
+
+        logger.info(f"Executando query em blocos de {batch_size}: {query[:100]}...")
+
+        try:
+            with self.pool.reader() as conn, \
+                    self._guard(conn, query, timeout, max_vm_steps) as guard:
+                cursor = conn.cursor()
+                cursor.execute(query, params or ())
+                columns = [d[0] for d in cursor.description]
+
+                batches = 0
+                total = 0
+                while True:
+                    rows = [tuple(row) for row in cursor.fetchmany(batch_size)]
+                    if not rows and batches:
+                        break
+                    batches += 1
+                    total += len(rows)
+
+                    # O tempo do consumidor não conta para o limite da query
+                    guard.pause()
+                    try:
+                        yield rows, columns
+                    finally:
+                        guard.resume()
+
+                    if len(rows) < batch_size:
+                        break
+                cursor.close()
+
+            logger.info(f"Query em blocos concluída: {total} linhas em {batches} blocos")
+
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar query em blocos: {e}")
+            logger.error(f"Query: {query}")
+            raise
+
+    @timed("execute_query")
+    def execute_query_with_total(self, query: str, limit: int,
+                                 params: tuple = None,
+                                 strategy: str = "cursor",
+                                 use_cache: bool = True,
+                                 timeout: Optional[float] = None,
+                                 max_vm_steps: Optional[int] = None
+                                 ) -> Tuple[Optional[pd.DataFrame], int]:
+        """
+        Retorna as primeiras ``limit`` linhas e o total de linhas da query
+        em uma única execução, sem materializar o resultado completo.
+
+        Args:
+            query (str): Query SQL; um LIMIT externo é descartado
+            limit (int): Número de linhas a retornar
+            params (tuple, optional): Parâmetros para a query
+            strategy (str): "cursor" lê as primeiras linhas e continua
+                contando no mesmo cursor (memória constante); "window" usa
+                COUNT(*) OVER () e deixa a contagem para o SQLite
+            use_cache (bool): Consulta e alimenta o cache de resultados
+            timeout (float, optional): Sobrescreve query_timeout; vale para a
+                leitura e a contagem juntas
+            max_vm_steps (int, optional): Sobrescreve max_vm_steps
+
+        Returns:
+            Tuple (DataFrame com até ``limit`` linhas ou None se erro, total)
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
+        """
+        if strategy not in ("cursor", "window"):
+            raise ValueError(f"Estratégia de contagem inválida: {strategy}")
+
+        if not self.pool:
+            if not self.connect():
+                return None, 0
+
+        try:
+            base_query = strip_limit(query)
+        except SQLRewriteError as e:
+            logger.error(f"Query inválida: {e}")
+            return None, 0
+
+        try:
+            cache_key = version = None
+            if use_cache and self.result_cache is not None:
+                cache_key = make_cache_key(
+                    base_query, ("__with_total__", strategy, limit, params))
+                version = self._db_version()
+                cached = self.result_cache.get(cache_key, version)
+                if cached is not None:
+                    logger.info(f"Query servida do cache: {base_query[:100]}...")
+                    return cached, int(cached.attrs.get('total_count', len(cached)))
+
+            logger.info(f"Executando query com contagem: {base_query[:100]}...")
+
+            with self.pool.reader() as conn, \
+                    self._guard(conn, base_query, timeout, max_vm_steps):
+                cursor = conn.cursor()
+
+                if strategy == "window":
+                    cursor.execute(
+                        f'SELECT *, COUNT(*) OVER () AS "__total_count__" '
+                        f'FROM ({base_query}) LIMIT ?',
+                        tuple(params or ()) + (limit,))
+                    columns = [d[0] for d in cursor.description][:-1]
+                    rows = cursor.fetchall()
+                    total = rows[0][-1] if rows else 0
+                    rows = [tuple(row)[:-1] for row in rows]
+                else:
+                    cursor.execute(base_query, params or ())
+                    columns = [d[0] for d in cursor.description]
+                    rows = [tuple(row) for row in cursor.fetchmany(limit)] if limit > 0 else []
+                    total = len(rows)
+                    # Continuar contando sem guardar as linhas restantes
+                    while True:
+                        batch = cursor.fetchmany(10000)
+                        if not batch:
+                            break
+                        total += len(batch)
+                cursor.close()
+
+            result = pd.DataFrame.from_records(
+                rows, columns=columns, coerce_float=True)
+            result.attrs['total_count'] = total
+            SQL_ROWS.observe(len(result))
+            SQL_ROWS_AVAILABLE.observe(total)
+
+            logger.info(
+                f"Query executada com sucesso. Resultados: {len(result)} "
+                f"de {total} linhas")
+
+            if cache_key is not None:
+                self.result_cache.put(cache_key, version, result)
+            return result, total
+
+        except QueryCancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Erro ao executar query com contagem: {e}")
+            logger.error(f"Query: {base_query}")
+            return None, 0
+
     def get_table_columns(self, table_name: str) -> List[str]:
         """
         Obtém a lista de colunas de uma tabela específica.
@@ -109,81 +419,114 @@ class DatabaseManager:
         Returns:
             List[str]: Lista de nomes de colunas
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return []
 
         try:
-            query = f"PRAGMA table_info({table_name})"
-            result = self.execute_query(query)
-            
-            if result is not None and len(result) > 0:
-                return result['name'].tolist()
-            return []
-            
+            table = self.catalog.tables().get(table_name)
+            return table['columns'] if table else []
+
         except Exception as e:
             logger.error(f"Erro ao obter colunas da tabela {table_name}: {e}")
             return []
 
-    def get_database_schema(self) -> Dict:
+    def get_database_schema(self, exact_counts: bool = False) -> Dict:
         """
         Obtém o schema completo do banco de dados.
 
+        A estrutura vem do catálogo em cache e só é relida quando o schema
+        muda. As contagens são estimativas baratas (sqlite_stat1/max(rowid)),
+        exceto quando uma contagem exata da versão atual dos dados existe.
+
+        Args:
+            exact_counts (bool): Executa COUNT(*) em todas as tabelas antes
+                de responder (varredura completa)
+
         Returns:
-            Dict: Dicionário com informações das tabelas
+            Dict: Dicionário com informações das tabelas; 'count_source'
+                indica a origem da contagem ('exact', 'stat1', 'rowid')
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return {}
 
         try:
-            schema = {}
-
-            # Obter lista de tabelas
-            tables_query = """
-                SELECT name FROM sqlite_master
-                WHERE type='table' AND name NOT LIKE 'sqlite_%'
-                ORDER BY name
-            """
-            tables_df = self.execute_query(tables_query)
-
-            if tables_df is None or len(tables_df) == 0:
-                return {}
+            if exact_counts:
+                self.catalog.refresh_exact_counts(background=False)
+            return self.catalog.snapshot()
 
-            for _, row in tables_df.iterrows():
-                table_name = row['name']
+        except Exception as e:
+            logger.error(f"Erro ao obter schema: {e}")
+            return {}
 
-                # Obter informações da tabela
-                table_info_query = f"PRAGMA table_info({table_name})"
-                table_info_df = self.execute_query(table_info_query)
+    def refresh_row_counts(self, background: bool = True) -> bool:
+        """
+        Atualiza as contagens exatas de linhas com COUNT(*).
 
-                # Obter contagem de registros
-                count_query = f"SELECT COUNT(*) as count FROM {table_name}"
-                count_df = self.execute_query(count_query)
+        Args:
+            background (bool): Executa em uma thread sem bloquear a chamada
 
-                columns = []
-                types = []
+        Returns:
+            bool: True se a atualização foi iniciada/concluída
+        """
+        if not self.pool:
+            if not self.connect():
+                return False
 
-                if table_info_df is not None:
-                    columns = table_info_df['name'].tolist()
-                    types = table_info_df['type'].tolist()
+        try:
+            self.catalog.refresh_exact_counts(background=background)
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao atualizar contagens: {e}")
+            return False
 
-                record_count = 0
-                if count_df is not None and len(count_df) > 0:
-                    record_count = count_df.iloc[0]['count']
+    def get_schema(self, force_refresh: bool = False) -> Dict[str, List[str]]:
+        """
+        Obtém as tabelas e suas colunas (formato usado pelo AgentsManager).
 
-                schema[table_name] = {
-                    'columns': columns,
-                    'types': types,
-                    'count': record_count
-                }
+        Args:
+            force_refresh (bool): Descarta o catálogo em cache
 
-            return schema
+        Returns:
+            Dict[str, List[str]]: Tabela -> colunas
+        """
+        if not self.pool:
+            if not self.connect():
+                return {}
 
+        try:
+            if force_refresh:
+                self.catalog.invalidate()
+            return {name: info['columns']
+                    for name, info in self.catalog.tables().items()}
         except Exception as e:
             logger.error(f"Erro ao obter schema: {e}")
             return {}
 
+    @timed("validate_query")
+    def validate_query(self, query: str) -> Tuple[bool, str]:
+        """
+        Valida uma query SQL sem executá-la.
+
+        Args:
+            query (str): Query SQL para validar
+
+        Returns:
+            Tuple[bool, str]: (is_valid, mensagem de erro)
+        """
+        if not self.pool:
+            if not self.connect():
+                return False, "Falha na conexão"
+
+        try:
+            with self.pool.reader() as conn:
+                # EXPLAIN compila a query sem executá-la
+                conn.execute(f"EXPLAIN {query}")
+            return True, "Query válida"
+        except Exception as e:
+            return False, str(e)
+
     def get_all_tables(self) -> List[str]:
         """
         Obtém lista de todas as tabelas no banco.
@@ -191,32 +534,41 @@ class DatabaseManager:
         Returns:
             List[str]: Lista com nomes das tabelas
         """
-        try:
-            query = """
-                SELECT name FROM sqlite_master
-                WHERE type='table' AND name NOT LIKE 'sqlite_%'
-                ORDER BY name
-            """
-            result = self.execute_query(query)
-
-            if result is not None and len(result) > 0:
-                return result['name'].tolist()
-            else:
+        if not self.pool:
+            if not self.connect():
                 return []
 
+        try:
+            return self.catalog.table_names()
+
         except Exception as e:
             logger.error(f"Erro ao obter tabelas: {e}")
             return []
 
-    def health_check(self) -> Dict:
+    def health_check(self, mode: str = "fast",
+                     integrity_check: bool = False) -> Dict:
         """
         Verifica a saúde do banco de dados.
 
+        No modo "fast" (padrão) nenhuma tabela é varrida: o total de
+        registros vem do catálogo (estimativas por metadados ou a última
+        contagem exata ainda válida). O modo "exact" executa COUNT(*) em
+        todas as tabelas.
+
+        Args:
+            mode (str): "fast" ou "exact"
+            integrity_check (bool): Executa ``PRAGMA quick_check``
+
         Returns:
-            Dict: Status do banco de dados
+            Dict: Status do banco de dados; 'counts' traz a origem e o
+                instante das contagens
         """
+        if mode not in ("fast", "exact"):
+            raise ValueError(f"Modo de verificação inválido: {mode}")
+
         health_status = {
             'connected': False,
+            'mode': mode,
             'tables_count': 0,
             'total_records': 0,
             'errors': []
@@ -224,62 +576,98 @@ class DatabaseManager:
 
         try:
             # Verificar conexão
-            if not self.connection:
+            if not self.pool:
                 if not self.connect():
                     health_status['errors'].append("Falha na conexão")
                     return health_status
 
+            with self.pool.reader() as conn:
+                conn.execute("SELECT 1").fetchone()
             health_status['connected'] = True
 
-            # Obter tabelas
-            tables = self.get_all_tables()
-            health_status['tables_count'] = len(tables)
+            if mode == "exact":
+                self.catalog.refresh_exact_counts(background=False)
 
-            # Contar registros totais
-            total_records = 0
-            for table in tables:
-                try:
-                    count_query = f"SELECT COUNT(*) as count FROM {table}"
-                    result = self.execute_query(count_query)
-                    if result is not None and len(result) > 0:
-                        total_records += result.iloc[0]['count']
-                except Exception as e:
-                    health_status['errors'].append(f"Erro na tabela {table}: {e}")
+            snapshot = self.catalog.count_snapshot()
+            health_status['tables_count'] = len(snapshot['tables'])
+            health_status['total_records'] = snapshot['total_records']
+            health_status['counts'] = snapshot
 
-            health_status['total_records'] = total_records
+            if integrity_check:
+                health_status['integrity'] = self.quick_check()
+                if not health_status['integrity']['ok']:
+                    health_status['errors'].extend(
+                        health_status['integrity']['messages'])
+
+            health_status['pool'] = self.pool_metrics()
+            health_status['cache'] = self.cache_stats()
+            health_status['pragmas'] = {
+                'profile': self.pragma_profile,
+                'settings': self.pool.pragma_status()
+            }
 
         except Exception as e:
             health_status['errors'].append(f"Erro geral: {e}")
 
         return health_status
 
-    def execute_raw_query(self, query: str,
-                          params: tuple = None) -> Optional[List[Dict]]:
+    def quick_check(self, max_errors: int = 10) -> Dict:
+        """
+        Executa ``PRAGMA quick_check`` (verificação de integridade sem
+        conferir índices, mais rápida que integrity_check).
+
+        Args:
+            max_errors (int): Máximo de problemas reportados
+
+        Returns:
+            Dict: 'ok', 'messages' e 'elapsed' (segundos)
+        """
+        start = time.perf_counter()
+        with self.pool.reader() as conn:
+            rows = conn.execute(f"PRAGMA quick_check({int(max_errors)})").fetchall()
+        messages = [row[0] for row in rows]
+        return {
+            'ok': messages == ['ok'],
+            'messages': [] if messages == ['ok'] else messages,
+            'elapsed': time.perf_counter() - start,
+        }
+
+    def execute_raw_query(self, query: str, params: tuple = None,
+                          timeout: Optional[float] = None,
+                          max_vm_steps: Optional[int] = None
+                          ) -> Optional[List[Dict]]:
         """
         Executa uma query e retorna resultado como lista de dicionários.
 
         Args:
             query (str): Query SQL
             params (tuple, optional): Parâmetros
+            timeout (float, optional): Sobrescreve query_timeout
+            max_vm_steps (int, optional): Sobrescreve max_vm_steps
 
         Returns:
             List[Dict]: Resultado da query
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return None
 
         try:
-            cursor = self.connection.cursor()
+            with self.pool.reader() as conn, \
+                    self._guard(conn, query, timeout, max_vm_steps):
+                cursor = conn.cursor()
 
-            if params:
-                cursor.execute(query, params)
-            else:
-                cursor.execute(query)
+                if params:
+                    cursor.execute(query, params)
+                else:
+                    cursor.execute(query)
 
-            # Converter resultado para lista de dicionários
-            columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
+                # Converter resultado para lista de dicionários
+                columns = [description[0] for description in cursor.description]
+                rows = cursor.fetchall()
 
             result = []
             for row in rows:
@@ -287,10 +675,38 @@ class DatabaseManager:
 
             return result
 
+        except QueryCancelledError:
+            raise
         except Exception as e:
             logger.error(f"Erro ao executar query raw: {e}")
             return None
 
+    def execute_raw_query_iter(self, query: str, params: tuple = None,
+                               batch_size: int = 1000,
+                               timeout: Optional[float] = None,
+                               max_vm_steps: Optional[int] = None
+                               ) -> Iterator[List[Dict]]:
+        """
+        Versão em lotes de ``execute_raw_query``.
+
+        Args:
+            query (str): Query SQL
+            params (tuple, optional): Parâmetros
+            batch_size (int): Número de registros por lote
+            timeout (float, optional): Sobrescreve query_timeout
+            max_vm_steps (int, optional): Sobrescreve max_vm_steps
+
+        Yields:
+            List[Dict]: Lotes de registros como dicionários
+
+        Raises:
+            QueryCancelledError: Se a query exceder os limites ou for cancelada
+        """
+        for rows, columns in self._iter_rows(
+                query, params, batch_size, timeout, max_vm_steps):
+            if rows:
+                yield [dict(zip(columns, row)) for row in rows]
+
     def insert_data(self, table_name: str, data: Union[Dict, pd.DataFrame]) -> bool:
         """
         Insere dados em uma tabela.
@@ -302,7 +718,7 @@ class DatabaseManager:
         Returns:
             bool: True se inserção foi bem-sucedida
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return False
 
@@ -313,17 +729,19 @@ class DatabaseManager:
                 placeholders = ', '.join(['?' for _ in data])
                 query = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
 
-                cursor = self.connection.cursor()
-                cursor.execute(query, tuple(data.values()))
-                self.connection.commit()
+                with self.pool.writer() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(query, tuple(data.values()))
+                    conn.commit()
 
             elif isinstance(data, pd.DataFrame):
                 # Inserir DataFrame
-                data.to_sql(
-                    table_name,
-                    self.connection,
-                    if_exists='append',
-                    index=False)
+                with self.pool.writer() as conn:
+                    data.to_sql(
+                        table_name,
+                        conn,
+                        if_exists='append',
+                        index=False)
 
             logger.info(f"Dados inseridos na tabela {table_name}")
             return True
@@ -343,12 +761,13 @@ class DatabaseManager:
         Returns:
             bool: True se tabela foi criada
         """
-        if not self.connection:
+        if not self.pool:
             if not self.connect():
                 return False
 
         try:
-            df.to_sql(table_name, self.connection, if_exists='replace', index=False)
+            with self.pool.writer() as conn:
+                df.to_sql(table_name, conn, if_exists='replace', index=False)
             logger.info(f"Tabela {table_name} criada com sucesso")
             return True
 
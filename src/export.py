@@ -0,0 +1,183 @@
+import os
+import time
+import logging
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import pandas as pd
+
+from .chunks import DataChunks, iter_chunks, iter_csv
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "csv": {"extension": "csv", "mime": "text/csv", "requires": None},
+    "parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet",
+                "requires": "pyarrow"},
+    "arrow": {"extension": "arrow", "mime": "application/vnd.apache.arrow.file",
+              "requires": "pyarrow"},
+}
+
+EXPORT_DIR = Path(tempfile.gettempdir()) / "data-analysis-exports"
+
+
+def available_formats() -> Dict[str, Dict[str, Any]]:
+    """
+    Formatos de exportação cujas dependências estão instaladas.
+
+    Returns:
+        Dict formato -> extensão, mime e dependência
+    """
+    formats = {}
+    for name, spec in EXPORT_FORMATS.items():
+        if spec["requires"]:
+            try:
+                __import__(spec["requires"])
+            except ImportError:
+                continue
+        formats[name] = spec
+    return formats
+
+
+def _write_csv(chunks: Iterable[pd.DataFrame], path: Path) -> int:
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    # utf-8-sig para o Excel reconhecer acentos
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        for text in iter_csv(counted()):
+            f.write(text)
+    return rows
+
+
+def _write_arrow(chunks: Iterable[pd.DataFrame], path: Path, fmt: str) -> int:
+    import pyarrow as pa
+
+    writer = None
+    schema = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if schema is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                if fmt == "parquet":
+                    import pyarrow.parquet as pq
+                    writer = pq.ParquetWriter(str(path), schema)
+                else:
+                    writer = pa.ipc.new_file(str(path), schema)
+            # Blocos seguintes são convertidos para o schema do primeiro
+            table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_export(data: DataChunks, path: Path, fmt: str = "csv") -> int:
+    """
+    Grava blocos de dados em arquivo sem concatená-los em memória.
+
+    Args:
+        data: DataFrame ou iterável de DataFrames
+        path: Arquivo de destino
+        fmt: "csv", "parquet" ou "arrow"
+
+    Returns:
+        Número de linhas gravadas
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+    if fmt not in available_formats():
+        raise ImportError(
+            f"O formato {fmt} requer o pacote {EXPORT_FORMATS[fmt]['requires']}")
+
+    if fmt == "csv":
+        return _write_csv(iter_chunks(data), path)
+    return _write_arrow(iter_chunks(data), path, fmt)
+
+
+def export_to_file(data: DataChunks, fmt: str = "csv",
+                   name: str = "analise",
+                   directory: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Gera um arquivo temporário de exportação.
+
+    Args:
+        data: DataFrame ou iterável de DataFrames
+        fmt: "csv", "parquet" ou "arrow"
+        name: Prefixo do nome do arquivo
+        directory: Diretório de destino (padrão: EXPORT_DIR)
+
+    Returns:
+        Dict com path, file_name, mime, format, rows, bytes e elapsed
+    """
+    directory = Path(directory or EXPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    spec = EXPORT_FORMATS[fmt]
+
+    start = time.perf_counter()
+    fd, tmp = tempfile.mkstemp(
+        prefix=f"{name}_", suffix=f".{spec['extension']}", dir=directory)
+    os.close(fd)
+    path = Path(tmp)
+
+    try:
+        rows = write_export(data, path, fmt)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    export = {
+        "path": path,
+        "file_name": f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.{spec['extension']}",
+        "mime": spec["mime"],
+        "format": fmt,
+        "rows": rows,
+        "bytes": path.stat().st_size,
+        "elapsed": time.perf_counter() - start,
+    }
+    logger.info(
+        f"Exportação {fmt} gerada: {rows} linhas, {export['bytes']} bytes "
+        f"em {export['elapsed']:.2f}s")
+    return export
+
+
+def export_query(db, query: str, fmt: str = "csv",
+                 params: tuple = None, chunksize: int = 10000,
+                 name: str = "analise",
+                 timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Exporta o resultado completo de uma query lendo o cursor em blocos.
+
+    Args:
+        db: DatabaseManager com ``execute_query_iter``
+        query: Query SQL (exportada sem limite adicional)
+        fmt: "csv", "parquet" ou "arrow"
+        params: Parâmetros da query
+        chunksize: Linhas lidas por bloco
+        name: Prefixo do nome do arquivo
+        timeout: Tempo máximo da query (None usa o padrão do gerenciador)
+
+    Returns:
+        Dict descrito em ``export_to_file``
+    """
+    chunks = db.execute_query_iter(
+        query, params=params, chunksize=chunksize, timeout=timeout)
+    return export_to_file(chunks, fmt=fmt, name=name)
+
+
+def discard_export(export: Optional[Dict[str, Any]]):
+    """Remove o arquivo temporário de uma exportação."""
+    if export:
+        try:
+            Path(export["path"]).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"Não foi possível remover {export['path']}: {e}")
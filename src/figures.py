@@ -0,0 +1,120 @@
+import sys
+import logging
+import threading
+import weakref
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    from .lazy import lazy_module
+except ImportError:
+    from lazy import lazy_module
+
+logger = logging.getLogger(__name__)
+
+
+def _configure_style(module):
+    """Estilo padrão dos gráficos, aplicado quando o matplotlib é carregado."""
+    import matplotlib.style
+    try:
+        matplotlib.style.use('seaborn-v0_8')
+    except BaseException:
+        matplotlib.style.use('default')
+
+    try:
+        import seaborn
+        seaborn.set_palette("husl")
+    except BaseException:
+        pass
+
+
+# Só importado ao criar a primeira figura
+mpl_figure = lazy_module("matplotlib.figure", on_load=_configure_style)
+mpl_agg = lazy_module("matplotlib.backends.backend_agg")
+matplotlib = lazy_module("matplotlib")
+
+
+class FigureFactory:
+    """
+    Cria figuras do matplotlib pela API orientada a objetos.
+
+    As figuras não passam pelo pyplot (``plt.subplots``/``plt.figure``):
+    não entram no registro global de figuras abertas, que só é esvaziado
+    por ``plt.close``, e não dependem da "figura atual" (``plt.gcf``), que
+    é compartilhada entre threads. Cada figura é liberada pelo coletor de
+    lixo quando a última referência a ela some.
+    """
+
+    def __init__(self, figsize: Tuple[float, float] = (12, 8), dpi: int = 100):
+        """
+        Args:
+            figsize: Tamanho padrão das figuras (polegadas)
+            dpi: Resolução padrão
+        """
+        self.figsize = figsize
+        self.dpi = dpi
+        self.created = 0
+        self._live = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def create(self, figsize: Optional[Tuple[float, float]] = None) -> Tuple[Any, Any]:
+        """
+        Cria uma figura com um único eixo.
+
+        Args:
+            figsize: Tamanho da figura (padrão: o da fábrica)
+
+        Returns:
+            Tuple (Figure, Axes)
+        """
+        figure = mpl_figure.Figure(figsize=figsize or self.figsize, dpi=self.dpi)
+        # Canvas Agg próprio: savefig e tight_layout sem backend do pyplot
+        mpl_agg.FigureCanvasAgg(figure)
+        ax = figure.subplots()
+        with self._lock:
+            self.created += 1
+            self._live.add(figure)
+        return figure, ax
+
+    @staticmethod
+    def colors(n: int, cmap: str = "Set3"):
+        """
+        Cores de um colormap, espaçadas uniformemente.
+
+        Args:
+            n: Quantidade de cores
+            cmap: Nome do colormap
+
+        Returns:
+            Array RGBA (n x 4)
+        """
+        return matplotlib.colormaps[cmap](np.linspace(0, 1, n))
+
+    def live(self) -> int:
+        """Figuras criadas por esta fábrica que ainda estão em memória."""
+        with self._lock:
+            return len(self._live)
+
+
+def close_figure(figure: Any):
+    """
+    Libera uma figura do matplotlib.
+
+    Figuras criadas pelo pyplot saem do registro global; de qualquer
+    figura, os artistas são descartados na hora, sem esperar o coletor de
+    lixo.
+
+    Args:
+        figure: Figura (None é ignorado)
+    """
+    if figure is None:
+        return
+    try:
+        # Só consulta o pyplot se ele já foi importado por alguém
+        pyplot = sys.modules.get("matplotlib.pyplot")
+        if pyplot is not None:
+            pyplot.close(figure)
+        figure.clear()
+    except Exception as e:
+        logger.warning(f"Erro ao fechar figura: {e}")
@@ -0,0 +1,70 @@
+import importlib
+import threading
+from typing import Any, Callable, Optional
+
+
+class LazyModule:
+    """
+    Módulo importado apenas no primeiro acesso a um atributo.
+
+    Usado para bibliotecas pesadas (matplotlib, seaborn, plotly, LangChain)
+    que só são necessárias ao gerar gráficos ou chamar o LLM, de modo que
+    usos sem interface ou em lote não paguem o custo de importação.
+    """
+
+    def __init__(self, name: str,
+                 on_load: Optional[Callable[[Any], None]] = None):
+        """
+        Args:
+            name: Nome completo do módulo (ex.: "matplotlib.pyplot")
+            on_load: Função chamada uma vez com o módulo recém-importado
+        """
+        self.__dict__["_name"] = name
+        self.__dict__["_on_load"] = on_load
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is not None:
+            return module
+        with self._lock:
+            if self.__dict__["_module"] is None:
+                module = importlib.import_module(self._name)
+                if self._on_load is not None:
+                    self._on_load(module)
+                self.__dict__["_module"] = module
+            return self.__dict__["_module"]
+
+    @property
+    def loaded(self) -> bool:
+        """Indica se o módulo já foi importado."""
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr: str, value: Any):
+        setattr(self._load(), attr, value)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "carregado" if self.loaded else "não carregado"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def lazy_module(name: str,
+                on_load: Optional[Callable[[Any], None]] = None) -> LazyModule:
+    """
+    Cria um módulo de importação tardia.
+
+    Args:
+        name: Nome completo do módulo
+        on_load: Função chamada uma vez após a importação
+
+    Returns:
+        LazyModule que se comporta como o módulo após o primeiro acesso
+    """
+    return LazyModule(name, on_load=on_load)
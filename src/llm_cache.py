@@ -0,0 +1,367 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+try:
+    from .metrics import CACHE_REQUESTS
+except ImportError:
+    from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normaliza uma pergunta para comparação exata.
+
+    Args:
+        text: Pergunta do usuário
+
+    Returns:
+        Texto em minúsculas, sem espaços repetidos e pontuação final
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!. ")
+
+
+# Palavras sem conteúdo, ignoradas ao comparar perguntas parecidas. Negações
+# ("não", "sem", "nenhum"...) não estão aqui: mudam o sentido da pergunta
+STOPWORDS = frozenset("""
+    a o as os um uma uns umas de do da dos das em no na nos nas por pelo
+    pela pelos pelas para pra com e ou que qual quais me mostre mostrar
+    liste listar exiba exibir informe ver veja traga
+""".split())
+
+# Palavras que invertem ou delimitam o resultado: negações, comparativos e
+# ordenação. Duas perguntas só são equivalentes se tiverem as mesmas
+KEY_WORDS = frozenset("""
+    nao sem nenhum nenhuma nunca jamais nem exceto menos mais maior maiores
+    menor menores top primeiros primeiras ultimos ultimas acima abaixo
+    crescente decrescente minimo maximo
+""".split())
+
+# Siglas dos estados, usadas como filtros nas perguntas
+UF_CODES = frozenset("""
+    ac al ap am ba ce df es go ma mt ms mg pa pb pr pe pi rj rn rs ro rr sc
+    sp se to
+""".split())
+
+
+def _fold(text: str) -> str:
+    folded = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in folded if not unicodedata.combining(c))
+
+
+def content_tokens(text: str) -> frozenset:
+    """
+    Palavras de conteúdo de uma pergunta, sem acentos nem stopwords.
+
+    Args:
+        text: Pergunta ou chave textual
+
+    Returns:
+        Conjunto de tokens
+    """
+    return frozenset(token for token in re.findall(r"\w+", _fold(text))
+                     if token not in STOPWORDS)
+
+
+def key_tokens(text: str) -> frozenset:
+    """
+    Tokens que definem o resultado de uma pergunta: números, negações,
+    comparativos e siglas de estados (ex.: "10", "nao", "mais", "rj").
+
+    As demais palavras de conteúdo podem variar entre perguntas
+    equivalentes ("compraram" e "fizeram compras"); estas não.
+
+    Args:
+        text: Pergunta ou chave textual
+
+    Returns:
+        Conjunto de tokens
+    """
+    return frozenset(token for token in content_tokens(text)
+                     if any(c.isdigit() for c in token)
+                     or token in KEY_WORDS or token in UF_CODES)
+
+
+def schema_fingerprint(schema: Any) -> str:
+    """
+    Gera uma impressão digital estável do schema do banco.
+
+    Args:
+        schema: Estrutura serializável em JSON (tabelas e colunas)
+
+    Returns:
+        Hash SHA-256 hexadecimal
+    """
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class HashingEmbedder:
+    """
+    Embedding local e determinístico baseado em trigramas de caracteres.
+
+    Não depende de serviços externos; qualquer objeto com ``embed_query``
+    (interface de Embeddings do LangChain) pode substituí-lo.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Converte um texto em vetor normalizado.
+
+        Args:
+            text: Texto de entrada
+
+        Returns:
+            Lista de floats com norma 1
+        """
+        folded = _fold(normalize_question(text))
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+
+        for word in folded.split():
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                digest = hashlib.md5(padded[i:i + 3].encode("utf-8")).digest()
+                index = int.from_bytes(digest[:4], "little") % self.dimensions
+                vector[index] += 1.0
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+
+class SemanticCache:
+    """
+    Cache persistente em SQLite para respostas do LLM.
+
+    A busca ocorre em dois níveis: primeiro por igualdade do texto
+    normalizado com a mesma impressão digital de schema; depois por
+    similaridade de cosseno entre embeddings, acima de ``similarity_threshold``
+    (None desliga esse nível). Uma pergunta parecida só é reaproveitada se
+    tiver os mesmos ``key_tokens`` (números, negações, comparativos e siglas
+    de estados): "top 5" nunca reaproveita "top 10", nem "não compraram"
+    reaproveita "compraram", nem RJ reaproveita SP. As demais palavras podem
+    ser trocadas ("compraram" e "fizeram compras"), e aí decide a
+    similaridade; só não pode haver palavras a mais de um lado apenas, que
+    seriam um filtro a mais. Cada tipo de resposta (``kind``) é armazenado
+    separadamente.
+    """
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 embedder: Optional[Any] = None,
+                 similarity_threshold: Optional[float] = 0.92,
+                 ttl: Optional[float] = None):
+        """
+        Inicializa o cache.
+
+        Args:
+            path: Arquivo SQLite onde as entradas são persistidas
+            embedder: Objeto com ``embed_query(text)``; padrão HashingEmbedder
+            similarity_threshold: Similaridade mínima (0-1) para reaproveitar
+                uma resposta de pergunta parecida (None = só igualdade exata)
+            ttl: Tempo de vida das entradas em segundos (None = sem expiração)
+        """
+        self.path = Path(path)
+        self.embedder = embedder or HashingEmbedder()
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._vectors = {}  # (kind, fingerprint) -> (ids, matriz)
+
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.stores = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                id INTEGER PRIMARY KEY,
+                kind TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                UNIQUE (kind, fingerprint, question)
+            )
+        """)
+        self._conn.commit()
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return self.ttl is None or time.time() - created_at <= self.ttl
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self.embedder.embed_query(text), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Falha ao gerar embedding: {e}")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def _load_vectors(self, kind: str, fingerprint: str):
+        """Carrega (e memoriza) os embeddings de um tipo/schema."""
+        key = (kind, fingerprint)
+        if key not in self._vectors:
+            rows = self._conn.execute(
+                "SELECT id, embedding, created_at FROM llm_cache "
+                "WHERE kind = ? AND fingerprint = ? AND embedding IS NOT NULL",
+                (kind, fingerprint)).fetchall()
+            rows = [r for r in rows if self._is_fresh(r[2])]
+            ids = [r[0] for r in rows]
+            matrix = (np.vstack([np.frombuffer(r[1], dtype=np.float32) for r in rows])
+                      if rows else np.zeros((0, 0), dtype=np.float32))
+            self._vectors[key] = (ids, matrix)
+        return self._vectors[key]
+
+    def _touch(self, entry_id: int):
+        self._conn.execute(
+            "UPDATE llm_cache SET hits = hits + 1 WHERE id = ?", (entry_id,))
+        self._conn.commit()
+
+    def lookup(self, kind: str, text: str, fingerprint: str,
+               allow_similar: bool = True) -> Optional[str]:
+        """
+        Busca uma resposta armazenada.
+
+        Args:
+            kind: Tipo da resposta (ex.: "interpretation", "sql")
+            text: Pergunta ou chave textual
+            fingerprint: Impressão digital do schema
+            allow_similar: Habilita a busca por similaridade
+
+        Returns:
+            Conteúdo armazenado ou None
+        """
+        question = normalize_question(text)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT id, payload, created_at FROM llm_cache "
+                    "WHERE kind = ? AND fingerprint = ? AND question = ?",
+                    (kind, fingerprint, question)).fetchone()
+                if row is not None and self._is_fresh(row[2]):
+                    self._touch(row[0])
+                    self.exact_hits += 1
+                    CACHE_REQUESTS.inc(cache=f"llm_{kind}", result="hit")
+                    return row[1]
+
+                if allow_similar and self.similarity_threshold is not None:
+                    ids, matrix = self._load_vectors(kind, fingerprint)
+                    vector = self._embed(text) if ids else None
+                    if vector is not None and matrix.shape[1] == vector.shape[0]:
+                        scores = matrix @ vector
+                        keys = key_tokens(question)
+                        words = content_tokens(question)
+                        for best in np.argsort(scores)[::-1][:5]:
+                            if scores[best] < self.similarity_threshold:
+                                break
+                            row = self._conn.execute(
+                                "SELECT question, payload FROM llm_cache WHERE id = ?",
+                                (ids[best],)).fetchone()
+                            if row is None or key_tokens(row[0]) != keys:
+                                continue
+                            # Palavra a mais de um só lado é um filtro a
+                            # mais ("compras" x "compras online")
+                            other = content_tokens(row[0])
+                            if words < other or other < words:
+                                continue
+                            self._touch(ids[best])
+                            self.similar_hits += 1
+                            CACHE_REQUESTS.inc(cache=f"llm_{kind}", result="similar")
+                            logger.info(
+                                f"Cache semântico ({kind}): similaridade "
+                                f"{scores[best]:.3f}")
+                            return row[1]
+
+                self.misses += 1
+                CACHE_REQUESTS.inc(cache=f"llm_{kind}", result="miss")
+                return None
+
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao consultar cache semântico: {e}")
+            return None
+
+    def store(self, kind: str, text: str, fingerprint: str, payload: str):
+        """
+        Armazena uma resposta do LLM.
+
+        Args:
+            kind: Tipo da resposta (ex.: "interpretation", "sql")
+            text: Pergunta ou chave textual
+            fingerprint: Impressão digital do schema
+            payload: Conteúdo a armazenar
+        """
+        question = normalize_question(text)
+        vector = self._embed(text)
+        blob = vector.astype(np.float32).tobytes() if vector is not None else None
+
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache "
+                    "(kind, fingerprint, question, payload, embedding, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (kind, fingerprint, question, payload, blob, time.time()))
+                self._conn.commit()
+                self._vectors.pop((kind, fingerprint), None)
+                self.stores += 1
+        except sqlite3.Error as e:
+            logger.error(f"Erro ao gravar cache semântico: {e}")
+
+    def clear(self, kind: Optional[str] = None):
+        """Remove as entradas de um tipo (ou todas)."""
+        with self._lock:
+            if kind is None:
+                self._conn.execute("DELETE FROM llm_cache")
+            else:
+                self._conn.execute("DELETE FROM llm_cache WHERE kind = ?", (kind,))
+            self._conn.commit()
+            self._vectors.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso do cache.
+
+        Returns:
+            Dict com acertos exatos, por similaridade, falhas e entradas
+        """
+        with self._lock:
+            entries = self._conn.execute(
+                "SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        return {
+            'entries': entries,
+            'exact_hits': self.exact_hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hit_ratio': (self.exact_hits + self.similar_hits) / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        """Fecha o arquivo do cache."""
+        with self._lock:
+            self._conn.close()
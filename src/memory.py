@@ -0,0 +1,446 @@
+import os
+import sys
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("memory_profile", default=None)
+
+# Etapas abertas em todo o processo: o pico do tracemalloc é global, então
+# cada leitura/reinício do pico precisa ser repassado a todas elas
+_active: List["_Stage"] = []
+_active_lock = threading.Lock()
+
+TOP_SITES = 10
+
+# Memória típica de um artista do matplotlib (texto, patch, linha, transforms)
+MPL_ARTIST_BYTES = 4096
+
+# Chaves de diagnóstico que não fazem parte do conteúdo da resposta
+DIAGNOSTIC_KEYS = ("timings", "memory", "memory_bytes")
+
+# Sem perfil de memória, objetos do pandas maiores que isso são medidos por
+# uma amostra de linhas: memory_usage(deep=True) percorre cada string
+SAMPLE_ROWS = 10_000
+
+_IGNORED_SITES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def enable_memory_profiling(frames: int = 1):
+    """
+    Liga o tracemalloc para o processo inteiro.
+
+    Só as alocações feitas depois disso são rastreadas, e todas ficam mais
+    lentas; por isso o perfil de memória é opcional.
+
+    Args:
+        frames: Profundidade do traceback guardado por alocação
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        logger.info(f"Perfil de memória ativado (tracemalloc, {frames} frame(s))")
+
+
+def disable_memory_profiling():
+    """Desliga o tracemalloc e descarta as alocações rastreadas."""
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        logger.info("Perfil de memória desativado")
+
+
+def memory_profiling_enabled() -> bool:
+    """Indica se o tracemalloc está ativo."""
+    return tracemalloc.is_tracing()
+
+
+def configure_memory_profiling() -> bool:
+    """
+    Liga o perfil de memória se ``MEMORY_PROFILE`` estiver definida.
+
+    ``MEMORY_PROFILE_FRAMES`` define a profundidade dos tracebacks
+    (padrão 1, suficiente para os locais de alocação por linha).
+
+    Returns:
+        True se o perfil estiver ativo
+    """
+    if os.getenv("MEMORY_PROFILE", "").lower() in ("1", "true", "yes", "on"):
+        enable_memory_profiling(int(os.getenv("MEMORY_PROFILE_FRAMES", "1")))
+    return memory_profiling_enabled()
+
+
+class _Stage:
+    """Etapa aberta: memória rastreada na entrada e maior pico observado."""
+
+    __slots__ = ("base", "peak")
+
+    def __init__(self):
+        self.base = 0
+        self.peak = 0
+
+
+def _observe_peak() -> int:
+    """
+    Repassa o pico atual às etapas abertas e o reinicia.
+
+    Deve ser chamada com ``_active_lock``.
+
+    Returns:
+        Memória rastreada atual (bytes)
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    for stage in _active:
+        if peak > stage.peak:
+            stage.peak = peak
+    tracemalloc.reset_peak()
+    return current
+
+
+def _enter() -> _Stage:
+    stage = _Stage()
+    with _active_lock:
+        stage.base = stage.peak = _observe_peak()
+        _active.append(stage)
+    return stage
+
+
+def _exit(stage: _Stage) -> Dict[str, int]:
+    with _active_lock:
+        current = _observe_peak()
+        _active.remove(stage)
+    return {"peak": max(0, stage.peak - stage.base),
+            "retained": current - stage.base}
+
+
+class MemoryProfile:
+    """
+    Perfil de memória de uma análise.
+
+    Enquanto está ativo (``profile_memory``), cada span da instrumentação de
+    tempos (``timing.span``/``timed``) também registra o pico e a memória
+    retida da etapa. Ao final, um snapshot do tracemalloc comparado ao do
+    início aponta as linhas que mais alocaram memória ainda viva.
+
+    Os números vêm do tracemalloc, que é global: com etapas ou sessões em
+    paralelo, o pico de uma etapa inclui o que as outras alocaram ao mesmo
+    tempo.
+    """
+
+    def __init__(self, label: Optional[str] = None, top: int = TOP_SITES):
+        """
+        Args:
+            label: Identificação da análise nos logs (ex.: a pergunta)
+            top: Quantidade de locais de alocação no relatório
+        """
+        self.label = label
+        self.top = top
+        self.peak = 0
+        self.retained = 0
+        self.sites: List[Dict[str, Any]] = []
+        self._stages: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._root: Optional[_Stage] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._finished = False
+
+    @property
+    def enabled(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    @property
+    def finished(self) -> bool:
+        """Indica se a medição completa já foi encerrada."""
+        return self._finished
+
+    def add(self, name: str, peak: int, retained: int):
+        """
+        Registra uma execução de etapa.
+
+        Args:
+            name: Nome da etapa
+            peak: Pico acima da memória do início da etapa (bytes)
+            retained: Memória que continuou alocada ao final (bytes)
+        """
+        with self._lock:
+            entry = self._stages.setdefault(
+                name, {"calls": 0, "peak": 0, "retained": 0})
+            entry["calls"] += 1
+            entry["peak"] = max(entry["peak"], peak)
+            entry["retained"] += retained
+
+    def start(self) -> bool:
+        """
+        Começa a medir a análise inteira.
+
+        Returns:
+            True se a medição começou agora (False sem tracemalloc ou se já
+            havia começado)
+        """
+        if not self.enabled or self._root is not None or self._finished:
+            return False
+        self._snapshot = tracemalloc.take_snapshot()
+        self._root = _enter()
+        return True
+
+    def stop(self):
+        """Encerra a medição e calcula os locais de alocação retidos."""
+        if self._root is None or self._finished:
+            return
+        self._finished = True
+        totals = _exit(self._root)
+        self.peak, self.retained = totals["peak"], totals["retained"]
+        if not tracemalloc.is_tracing():
+            return
+        try:
+            end = tracemalloc.take_snapshot().filter_traces(_IGNORED_SITES)
+            diff = end.compare_to(
+                self._snapshot.filter_traces(_IGNORED_SITES), "lineno")
+            self.sites = [
+                {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "size": stat.size_diff, "count": stat.count_diff}
+                for stat in diff if stat.size_diff > 0][:self.top]
+        except Exception as e:
+            logger.warning(f"Erro ao comparar snapshots de memória: {e}")
+        finally:
+            self._snapshot = None
+
+    def stages(self) -> Dict[str, Dict[str, int]]:
+        """Pico (maior) e memória retida (somada) por etapa, em bytes."""
+        with self._lock:
+            return {name: dict(entry) for name, entry in self._stages.items()}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Resumo serializável do perfil.
+
+        Returns:
+            Dict com peak, retained, stages e top_sites (bytes)
+        """
+        return {
+            "peak": self.peak,
+            "retained": self.retained,
+            "stages": self.stages(),
+            "top_sites": list(self.sites),
+        }
+
+    def log(self, target: Optional[logging.Logger] = None, **fields):
+        """
+        Emite o perfil como um log estruturado (uma linha JSON).
+
+        Args:
+            target: Logger usado (padrão: o deste módulo)
+            **fields: Campos extras do evento (ex.: memory_bytes)
+        """
+        event = {"event": "analysis_memory", "label": self.label,
+                 "ts": time.time(), **fields, **self.to_dict()}
+        (target or logger).info(
+            json.dumps(event, ensure_ascii=False, default=str),
+            extra={"memory": event})
+
+
+def current_memory_profile() -> Optional[MemoryProfile]:
+    """Perfil ativo no contexto atual, se houver."""
+    return _current.get()
+
+
+@contextmanager
+def profile_memory(profile: Optional[MemoryProfile] = None,
+                   label: Optional[str] = None) -> Iterator[MemoryProfile]:
+    """
+    Ativa um perfil de memória no contexto atual.
+
+    Como ``timing.collect_timings``, reutiliza o perfil ativo em chamadas
+    aninhadas. O perfil que começa aqui é encerrado na saída (ou antes, por
+    ``MemoryProfile.stop``). Sem tracemalloc ativo nada é medido.
+
+    Args:
+        profile: Perfil a ativar (padrão: o ativo ou um novo)
+        label: Identificação de um perfil novo
+
+    Yields:
+        Perfil ativo
+    """
+    if profile is None:
+        profile = _current.get() or MemoryProfile(label)
+    token = _current.set(profile)
+    started = profile.start()
+    try:
+        yield profile
+    finally:
+        if started:
+            profile.stop()
+        _current.reset(token)
+
+
+@contextmanager
+def memory_stage(name: str) -> Iterator[None]:
+    """
+    Mede o pico e a memória retida de um bloco no perfil ativo.
+
+    Sem perfil ativo ou sem tracemalloc não custa nada além de uma leitura
+    de ContextVar.
+
+    Args:
+        name: Nome da etapa
+    """
+    profile = _current.get()
+    if profile is None or not tracemalloc.is_tracing():
+        yield
+        return
+    stage = _enter()
+    try:
+        yield
+    finally:
+        totals = _exit(stage)
+        profile.add(name, totals["peak"], totals["retained"])
+
+
+def _pandas_bytes(item: Any, exact: bool) -> int:
+    """Memória de um DataFrame/Series/Index, exata ou por amostra de linhas."""
+    rows = len(item)
+    sample = item
+    if not exact and rows > SAMPLE_ROWS:
+        step = rows // SAMPLE_ROWS
+        sample = item[::step] if isinstance(item, pd.Index) else item.iloc[::step]
+    usage = sample.memory_usage(deep=True)
+    total = int(usage.sum() if hasattr(usage, "sum") else usage)
+    if sample is not item:
+        total = int(total * rows / len(sample))
+    return total
+
+
+def estimate_bytes(obj: Any, exact: Optional[bool] = None) -> int:
+    """
+    Estimativa da memória ocupada por um objeto e pelo que ele referencia.
+
+    DataFrames usam ``memory_usage(deep=True)``, sobre todas as linhas
+    (``exact``) ou sobre uma amostra de ``SAMPLE_ROWS`` linhas extrapolada;
+    figuras do matplotlib contam os artistas e o buffer RGBA da
+    renderização; figuras do Plotly contam os dados dos traços. Objetos
+    compartilhados são contados uma vez.
+
+    Args:
+        obj: Objeto a medir
+        exact: Mede todas as linhas (padrão: só com o tracemalloc ativo)
+
+    Returns:
+        Bytes (aproximado)
+    """
+    if exact is None:
+        exact = tracemalloc.is_tracing()
+    total = 0
+    seen = set()
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if item is None or id(item) in seen:
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, (pd.DataFrame, pd.Series, pd.Index)):
+            total += _pandas_bytes(item, exact)
+        elif isinstance(item, np.ndarray):
+            total += item.nbytes
+        elif isinstance(item, (str, bytes, bytearray, int, float, bool)):
+            total += sys.getsizeof(item)
+        elif isinstance(item, dict):
+            total += sys.getsizeof(item)
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            total += sys.getsizeof(item)
+            pending.extend(item)
+        elif hasattr(item, "get_size_inches") and hasattr(item, "findobj"):
+            # Figura do matplotlib: artistas mais, se já foi desenhada, o
+            # buffer RGBA do canvas Agg (alocado fora do tracemalloc)
+            total += len(item.findobj()) * MPL_ARTIST_BYTES
+            if getattr(item.canvas, "renderer", None) is not None:
+                width, height = item.get_size_inches() * item.dpi
+                total += int(width * height * 4)
+        elif hasattr(item, "to_plotly_json"):
+            # ``_data``/``_layout`` são os dicts internos; ``to_plotly_json``
+            # faria uma cópia profunda da figura só para medi-la
+            internal = [getattr(item, attr, None) for attr in ("_data", "_layout")]
+            if any(part is not None for part in internal):
+                pending.extend(internal)
+            else:
+                pending.append(item.to_plotly_json())
+        else:
+            try:
+                total += sys.getsizeof(item)
+            except TypeError:
+                pass
+    return total
+
+
+def response_bytes(response: Dict[str, Any],
+                   exact: Optional[bool] = None) -> int:
+    """
+    Memória estimada do conteúdo de uma resposta de análise.
+
+    É o que fica preso enquanto a resposta é guardada (ex.: no
+    ``SessionStore``): dados, tabela HTML, figuras etc. As chaves de
+    diagnóstico (tempos, perfil de memória) não entram.
+
+    Args:
+        response: Dict de resposta de uma análise
+        exact: Repassado a ``estimate_bytes``
+
+    Returns:
+        Bytes (aproximado)
+    """
+    return estimate_bytes({key: value for key, value in response.items()
+                           if key not in DIAGNOSTIC_KEYS}, exact=exact)
+
+
+def with_memory_profile(func: Callable) -> Callable:
+    """
+    Decorador para funções que retornam o dict de resposta de uma análise.
+
+    Sempre grava ``response["memory_bytes"]``, que quem guarda a resposta
+    reutiliza em vez de medi-la de novo. Com o tracemalloc ativo,
+    mede a chamada (reutilizando o perfil ativo, se houver) e, quando o
+    perfil começou aqui, grava o relatório em ``response["memory"]`` e
+    emite o log estruturado.
+    """
+    def finish(profile: MemoryProfile, report: bool, response: Any) -> Any:
+        if isinstance(response, dict):
+            response["memory_bytes"] = response_bytes(response)
+            if report:
+                response["memory"] = profile.to_dict()
+                profile.log(success=response.get("success"),
+                            memory_bytes=response["memory_bytes"])
+        return response
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            outermost = _current.get() is None
+            with profile_memory() as profile:
+                response = await func(*args, **kwargs)
+            return finish(profile, outermost and profile.finished, response)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outermost = _current.get() is None
+        with profile_memory() as profile:
+            response = func(*args, **kwargs)
+        return finish(profile, outermost and profile.finished, response)
+    return wrapper
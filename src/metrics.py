@@ -0,0 +1,365 @@
+import os
+import math
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Tempos em segundos: de consultas em cache (~1ms) a chamadas lentas do LLM
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 4096, 16384)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str],
+                   extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"'
+                          for name, value in pairs) + "}"
+
+
+class _Metric:
+    """Base das métricas: nome, ajuda, rótulos e amostras por rótulo."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"{self.name}: rótulos esperados {self.labelnames}, "
+                f"recebidos {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Linhas da métrica no formato de exposição em texto."""
+        return [f"# HELP {self.name} {_escape(self.documentation)}",
+                f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    """Contador monotônico."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        """
+        Incrementa o contador.
+
+        Args:
+            amount: Valor a somar (não negativo)
+            **labels: Valores dos rótulos
+        """
+        if amount < 0:
+            raise ValueError("Contadores só podem aumentar")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} "
+                f"{_format_value(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Histograma com baldes cumulativos, soma e contagem."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        """
+        Registra uma observação.
+
+        Args:
+            value: Valor observado (ex.: segundos, linhas)
+            **labels: Valores dos rótulos
+        """
+        key = self._key(labels)
+        with self._lock:
+            # [contagem por balde..., +Inf, soma]
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return int(state[-2]) if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in values:
+            for bound, count in zip((*self.buckets, math.inf), state):
+                labels = _format_labels(self.labelnames, key,
+                                        ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {_format_value(count)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(state[-2])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas juntas."""
+
+    def __init__(self, prefix: str = ""):
+        """
+        Args:
+            prefix: Prefixo aplicado ao nome de todas as métricas
+        """
+        self.prefix = prefix
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        full_name = self.prefix + name
+        with self._lock:
+            metric = self._metrics.get(full_name)
+            if metric is None:
+                metric = self._metrics[full_name] = cls(full_name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Métrica {full_name} já registrada como {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        """Cria (ou retorna) um contador."""
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Cria (ou retorna) um histograma."""
+        return self._get_or_create(Histogram, name, documentation, labelnames,
+                                   buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Todas as métricas no formato de exposição em texto do Prometheus.
+
+        Returns:
+            Texto pronto para um endpoint /metrics ou arquivo .prom
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Union[str, Path]):
+        """
+        Grava as métricas em um arquivo (ex.: textfile collector do
+        node_exporter), de forma atômica.
+
+        Args:
+            path: Arquivo de destino (.prom)
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.render(), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+REGISTRY = MetricsRegistry(prefix="analytics_")
+
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_duration_seconds",
+    "Duração das chamadas ao LLM", ["stage"])
+LLM_FIRST_TOKEN = REGISTRY.histogram(
+    "llm_first_token_seconds",
+    "Tempo até o primeiro trecho de respostas transmitidas", ["stage"])
+LLM_TOKENS = REGISTRY.histogram(
+    "llm_tokens",
+    "Tokens por chamada ao LLM (estimados por ~4 caracteres/token quando o "
+    "provedor não informa o uso)", ["stage", "kind"], buckets=TOKEN_BUCKETS)
+LLM_ERRORS = REGISTRY.counter(
+    "llm_errors_total", "Chamadas ao LLM que falharam", ["stage"])
+SQL_GENERATED = REGISTRY.counter(
+    "sql_generated_total",
+    "Queries geradas por origem (llm, cache ou fallback)", ["source"])
+SQL_DURATION = REGISTRY.histogram(
+    "sql_query_duration_seconds",
+    "Tempo de execução das queries no SQLite", ["status"])
+SQL_ROWS = REGISTRY.histogram(
+    "sql_rows_returned", "Linhas retornadas por query", buckets=ROW_BUCKETS)
+SQL_ROWS_AVAILABLE = REGISTRY.histogram(
+    "sql_rows_available",
+    "Linhas disponíveis (total sem LIMIT) das queries com contagem",
+    buckets=ROW_BUCKETS)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "Consultas aos caches por resultado (hit, similar ou miss)",
+    ["cache", "result"])
+POOL_WAIT = REGISTRY.histogram(
+    "pool_checkout_wait_seconds",
+    "Espera por uma conexão de leitura do pool")
+POOL_TIMEOUTS = REGISTRY.counter(
+    "pool_checkout_timeouts_total",
+    "Empréstimos de conexão que excederam o tempo limite")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa de tokens de um texto (~4 caracteres por token)."""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def _usage(response) -> Optional[Dict[str, int]]:
+    """Uso de tokens informado pelo provedor, se a resposta o trouxer."""
+    metadata = getattr(response, "response_metadata", None) or {}
+    usage = metadata.get("token_usage") or metadata.get("usage")
+    if isinstance(usage, dict) and "prompt_tokens" in usage:
+        return usage
+    return None
+
+
+def record_llm_call(stage: str, duration: float, prompt: str,
+                    response=None, error: bool = False):
+    """
+    Registra uma chamada ao LLM.
+
+    Args:
+        stage: Etapa da análise (ex.: "interpret", "sql", "insights")
+        duration: Duração em segundos
+        prompt: Prompt enviado
+        response: Resposta (texto ou mensagem) recebida
+        error: Indica que a chamada falhou
+    """
+    LLM_LATENCY.observe(duration, stage=stage)
+    if error:
+        LLM_ERRORS.inc(stage=stage)
+        return
+    usage = _usage(response)
+    if usage is not None:
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    else:
+        text = getattr(response, "content", response)
+        prompt_tokens = estimate_tokens(str(prompt))
+        completion_tokens = estimate_tokens("" if text is None else str(text))
+    LLM_TOKENS.observe(prompt_tokens, stage=stage, kind="prompt")
+    LLM_TOKENS.observe(completion_tokens, stage=stage, kind="completion")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve ``GET /metrics`` a partir do registro do servidor."""
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1",
+                         registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    Expõe ``/metrics`` em uma thread de fundo.
+
+    Args:
+        port: Porta local
+        host: Interface (padrão: apenas local)
+        registry: Registro exportado
+
+    Returns:
+        Servidor HTTP em execução
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics-http",
+                     daemon=True).start()
+    logger.info(f"Métricas em http://{host}:{server.server_port}/metrics")
+    return server
+
+
+def start_textfile_writer(path: Union[str, Path], interval: float = 15.0,
+                          registry: MetricsRegistry = REGISTRY) -> threading.Thread:
+    """
+    Regrava o arquivo de métricas periodicamente em uma thread de fundo.
+
+    Args:
+        path: Arquivo .prom de destino
+        interval: Intervalo entre gravações (segundos)
+        registry: Registro exportado
+
+    Returns:
+        Thread daemon em execução
+    """
+    def loop():
+        while True:
+            try:
+                registry.write_textfile(path)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar métricas em {path}: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+    thread.start()
+    logger.info(f"Métricas gravadas em {path} a cada {interval:.0f}s")
+    return thread
@@ -0,0 +1,396 @@
+import sqlite3
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+try:
+    from .metrics import POOL_TIMEOUTS, POOL_WAIT
+except ImportError:
+    from metrics import POOL_TIMEOUTS, POOL_WAIT
+
+logger = logging.getLogger(__name__)
+
+# Perfis de PRAGMA aplicados a cada conexão aberta pelo pool.
+# journal_mode é persistente no arquivo e só é aplicado na conexão de
+# escrita; query_only só vale para as conexões de leitura.
+PRAGMA_PROFILES = {
+    "read_heavy_analytics": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 268435456,     # 256 MiB
+        "cache_size": -32768,       # 32 MiB (valores negativos são KiB)
+        "temp_store": "MEMORY",
+        "query_only": True,
+    },
+    "default": {
+        "query_only": True,
+    },
+}
+
+DEFAULT_PRAGMA_PROFILE = "read_heavy_analytics"
+
+_WRITER_ONLY_PRAGMAS = {"journal_mode"}
+_READER_ONLY_PRAGMAS = {"query_only"}
+
+
+def resolve_pragmas(profile: Optional[str] = DEFAULT_PRAGMA_PROFILE,
+                    overrides: Optional[Dict] = None) -> Dict:
+    """
+    Monta o conjunto de PRAGMAs a partir de um perfil nomeado.
+
+    Args:
+        profile: Nome do perfil em PRAGMA_PROFILES (None para nenhum)
+        overrides: PRAGMAs que substituem ou complementam o perfil
+
+    Returns:
+        Dict com nome do PRAGMA e valor
+    """
+    if profile is not None and profile not in PRAGMA_PROFILES:
+        raise ValueError(
+            f"Perfil de PRAGMA desconhecido: {profile}. "
+            f"Disponíveis: {', '.join(PRAGMA_PROFILES)}")
+
+    pragmas = dict(PRAGMA_PROFILES.get(profile, {}))
+    if overrides:
+        pragmas.update(overrides)
+    return pragmas
+
+
+def read_pragmas(conn: sqlite3.Connection, names) -> Dict:
+    """
+    Lê os valores atuais de PRAGMAs em uma conexão.
+
+    Args:
+        conn: Conexão SQLite
+        names: Nomes dos PRAGMAs
+
+    Returns:
+        Dict com o valor atual de cada PRAGMA
+    """
+    values = {}
+    for name in names:
+        try:
+            row = conn.execute(f"PRAGMA {name}").fetchone()
+            values[name] = row[0] if row is not None else None
+        except sqlite3.Error as e:
+            values[name] = f"erro: {e}"
+    return values
+
+
+class PoolTimeoutError(Exception):
+    """Nenhuma conexão de leitura ficou disponível dentro do tempo limite."""
+
+
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite.
+
+    Mantém até ``max_readers`` conexões de leitura, emprestadas a uma thread
+    por vez, e uma única conexão de escrita serializada por lock.
+    """
+
+    def __init__(self,
+                 db_path: Union[str, Path],
+                 max_readers: int = 8,
+                 timeout: float = 30.0,
+                 checkout_timeout: float = 30.0,
+                 max_lifetime: Optional[float] = None,
+                 cached_statements: int = 128,
+                 pragmas: Optional[Dict] = None):
+        """
+        Inicializa o pool.
+
+        Args:
+            db_path: Caminho para o arquivo do banco de dados
+            max_readers: Número máximo de conexões de leitura abertas
+            timeout: Tempo de espera por locks do SQLite (segundos)
+            checkout_timeout: Tempo máximo de espera por uma conexão livre
+            max_lifetime: Idade máxima de uma conexão antes de ser reaberta
+                (segundos). None mantém as conexões indefinidamente.
+            cached_statements: Tamanho do cache de statements preparados
+                de cada conexão
+            pragmas: PRAGMAs aplicados ao abrir cada conexão
+                (padrão: somente query_only nas conexões de leitura)
+        """
+        if max_readers < 1:
+            raise ValueError("max_readers deve ser pelo menos 1")
+
+        self.db_path = Path(db_path)
+        self.max_readers = max_readers
+        self.timeout = timeout
+        self.checkout_timeout = checkout_timeout
+        self.max_lifetime = max_lifetime
+        self.cached_statements = cached_statements
+        self.pragmas = dict(pragmas) if pragmas is not None else dict(
+            PRAGMA_PROFILES["default"])
+
+        self._idle = deque()
+        self._created_at = {}
+        self._in_use = set()
+        self._opened = 0
+        self._cond = threading.Condition(threading.Lock())
+        self._closed = False
+
+        self._writer = None
+        self._writer_lock = threading.RLock()
+
+        # Conexão dedicada a PRAGMA data_version; nunca escreve, então
+        # enxerga os commits feitos por qualquer outra conexão
+        self._probe = None
+        self._probe_lock = threading.Lock()
+
+        # Métricas
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._writer_checkouts = 0
+        self._writer_wait_total = 0.0
+
+    def _create_connection(self, read_only: bool) -> sqlite3.Connection:
+        """Abre uma nova conexão configurada para uso compartilhado entre threads."""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements
+        )
+        conn.row_factory = sqlite3.Row
+        self._apply_pragmas(conn, read_only)
+        with self._cond:
+            self._created_at[conn] = time.monotonic()
+        return conn
+
+    def _apply_pragmas(self, conn: sqlite3.Connection, read_only: bool):
+        """Aplica os PRAGMAs configurados conforme o papel da conexão."""
+        for name, value in self.pragmas.items():
+            if read_only and name in _WRITER_ONLY_PRAGMAS:
+                continue
+            if not read_only and name in _READER_ONLY_PRAGMAS:
+                continue
+            if isinstance(value, bool):
+                value = "ON" if value else "OFF"
+            try:
+                conn.execute(f"PRAGMA {name} = {value}")
+            except sqlite3.Error as e:
+                logger.warning(f"Não foi possível aplicar PRAGMA {name}={value}: {e}")
+
+    def initialize(self):
+        """
+        Abre a conexão de escrita para aplicar PRAGMAs persistentes
+        (ex.: journal_mode=WAL) antes das primeiras leituras.
+        """
+        with self.writer() as conn:
+            conn.execute("SELECT 1")
+
+    def data_version(self) -> int:
+        """
+        Retorna o ``PRAGMA data_version`` visto pela conexão de sondagem.
+
+        O valor muda sempre que outra conexão (inclusive a de escrita do
+        próprio pool) confirma alterações no banco.
+
+        Returns:
+            Valor atual de data_version
+        """
+        with self._probe_lock:
+            if self._closed:
+                raise RuntimeError("Pool de conexões fechado")
+            if self._probe is None:
+                self._probe = self._create_connection(read_only=True)
+            return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
+    def pragma_status(self) -> Dict:
+        """
+        Retorna os valores efetivos dos PRAGMAs em uma conexão de leitura.
+
+        Returns:
+            Dict com o valor atual de cada PRAGMA configurado
+        """
+        names = list(self.pragmas) or ["journal_mode", "query_only"]
+        with self.reader() as conn:
+            return read_pragmas(conn, names)
+
+    def _expired(self, conn: sqlite3.Connection) -> bool:
+        """Indica se a conexão ultrapassou ``max_lifetime``."""
+        if self.max_lifetime is None:
+            return False
+        created = self._created_at.get(conn, 0.0)
+        return time.monotonic() - created > self.max_lifetime
+
+    def acquire(self) -> sqlite3.Connection:
+        """
+        Empresta uma conexão de leitura, aguardando se o pool estiver cheio.
+
+        Returns:
+            Conexão SQLite de leitura
+
+        Raises:
+            PoolTimeoutError: Se nenhuma conexão ficar livre a tempo
+        """
+        start = time.perf_counter()
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Pool de conexões fechado")
+
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+
+                if self._opened < self.max_readers:
+                    # Reserva a vaga antes de abrir fora do lock
+                    self._opened += 1
+                    conn = None
+                    break
+
+                waited = True
+                remaining = self.checkout_timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    self._timeouts += 1
+                    POOL_TIMEOUTS.inc()
+                    raise PoolTimeoutError(
+                        f"Nenhuma conexão livre após {self.checkout_timeout:.1f}s "
+                        f"({self.max_readers} em uso)")
+
+        if conn is None:
+            try:
+                conn = self._create_connection(read_only=True)
+            except Exception:
+                with self._cond:
+                    self._opened -= 1
+                    self._cond.notify()
+                raise
+
+        wait = time.perf_counter() - start
+        with self._cond:
+            self._in_use.add(conn)
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._wait_time_total += wait
+            self._wait_time_max = max(self._wait_time_max, wait)
+        POOL_WAIT.observe(wait)
+
+        return conn
+
+    def release(self, conn: sqlite3.Connection, discard: bool = False):
+        """
+        Devolve uma conexão de leitura ao pool.
+
+        Args:
+            conn: Conexão obtida via ``acquire``
+            discard: Fecha a conexão em vez de reaproveitá-la
+        """
+        with self._cond:
+            self._in_use.discard(conn)
+            if not discard and self._expired(conn):
+                discard = True
+                self._recycled += 1
+            if discard or self._closed:
+                self._opened -= 1
+                self._created_at.pop(conn, None)
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+        if discard or self._closed:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar conexão descartada: {e}")
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Context manager que empresta e devolve uma conexão de leitura."""
+        conn = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except sqlite3.ProgrammingError:
+            # Conexão inutilizável (ex.: fechada); não volta para o pool
+            broken = True
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Context manager com acesso exclusivo à conexão de escrita."""
+        start = time.perf_counter()
+        with self._writer_lock:
+            if self._closed:
+                raise RuntimeError("Pool de conexões fechado")
+            if self._writer is not None and self._expired(self._writer):
+                self._created_at.pop(self._writer, None)
+                self._writer.close()
+                self._writer = None
+                self._recycled += 1
+            if self._writer is None:
+                self._writer = self._create_connection(read_only=False)
+            self._writer_checkouts += 1
+            self._writer_wait_total += time.perf_counter() - start
+            yield self._writer
+
+    def metrics(self) -> Dict:
+        """
+        Retorna métricas de uso do pool.
+
+        Returns:
+            Dict com tamanho, ocupação e tempos de espera
+        """
+        with self._cond:
+            checkouts = self._checkouts
+            return {
+                'pool_size': self.max_readers,
+                'open_readers': self._opened,
+                'idle_readers': len(self._idle),
+                'in_use_readers': len(self._in_use),
+                'checkouts': checkouts,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'wait_time_total': self._wait_time_total,
+                'wait_time_avg': self._wait_time_total / checkouts if checkouts else 0.0,
+                'wait_time_max': self._wait_time_max,
+                'writer_open': self._writer is not None,
+                'writer_checkouts': self._writer_checkouts,
+                'writer_wait_total': self._writer_wait_total,
+            }
+
+    def close(self):
+        """Fecha todas as conexões ociosas e a conexão de escrita."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._opened -= len(idle)
+            for conn in idle:
+                self._created_at.pop(conn, None)
+            self._cond.notify_all()
+
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception as e:
+                logger.warning(f"Erro ao fechar conexão: {e}")
+
+        with self._writer_lock:
+            if self._writer is not None:
+                self._created_at.pop(self._writer, None)
+                self._writer.close()
+                self._writer = None
+
+        with self._probe_lock:
+            if self._probe is not None:
+                self._created_at.pop(self._probe, None)
+                self._probe.close()
+                self._probe = None
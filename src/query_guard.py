@@ -0,0 +1,213 @@
+import sqlite3
+import threading
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from .metrics import SQL_DURATION
+except ImportError:
+    from metrics import SQL_DURATION
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCancelledError(Exception):
+    """
+    Query interrompida por estouro de orçamento ou cancelamento.
+
+    Attributes:
+        reason: "timeout", "vm_steps" ou "cancelled"
+        elapsed: Tempo de execução até a interrupção (segundos)
+        vm_steps: Instruções da VM do SQLite executadas (aproximado)
+        query: Query interrompida (opcional)
+    """
+
+    MESSAGES = {
+        "timeout": "Tempo limite da consulta excedido",
+        "vm_steps": "Limite de processamento da consulta excedido",
+        "cancelled": "Consulta cancelada pelo usuário",
+    }
+
+    def __init__(self, reason: str, elapsed: float, vm_steps: int,
+                 query: Optional[str] = None,
+                 timeout: Optional[float] = None,
+                 max_vm_steps: Optional[int] = None):
+        self.reason = reason
+        self.elapsed = elapsed
+        self.vm_steps = vm_steps
+        self.query = query
+        self.timeout = timeout
+        self.max_vm_steps = max_vm_steps
+        super().__init__(
+            f"{self.MESSAGES.get(reason, reason)} após {elapsed:.2f}s")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Representação estruturada do erro.
+
+        Returns:
+            Dict com motivo, tempo, passos e limites configurados
+        """
+        return {
+            "error": "query_cancelled",
+            "reason": self.reason,
+            "message": str(self),
+            "elapsed": round(self.elapsed, 3),
+            "vm_steps": self.vm_steps,
+            "timeout": self.timeout,
+            "max_vm_steps": self.max_vm_steps,
+            "query": self.query,
+        }
+
+
+class QueryGuard:
+    """
+    Aplica orçamentos de tempo e de passos da VM a uma conexão SQLite.
+
+    Usa ``set_progress_handler`` enquanto ativo; ``cancel()`` pode ser
+    chamado de outra thread e interrompe a instrução em andamento. Em
+    leituras por blocos, ``pause()``/``resume()`` excluem do tempo limite
+    o intervalo em que o consumidor processa cada bloco.
+    """
+
+    def __init__(self, conn: sqlite3.Connection,
+                 timeout: Optional[float] = None,
+                 max_vm_steps: Optional[int] = None,
+                 query: Optional[str] = None,
+                 check_interval: int = 10000):
+        """
+        Args:
+            conn: Conexão onde a query será executada
+            timeout: Tempo máximo de parede em segundos (None = sem limite)
+            max_vm_steps: Máximo de instruções da VM (None = sem limite)
+            query: Query protegida, usada na mensagem de erro
+            check_interval: Instruções da VM entre verificações
+        """
+        self.conn = conn
+        self.timeout = timeout
+        self.max_vm_steps = max_vm_steps
+        self.query = query
+        self.check_interval = check_interval
+
+        self.reason = None
+        self.vm_steps = 0
+        self._start = None
+        self._paused_at = None
+        self._paused_total = 0.0
+        self._cancelled = threading.Event()
+
+    @property
+    def elapsed(self) -> float:
+        if not self._start:
+            return 0.0
+        now = self._paused_at or time.perf_counter()
+        return now - self._start - self._paused_total
+
+    def pause(self):
+        """Suspende a contagem do tempo limite (ex.: enquanto um bloco é consumido)."""
+        if self._paused_at is None:
+            self._paused_at = time.perf_counter()
+
+    def resume(self):
+        """Retoma a contagem do tempo limite."""
+        if self._paused_at is not None:
+            self._paused_total += time.perf_counter() - self._paused_at
+            self._paused_at = None
+
+    def _progress(self) -> int:
+        """Retorna diferente de zero para abortar a instrução atual."""
+        self.vm_steps += self.check_interval
+        if self._cancelled.is_set():
+            self.reason = "cancelled"
+        elif self.timeout is not None and self.elapsed > self.timeout:
+            self.reason = "timeout"
+        elif self.max_vm_steps is not None and self.vm_steps > self.max_vm_steps:
+            self.reason = "vm_steps"
+        return 1 if self.reason else 0
+
+    def cancel(self):
+        """Cancela a query em andamento (seguro entre threads)."""
+        self._cancelled.set()
+        try:
+            self.conn.interrupt()
+        except sqlite3.Error:
+            pass
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self.conn.set_progress_handler(self._progress, self.check_interval)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.conn.set_progress_handler(None, 0)
+        cancelled = self.reason or self._cancelled.is_set()
+        if exc_val is None:
+            status = "ok"
+        else:
+            status = (self.reason or "cancelled") if cancelled else "error"
+        SQL_DURATION.observe(self.elapsed, status=status)
+
+        if isinstance(exc_val, Exception) and cancelled:
+            error = QueryCancelledError(
+                self.reason or "cancelled", self.elapsed, self.vm_steps,
+                query=self.query, timeout=self.timeout,
+                max_vm_steps=self.max_vm_steps)
+            logger.warning(f"{error} ({self.vm_steps} passos da VM)")
+            raise error from exc_val
+        return False
+
+
+class QueryRegistry:
+    """Registro das queries em execução, permitindo cancelar todas de uma vez."""
+
+    def __init__(self):
+        self._active = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def guard(self, conn: sqlite3.Connection,
+              timeout: Optional[float] = None,
+              max_vm_steps: Optional[int] = None,
+              query: Optional[str] = None) -> Iterator[QueryGuard]:
+        """
+        Protege a execução de uma query com um QueryGuard registrado.
+
+        Args:
+            conn: Conexão da query
+            timeout: Tempo máximo em segundos
+            max_vm_steps: Máximo de instruções da VM
+            query: Query protegida
+
+        Yields:
+            QueryGuard ativo
+        """
+        guard = QueryGuard(conn, timeout=timeout,
+                           max_vm_steps=max_vm_steps, query=query)
+        with self._lock:
+            self._active.add(guard)
+        try:
+            with guard:
+                yield guard
+        finally:
+            with self._lock:
+                self._active.discard(guard)
+
+    def cancel_all(self) -> int:
+        """
+        Cancela todas as queries em execução.
+
+        Returns:
+            Número de queries canceladas
+        """
+        with self._lock:
+            guards = list(self._active)
+        for guard in guards:
+            guard.cancel()
+        return len(guards)
+
+    @property
+    def active_count(self) -> int:
+        with self._lock:
+            return len(self._active)
@@ -0,0 +1,587 @@
+"""
+Serviço HTTP/JSON em torno do AgentsManager.
+
+Um único processo mantém o cliente do LLM, o pool do banco e os caches
+(resultados e semântico), compartilhados por todos os front ends. A
+admissão é limitada (workers + fila); acima disso o serviço responde 429
+com ``Retry-After``. Chamadas ao LLM e consultas ao banco têm limites de
+concorrência independentes.
+
+Endpoints:
+    GET  /health                  Estado do serviço, fila e caches
+    GET  /metrics                 Métricas no formato de texto do Prometheus
+    POST /interpret {question}    Interpretação da pergunta
+    POST /sql {interpretation}    SQL validado para a interpretação
+    POST /complete {prompt}       Texto do LLM ("stream": true transmite)
+    POST /analyze {question}      Análise completa (execute_analysis)
+
+Uso:
+    python -m src.server --port 8765 --workers 8 --queue-size 16
+"""
+import os
+import sys
+import json
+import time
+import codecs
+import logging
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import pandas as pd
+
+from .agents import AgentsManager, DatabaseManager
+from .llm_cache import SemanticCache
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY
+from .query_guard import QueryCancelledError
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_DB_PATH = PROJECT_ROOT / "data" / "clientes_completo.db"
+MAX_BODY_BYTES = 1024 * 1024
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "Requisições ao serviço por rota e status",
+    ["route", "status"])
+
+
+class ServiceBusyError(RuntimeError):
+    """O serviço recusou a requisição por estar saturado (HTTP 429)."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(
+            f"Serviço de análise ocupado; tente novamente em {retry_after:.0f}s")
+
+
+class _StageLimitedLLM:
+    """Limita o número de chamadas simultâneas ao LLM compartilhado."""
+
+    def __init__(self, llm, slots: threading.BoundedSemaphore):
+        self._llm = llm
+        self._slots = slots
+
+    def __call__(self, prompt):
+        with self._slots:
+            return self._llm(prompt)
+
+    def stream(self, prompt) -> Iterator[Any]:
+        # A vaga fica ocupada durante todo o stream
+        with self._slots:
+            if hasattr(self._llm, "stream"):
+                yield from self._llm.stream(prompt)
+            else:
+                yield self._llm(prompt)
+
+
+class _SlotLimitedDatabase:
+    """
+    Faz a validação e a execução de queries passarem pelas vagas do banco.
+
+    Envolve o DatabaseManager do AgentsManager, de modo que toda rota que
+    valida (``/sql``, ``/analyze``) ou executa SQL respeite o mesmo limite;
+    os demais atributos são repassados ao gerenciador.
+    """
+
+    def __init__(self, db, slots: threading.BoundedSemaphore):
+        self._db = db
+        self._slots = slots
+
+    def validate_query(self, *args, **kwargs):
+        with self._slots:
+            return self._db.validate_query(*args, **kwargs)
+
+    def execute_query(self, *args, **kwargs):
+        with self._slots:
+            return self._db.execute_query(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+class AnalysisService:
+    """
+    Estado compartilhado do serviço: AgentsManager, limites e estatísticas.
+    """
+
+    def __init__(self, agents: AgentsManager, workers: int = 8,
+                 queue_size: int = 16, llm_concurrency: int = 4,
+                 db_concurrency: int = 4):
+        """
+        Args:
+            agents: AgentsManager compartilhado (LLM, banco e caches)
+            workers: Requisições processadas ao mesmo tempo
+            queue_size: Requisições aguardando um worker antes do 429
+            llm_concurrency: Chamadas simultâneas ao LLM
+            db_concurrency: Consultas simultâneas ao banco
+        """
+        self.agents = agents
+        self.workers = workers
+        self.queue_size = queue_size
+        self.llm_concurrency = llm_concurrency
+        self.db_concurrency = db_concurrency
+
+        self._llm_slots = threading.BoundedSemaphore(llm_concurrency)
+        self._db_slots = threading.BoundedSemaphore(db_concurrency)
+        self.agents.llm = _StageLimitedLLM(agents.llm, self._llm_slots)
+        self.agents.db = _SlotLimitedDatabase(agents.db, self._db_slots)
+
+        self._admission = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="analysis-api")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self._avg_latency = 1.0
+
+    def admit(self) -> bool:
+        """Reserva uma vaga na fila; False se o serviço estiver saturado."""
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self, elapsed: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            # Média móvel usada para sugerir o Retry-After
+            self._avg_latency = 0.9 * self._avg_latency + 0.1 * elapsed
+        self._admission.release()
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos até haver vaga."""
+        with self._lock:
+            waves = max(1, self.in_flight // max(1, self.workers))
+            return max(1, round(self._avg_latency * waves))
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Executa uma tarefa admitida no pool de workers e aguarda o resultado."""
+        def task():
+            with self._lock:
+                self.running += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+        return self._executor.submit(task).result()
+
+    def interpret(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        question = _require(payload, "question")
+        return {"interpretation": self.agents.interpret_request(question)}
+
+    def sql(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        interpretation = _require(payload, "interpretation")
+        return {"sql_query": self.agents.generate_sql(interpretation)}
+
+    def complete(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = _require(payload, "prompt")
+        return {"text": str(self.agents._call_llm("complete", prompt))}
+
+    def analyze(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Análise completa, no formato de ``execute_analysis`` serializado.
+
+        Args:
+            payload: question, max_rows (padrão 1000), with_insights
+
+        Returns:
+            Dict JSON com SQL, interpretação, linhas, resumo e tempos
+        """
+        question = _require(payload, "question")
+        max_rows = int(payload.get("max_rows", 1000))
+        timings = {}
+        start = step = time.perf_counter()
+
+        def mark(stage, since):
+            now = time.perf_counter()
+            timings[stage] = round(now - since, 4)
+            return now
+
+        try:
+            interpretation = self.agents.interpret_request(question)
+            step = mark("interpret", step)
+            sql_query = self.agents.generate_sql(interpretation)
+            step = mark("sql", step)
+            df = self.agents.db.execute_query(sql_query)
+            step = mark("query", step)
+
+            response = {
+                "success": not df.empty,
+                "sql_query": sql_query,
+                "interpretation": interpretation,
+                "summary": self.agents.generate_summary(df, interpretation),
+                "insights": "",
+                "columns": [str(col) for col in df.columns],
+                "rows": json.loads(df.head(max_rows).to_json(
+                    orient="records", date_format="iso", force_ascii=False)),
+                "total_records": len(df),
+            }
+            step = mark("format", step)
+            if payload.get("with_insights"):
+                response["insights"] = self.agents.generate_insights(df, question)
+                step = mark("insights", step)
+
+        except QueryCancelledError as e:
+            response = {"success": False, "error": str(e),
+                        "error_details": e.to_dict(),
+                        "summary": f"⏹️ **Consulta interrompida**: {str(e)}",
+                        "sql_query": e.query or "", "rows": []}
+
+        timings["total"] = round(time.perf_counter() - start, 4)
+        response["timings"] = timings
+        return response
+
+    def stream_completion(self, prompt: str) -> Iterator[str]:
+        return self.agents.stream_llm(prompt)
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            status = {
+                "status": "ok",
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "running": self.running,
+                "queued": max(0, self.in_flight - self.running),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "llm_concurrency": self.llm_concurrency,
+                "db_concurrency": self.db_concurrency,
+            }
+        status["result_cache"] = self.agents.db.cache_stats()
+        if self.agents.llm_cache is not None:
+            status["llm_cache"] = self.agents.llm_cache.stats()
+        return status
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _require(payload: Dict[str, Any], field: str) -> Any:
+    value = payload.get(field)
+    if not value:
+        raise ValueError(f"Campo obrigatório ausente: {field}")
+    return value
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """Roteia as requisições HTTP para o AnalysisService do servidor."""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "DataAnalysisAI/1.0"
+
+    ROUTES = {
+        "/interpret": "interpret",
+        "/sql": "sql",
+        "/complete": "complete",
+        "/analyze": "analyze",
+    }
+
+    @property
+    def service(self) -> AnalysisService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+    def _send_json(self, status: int, body: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body, ensure_ascii=False, default=str).encode("utf-8")
+        self._count(status)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise OverflowError(f"Corpo da requisição acima de {MAX_BODY_BYTES} bytes")
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(body, dict):
+            raise ValueError("o corpo deve ser um objeto JSON")
+        return body
+
+    def _count(self, status: int):
+        known = ("/health", "/metrics", *self.ROUTES)
+        route = self.path if self.path in known else "other"
+        HTTP_REQUESTS.inc(route=route, status=str(status))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        elif self.path == "/metrics":
+            data = REGISTRY.render().encode("utf-8")
+            self._count(200)
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"error": f"Rota não encontrada: {self.path}"})
+
+    def do_POST(self):
+        method = self.ROUTES.get(self.path)
+        if method is None:
+            self._send_json(404, {"error": f"Rota não encontrada: {self.path}"})
+            return
+        try:
+            payload = self._read_json()
+        except OverflowError as e:
+            self.close_connection = True
+            self._send_json(413, {"error": str(e)})
+            return
+        except ValueError as e:
+            self._send_json(400, {"error": f"JSON inválido: {e}"})
+            return
+
+        if not self.service.admit():
+            retry_after = self.service.retry_after()
+            self._send_json(
+                429, {"error": "Serviço ocupado", "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)})
+            return
+
+        start = time.perf_counter()
+        try:
+            if method == "complete" and payload.get("stream"):
+                self._stream_completion(_require(payload, "prompt"))
+                return
+            result = self.service.run(getattr(self.service, method), payload)
+            self._send_json(200, result)
+        except ValueError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"Erro em {self.path}: {e}")
+            self._send_json(500, {"error": str(e)})
+        finally:
+            self.service.release(time.perf_counter() - start)
+
+    def _stream_completion(self, prompt: str):
+        """Transmite o texto do LLM em blocos HTTP à medida que é gerado."""
+        self._count(200)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = self.service.stream_completion(prompt)
+        try:
+            for token in tokens:
+                data = token.encode("utf-8")
+                if data:
+                    self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+                    self.wfile.flush()
+        except OSError as e:
+            # Cliente desistiu (ex.: prazo do primeiro trecho); o stream é encerrado
+            logger.info(f"Cliente desconectou durante o stream: {e}")
+            self.close_connection = True
+            return
+        except Exception as e:
+            # O status já foi enviado; o cliente vê o texto truncado
+            logger.error(f"Erro no stream do LLM: {e}")
+            self.close_connection = True
+        finally:
+            tokens.close()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class AnalysisServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer com o AnalysisService acessível pelos handlers."""
+
+    daemon_threads = True
+
+    def __init__(self, address, service: AnalysisService):
+        self.service = service
+        super().__init__(address, AnalysisRequestHandler)
+
+
+def _set_read_timeout(response, timeout: float):
+    """Troca o timeout do socket de uma resposta HTTP já aberta."""
+    sock = getattr(getattr(response.fp, "raw", None), "_sock", None)
+    if sock is not None:
+        sock.settimeout(timeout)
+
+
+class AnalysisClient:
+    """
+    Cliente do serviço de análise com a interface usada pelo app.
+
+    Interpretação, SQL e textos do LLM vêm do serviço; resumo, tabela e
+    gráficos dos dados já carregados são gerados localmente pelo
+    ``renderer`` (um AgentsManager sem LLM).
+    """
+
+    def __init__(self, base_url: str, renderer: Optional[AgentsManager] = None,
+                 timeout: float = 120.0):
+        """
+        Args:
+            base_url: URL do serviço (ex.: http://127.0.0.1:8765)
+            renderer: AgentsManager local para formatar respostas
+            timeout: Tempo máximo de cada requisição em segundos
+        """
+        self.base_url = base_url.rstrip("/")
+        self.renderer = renderer
+        self.timeout = timeout
+        self.logger = logging.getLogger(__name__)
+
+    def _request(self, method: str, path: str,
+                 payload: Optional[Dict[str, Any]] = None,
+                 timeout: Optional[float] = None):
+        data = None
+        headers = {}
+        if payload is not None:
+            data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(
+            self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            return urllib.request.urlopen(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise ServiceBusyError(float(e.headers.get("Retry-After") or 1))
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise RuntimeError(f"Serviço de análise: {message}") from e
+        except urllib.error.URLError as e:
+            raise ConnectionError(
+                f"Serviço de análise indisponível em {self.base_url}: {e.reason}") from e
+
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        with self._request("POST", path, payload) as response:
+            return json.loads(response.read())
+
+    def health(self) -> Dict[str, Any]:
+        with self._request("GET", "/health", timeout=5) as response:
+            return json.loads(response.read())
+
+    def interpret_request(self, user_input: str) -> Dict[str, Any]:
+        return self._post("/interpret", {"question": user_input})["interpretation"]
+
+    def generate_sql(self, interpretation: Dict[str, Any]) -> str:
+        return self._post("/sql", {"interpretation": interpretation})["sql_query"]
+
+    def llm(self, prompt: str) -> str:
+        return self._post("/complete", {"prompt": prompt})["text"]
+
+    def stream_llm(self, prompt: str,
+                   on_token: Optional[Callable[[str], None]] = None,
+                   first_token_timeout: Optional[float] = None,
+                   stop: Optional[threading.Event] = None) -> Iterator[str]:
+        """
+        Transmite o texto do LLM do serviço, como ``AgentsManager.stream_llm``.
+
+        ``first_token_timeout`` vale só até o primeiro trecho; depois, pausas
+        entre trechos usam o ``timeout`` normal do cliente.
+
+        Raises:
+            TimeoutError: Primeiro trecho não chegou no prazo
+        """
+        response = self._request(
+            "POST", "/complete", {"prompt": prompt, "stream": True},
+            timeout=first_token_timeout or self.timeout)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        first = first_token_timeout is not None
+        with response:
+            while True:
+                data = response.read1(8192)
+                if first:
+                    _set_read_timeout(response, self.timeout)
+                    first = False
+                if not data or (stop is not None and stop.is_set()):
+                    break
+                token = decoder.decode(data)
+                if token:
+                    if on_token is not None:
+                        on_token(token)
+                    yield token
+
+    def analyze(self, question: str, **options) -> Dict[str, Any]:
+        """Análise completa executada no serviço (rota /analyze)."""
+        result = self._post("/analyze", {"question": question, **options})
+        result["data"] = pd.DataFrame(result.get("rows", []),
+                                      columns=result.get("columns"))
+        return result
+
+    def format_complete_response(self, df: pd.DataFrame,
+                                 interpretation: Dict[str, Any],
+                                 user_input: str) -> Dict[str, Any]:
+        return self.renderer.format_complete_response(df, interpretation, user_input)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serviço HTTP de análise de dados.")
+    parser.add_argument("--host", default=os.getenv("ANALYSIS_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int,
+                        default=int(os.getenv("ANALYSIS_API_PORT", "8765")))
+    parser.add_argument("--db", default=str(DEFAULT_DB_PATH), help="Banco SQLite")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Requisições processadas ao mesmo tempo")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Requisições em espera antes de responder 429")
+    parser.add_argument("--llm-concurrency", type=int, default=4,
+                        help="Chamadas simultâneas ao LLM")
+    parser.add_argument("--db-concurrency", type=int, default=4,
+                        help="Consultas simultâneas ao banco")
+    parser.add_argument("--timeout", type=float,
+                        default=float(os.getenv("QUERY_TIMEOUT", "60")),
+                        help="Tempo máximo de cada query em segundos")
+    parser.add_argument("--llm", help="LLM alternativo no formato módulo:função")
+    parser.add_argument("--llm-cache", default=str(PROJECT_ROOT / "data" / "llm_cache.db"),
+                        help="Arquivo do cache semântico ('' desativa)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    from .batch import build_llm
+
+    database = DatabaseManager(
+        args.db, pool_size=max(4, args.db_concurrency),
+        query_timeout=args.timeout)
+    llm_cache = SemanticCache(args.llm_cache) if args.llm_cache else None
+    agents = AgentsManager(build_llm(args.llm), database_manager=database,
+                           llm_cache=llm_cache)
+    service = AnalysisService(
+        agents, workers=args.workers, queue_size=args.queue_size,
+        llm_concurrency=args.llm_concurrency, db_concurrency=args.db_concurrency)
+
+    server = AnalysisServer((args.host, args.port), service)
+    logger.info(f"Serviço de análise em http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+        database.close()
+        if llm_cache is not None:
+            llm_cache.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
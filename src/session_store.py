@@ -0,0 +1,396 @@
+import os
+import time
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from .figures import close_figure
+    from .memory import response_bytes
+    from .metrics import REGISTRY
+except ImportError:
+    from figures import close_figure
+    from memory import response_bytes
+    from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SESSION_EVICTIONS = REGISTRY.counter(
+    "session_responses_evicted_total",
+    "Respostas de sessões compactadas por motivo (budget ou idle) e destino "
+    "dos dados (spill ou drop), ou esquecidas (reason=expired, mode=forget)",
+    ["reason", "mode"])
+
+# Campos mantidos quando a resposta é compactada (texto e metadados)
+COMPACT_KEYS = (
+    "success", "summary", "interpretation", "sql_query", "total_records",
+    "total_available", "record_limit", "analyzed_records", "is_limited",
+    "timings", "memory", "memory_bytes", "error", "error_details",
+)
+
+RESIDENT, SPILLED, EVICTED = "resident", "spilled", "evicted"
+# Compactada, com os dados ainda em memória enquanto são gravados em disco
+SPILLING = "spilling"
+
+
+class _Entry:
+    """Resposta de uma sessão e o estado em que ela está guardada."""
+
+    __slots__ = ("response", "compact", "rerun", "nbytes", "accessed",
+                 "state", "spill_path", "pending")
+
+    def __init__(self, response: Dict[str, Any], rerun: Optional[Dict[str, Any]]):
+        self.response = response
+        self.compact: Optional[Dict[str, Any]] = None
+        self.rerun = rerun
+        # Medida uma vez por with_memory_profile; só mede se faltar
+        nbytes = response.get("memory_bytes")
+        self.nbytes = nbytes if nbytes is not None else response_bytes(response)
+        self.accessed = time.monotonic()
+        self.state = RESIDENT
+        self.spill_path: Optional[Path] = None
+        self.pending: Optional[pd.DataFrame] = None
+
+
+def compact_response(response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Resumo leve de uma resposta: textos, contagens e metadados.
+
+    Descarta dados, tabela HTML e figuras; guarda as colunas e o número de
+    linhas para exibição.
+
+    Args:
+        response: Dict de resposta de uma análise
+
+    Returns:
+        Dict compacto
+    """
+    compact = {key: response[key] for key in COMPACT_KEYS if key in response}
+    data = response.get("data")
+    if isinstance(data, pd.DataFrame):
+        compact["columns"] = [str(col) for col in data.columns]
+        compact["rows"] = len(data)
+    return compact
+
+
+def release_figures(response: Dict[str, Any]):
+    """Fecha a figura do matplotlib de uma resposta e solta as figuras."""
+    close_figure(response.get("matplotlib_fig"))
+    response["matplotlib_fig"] = None
+    response["plotly_fig"] = None
+
+
+class SessionStore:
+    """
+    Última resposta de cada sessão, com limite de memória por processo.
+
+    Substitui guardar a resposta inteira em ``st.session_state``: todas as
+    sessões dividem ``budget_bytes``. Quando o limite é excedido, ou uma
+    sessão fica ociosa por mais de ``idle_seconds``, as respostas menos
+    usadas são compactadas: as figuras são fechadas, os dados vão para
+    disco (se houver ``spill_dir``) ou são descartados, e ficam só o resumo
+    e o ``rerun`` (o necessário para reexecutar a consulta). Respostas
+    compactadas sem acesso por mais de ``forget_seconds`` (ex.: de sessões
+    encerradas) são esquecidas, junto com seus arquivos em disco.
+
+    A gravação em disco acontece fora do lock, para não bloquear as outras
+    sessões enquanto os dados são serializados.
+    """
+
+    def __init__(self,
+                 budget_bytes: int = 512 * 1024 * 1024,
+                 idle_seconds: Optional[float] = 900.0,
+                 spill_dir: Optional[str] = None,
+                 max_entries: int = 1000,
+                 forget_seconds: Optional[float] = 3600.0):
+        """
+        Inicializa o armazenamento.
+
+        Args:
+            budget_bytes: Memória máxima das respostas residentes
+            idle_seconds: Ociosidade que compacta uma resposta (None = nunca)
+            spill_dir: Diretório para os dados compactados (None = descartar)
+            max_entries: Número máximo de sessões lembradas
+            forget_seconds: Ociosidade que esquece uma resposta compactada
+                (None = só pelo limite de sessões)
+        """
+        self.budget_bytes = budget_bytes
+        self.idle_seconds = idle_seconds
+        self.forget_seconds = forget_seconds
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_entries = max_entries
+
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.spills = 0
+        self.reloads = 0
+        self.expired = 0
+
+        if self.spill_dir:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+
+    def _spill(self, data: pd.DataFrame) -> Optional[Path]:
+        """Grava os dados de uma resposta em disco."""
+        try:
+            fd, path = tempfile.mkstemp(prefix="session-", suffix=".pkl",
+                                        dir=self.spill_dir)
+            os.close(fd)
+            data.to_pickle(path)
+            return Path(path)
+        except Exception as e:
+            logger.warning(f"Não foi possível gravar a resposta em disco: {e}")
+            return None
+
+    @staticmethod
+    def _unlink(entry: _Entry):
+        if entry.spill_path is not None:
+            try:
+                entry.spill_path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Não foi possível remover {entry.spill_path}: {e}")
+            entry.spill_path = None
+
+    def _compact(self, entry: _Entry, reason: str) -> bool:
+        """
+        Compacta uma resposta residente (chamada com o lock).
+
+        Returns:
+            True se os dados ficaram em ``entry.pending`` para ``_flush``
+            gravar em disco fora do lock
+        """
+        response = entry.response
+        release_figures(response)
+        entry.compact = compact_response(response)
+        entry.response = None
+        self._bytes -= entry.nbytes
+        entry.nbytes = 0
+        self.evictions += 1
+
+        data = response.get("data")
+        if self.spill_dir and isinstance(data, pd.DataFrame) and not data.empty:
+            entry.pending = data
+            entry.state = SPILLING
+            return True
+        entry.state = EVICTED
+        SESSION_EVICTIONS.inc(reason=reason, mode="drop")
+        return False
+
+    def _flush(self, spills: List[Tuple[Hashable, _Entry, str]]):
+        """Grava em disco os dados das respostas compactadas (sem o lock)."""
+        for key, entry, reason in spills:
+            data = entry.pending
+            path = self._spill(data) if data is not None else None
+            with self._lock:
+                if (self._entries.get(key) is not entry or entry.state != SPILLING
+                        or entry.pending is not data):
+                    # Restaurada, substituída ou esquecida durante a gravação
+                    if path is not None:
+                        path.unlink(missing_ok=True)
+                    continue
+                entry.pending = None
+                entry.spill_path = path
+                entry.state = SPILLED if path else EVICTED
+                if path:
+                    self.spills += 1
+                SESSION_EVICTIONS.inc(reason=reason,
+                                      mode="spill" if path else "drop")
+
+    def _enforce(self, keep: Optional[Hashable] = None
+                 ) -> List[Tuple[Hashable, _Entry, str]]:
+        """
+        Aplica ociosidade, limite de memória e de sessões (com o lock).
+
+        Returns:
+            Respostas compactadas a gravar em disco com ``_flush``
+        """
+        spills = []
+        now = time.monotonic()
+        if self.forget_seconds is not None:
+            for key, entry in list(self._entries.items()):
+                if (key != keep and entry.state in (SPILLED, EVICTED)
+                        and now - entry.accessed > self.forget_seconds):
+                    self._drop(key)
+                    self.expired += 1
+                    SESSION_EVICTIONS.inc(reason="expired", mode="forget")
+
+        if self.idle_seconds is not None:
+            for key, entry in self._entries.items():
+                if (key != keep and entry.state == RESIDENT
+                        and now - entry.accessed > self.idle_seconds):
+                    if self._compact(entry, "idle"):
+                        spills.append((key, entry, "idle"))
+
+        # Do menos para o mais recentemente usado
+        for key, entry in list(self._entries.items()):
+            if self._bytes <= self.budget_bytes:
+                break
+            if key != keep and entry.state == RESIDENT:
+                if self._compact(entry, "budget"):
+                    spills.append((key, entry, "budget"))
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                break
+            self._drop(oldest)
+        return spills
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key)
+        if entry.state == RESIDENT:
+            release_figures(entry.response)
+            self._bytes -= entry.nbytes
+        entry.pending = None
+        self._unlink(entry)
+
+    def put(self, key: Hashable, response: Dict[str, Any],
+            rerun: Optional[Dict[str, Any]] = None):
+        """
+        Guarda a resposta de uma sessão, substituindo a anterior.
+
+        Args:
+            key: Identificador da sessão
+            response: Dict de resposta de uma análise
+            rerun: Como reexecutar a consulta se os dados forem descartados
+                (ex.: query, limite de registros)
+        """
+        entry = _Entry(response, rerun)
+        with self._lock:
+            if key in self._entries:
+                previous = self._entries[key]
+                if previous.response is not response:
+                    self._drop(key)
+                else:
+                    self._entries.pop(key)
+                    self._bytes -= previous.nbytes
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            spills = self._enforce(keep=key)
+        self._flush(spills)
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """
+        Busca a resposta de uma sessão.
+
+        Dados gravados em disco são recarregados. Se foram descartados, o
+        retorno é o resumo compacto com ``evicted=True`` e ``rerun``, que
+        pode ser completado com ``restore``.
+
+        Args:
+            key: Identificador da sessão
+
+        Returns:
+            Dict de resposta, resumo compacto ou None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.accessed = time.monotonic()
+            self._entries.move_to_end(key)
+            if entry.state == RESIDENT:
+                return entry.response
+            if entry.state == EVICTED:
+                return {**entry.compact, "evicted": True, "rerun": entry.rerun}
+            # Ainda sendo gravada em disco: os dados continuam em memória
+            pending = entry.pending if entry.state == SPILLING else None
+            spill_path = entry.spill_path
+
+        if pending is not None:
+            return self.restore(key, pending)
+        try:
+            data = pd.read_pickle(spill_path)
+        except Exception as e:
+            logger.warning(f"Não foi possível recarregar {spill_path}: {e}")
+            with self._lock:
+                if entry.state == SPILLED and entry.spill_path == spill_path:
+                    self._unlink(entry)
+                    entry.state = EVICTED
+                return {**entry.compact, "evicted": True, "rerun": entry.rerun}
+        return self.restore(key, data)
+
+    def restore(self, key: Hashable, data: pd.DataFrame,
+                **updates) -> Optional[Dict[str, Any]]:
+        """
+        Devolve os dados a uma resposta compactada.
+
+        Tabela HTML e figuras não são recriadas; quem exibe a resposta as
+        gera de novo a partir dos dados, se precisar.
+
+        Args:
+            key: Identificador da sessão
+            data: Dados recarregados ou reexecutados
+            **updates: Campos a atualizar (ex.: total_available)
+
+        Returns:
+            Resposta residente, ou None se a sessão não existir mais
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.state == RESIDENT:
+                # Os dados novos podem ser maiores que os medidos no put
+                response = entry.response
+                response.update(data=data, **updates)
+                self._bytes -= entry.nbytes
+            else:
+                response = {**entry.compact, **updates, "data": data,
+                            "table_html": "", "matplotlib_fig": None,
+                            "plotly_fig": None}
+                for key_name in ("columns", "rows"):
+                    response.pop(key_name, None)
+                self._unlink(entry)
+                entry.response = response
+                entry.compact = None
+                entry.pending = None
+                entry.state = RESIDENT
+                self.reloads += 1
+            entry.nbytes = response["memory_bytes"] = response_bytes(response)
+            entry.accessed = time.monotonic()
+            self._bytes += entry.nbytes
+            spills = self._enforce(keep=key)
+        self._flush(spills)
+        return response
+
+    def discard(self, key: Hashable):
+        """Esquece a resposta de uma sessão (e seu arquivo em disco)."""
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+    def clear(self):
+        """Esquece todas as respostas."""
+        with self._lock:
+            for key in list(self._entries):
+                self._drop(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Retorna contadores de uso do armazenamento.
+
+        Returns:
+            Dict com sessões por estado, ocupação e evicções
+        """
+        with self._lock:
+            states = {RESIDENT: 0, SPILLING: 0, SPILLED: 0, EVICTED: 0}
+            for entry in self._entries.values():
+                states[entry.state] += 1
+            return {
+                'sessions': len(self._entries),
+                **states,
+                'bytes': self._bytes,
+                'budget_bytes': self.budget_bytes,
+                'evictions': self.evictions,
+                'spills': self.spills,
+                'reloads': self.reloads,
+                'expired': self.expired,
+            }
@@ -0,0 +1,352 @@
+"""
+Reescrita de queries SQL (dialeto SQLite) baseada em tokens.
+
+Em vez de expressões regulares sobre o texto, a query é tokenizada
+respeitando literais, identificadores entre aspas, comentários e
+parênteses. Assim LIMIT/ORDER BY de subqueries, CTEs e colunas como
+"limite" nunca são confundidos com as cláusulas da query externa.
+"""
+import re
+from typing import List, Optional, Tuple
+
+
+class SQLRewriteError(ValueError):
+    """A query não pôde ser analisada ou reescrita com segurança."""
+
+
+class Token:
+    """Token léxico de uma query SQL."""
+
+    __slots__ = ("kind", "value")
+
+    def __init__(self, kind: str, value: str):
+        self.kind = kind
+        self.value = value
+
+    @property
+    def upper(self) -> str:
+        return self.value.upper() if self.kind == "word" else ""
+
+    def __repr__(self):
+        return f"Token({self.kind!r}, {self.value!r})"
+
+
+_TOKEN_PATTERNS = [
+    ("ws", r"\s+"),
+    ("comment", r"--[^\n]*|/\*.*?(?:\*/|$)"),
+    ("string", r"'(?:[^']|'')*'"),
+    ("ident", r'"(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\]'),
+    ("blob", r"[xX]'[0-9a-fA-F]*'"),
+    ("number", r"0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"),
+    # Identificadores sem aspas aceitam letras Unicode, como no SQLite
+    ("param", r"\?\d*|[:@$][^\W\d]\w*"),
+    ("word", r"[^\W\d][\w$]*"),
+    ("lparen", r"\("),
+    ("rparen", r"\)"),
+    ("semicolon", r";"),
+    ("punct", r"\|\||<<|>>|<=|>=|==|!=|<>|[-+*/%<>=~&|,.]"),
+]
+_TOKEN_RE = re.compile(
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in _TOKEN_PATTERNS),
+    re.DOTALL)
+
+_TRIVIA = ("ws", "comment")
+_AGGREGATES = {"COUNT", "SUM", "AVG", "MIN", "MAX", "TOTAL", "GROUP_CONCAT"}
+_UNSAFE_FOR_PUSHDOWN = {
+    "WHERE", "GROUP", "HAVING", "ORDER", "DISTINCT", "JOIN", "UNION",
+    "EXCEPT", "INTERSECT", "WINDOW", "VALUES", "OVER", "WITH"}
+
+
+def tokenize(sql: str) -> List[Token]:
+    """
+    Quebra uma query SQLite em tokens.
+
+    Args:
+        sql: Query SQL
+
+    Returns:
+        Lista de tokens (incluindo espaços e comentários)
+
+    Raises:
+        SQLRewriteError: Se houver caracteres não reconhecidos
+    """
+    tokens = []
+    pos = 0
+    while pos < len(sql):
+        match = _TOKEN_RE.match(sql, pos)
+        if match is None:
+            raise SQLRewriteError(
+                f"Caractere inesperado na posição {pos}: {sql[pos]!r}")
+        tokens.append(Token(match.lastgroup, match.group()))
+        pos = match.end()
+    return tokens
+
+
+def _render(tokens: List[Token]) -> str:
+    return "".join(token.value for token in tokens)
+
+
+def _statement_tokens(sql: str) -> List[Token]:
+    """Tokeniza uma única instrução, sem ponto e vírgula e trivia finais."""
+    tokens = tokenize(sql)
+
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.kind == "lparen":
+            depth += 1
+        elif token.kind == "rparen":
+            depth -= 1
+            if depth < 0:
+                raise SQLRewriteError("Parênteses desbalanceados")
+        elif token.kind == "semicolon" and depth == 0:
+            rest = [t for t in tokens[i + 1:] if t.kind not in _TRIVIA + ("semicolon",)]
+            if rest:
+                raise SQLRewriteError("Apenas uma instrução SQL é suportada")
+            tokens = tokens[:i]
+            break
+    if depth > 0:
+        raise SQLRewriteError("Parênteses desbalanceados")
+
+    while tokens and tokens[-1].kind in _TRIVIA:
+        tokens.pop()
+    while tokens and tokens[0].kind in _TRIVIA:
+        tokens.pop(0)
+    if not tokens:
+        raise SQLRewriteError("Query vazia")
+    return tokens
+
+
+def _top_level(tokens: List[Token]) -> List[Tuple[int, Token]]:
+    """Tokens significativos fora de parênteses, com seus índices."""
+    result = []
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.kind == "lparen":
+            if depth == 0:
+                result.append((i, token))
+            depth += 1
+        elif token.kind == "rparen":
+            depth -= 1
+            if depth == 0:
+                result.append((i, token))
+        elif depth == 0 and token.kind not in _TRIVIA:
+            result.append((i, token))
+    return result
+
+
+def _split_limit(tokens: List[Token]
+                 ) -> Tuple[List[Token], Optional[str], Optional[str]]:
+    """Separa o LIMIT/OFFSET externo do restante da instrução."""
+    top = _top_level(tokens)
+    limit_pos = None
+    for pos, (_, token) in enumerate(top):
+        if token.upper == "LIMIT":
+            limit_pos = pos
+    if limit_pos is None:
+        return tokens, None, None
+
+    first = top[limit_pos][0]
+    tail = tokens[first + 1:]
+
+    # LIMIT <expr> [OFFSET <expr>] ou LIMIT <offset>, <count>
+    depth = 0
+    split_at = None
+    comma = False
+    for i, token in enumerate(tail):
+        if token.kind == "lparen":
+            depth += 1
+        elif token.kind == "rparen":
+            depth -= 1
+        elif depth == 0 and (token.upper == "OFFSET" or token.value == ","):
+            split_at = i
+            comma = token.value == ","
+            break
+
+    if split_at is None:
+        limit_expr = _render(tail).strip()
+        offset_expr = None
+    else:
+        first_expr = _render(tail[:split_at]).strip()
+        second_expr = _render(tail[split_at + 1:]).strip()
+        if comma:
+            offset_expr, limit_expr = first_expr, second_expr
+        else:
+            limit_expr, offset_expr = first_expr, second_expr
+
+    if not limit_expr:
+        raise SQLRewriteError("LIMIT sem valor")
+
+    body = tokens[:first]
+    while body and body[-1].kind in _TRIVIA:
+        body.pop()
+    return body, limit_expr, offset_expr
+
+
+def _strip_order_by(tokens: List[Token]) -> List[Token]:
+    """Remove o ORDER BY externo (tokens já sem LIMIT externo)."""
+    top = _top_level(tokens)
+    for pos in range(len(top) - 1, 0, -1):
+        if top[pos][1].upper == "BY" and top[pos - 1][1].upper == "ORDER":
+            body = tokens[:top[pos - 1][0]]
+            while body and body[-1].kind in _TRIVIA:
+                body.pop()
+            return body
+        if top[pos][1].upper in ("SELECT", "FROM", "UNION", "EXCEPT", "INTERSECT"):
+            break
+    return tokens
+
+
+def split_limit(sql: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Separa o LIMIT/OFFSET da query externa.
+
+    Args:
+        sql: Query SQL
+
+    Returns:
+        Tuple (query sem LIMIT externo, expressão do LIMIT, expressão do OFFSET)
+    """
+    body, limit_expr, offset_expr = _split_limit(_statement_tokens(sql))
+    return _render(body), limit_expr, offset_expr
+
+
+def strip_limit(sql: str) -> str:
+    """
+    Remove o LIMIT/OFFSET da query externa, preservando o das subqueries.
+
+    Args:
+        sql: Query SQL
+
+    Returns:
+        Query sem LIMIT externo
+
+    Exemplos (verificados com ``python -m doctest src/sql_rewrite.py``):
+        >>> strip_limit("SELECT * FROM (SELECT * FROM t LIMIT 3) LIMIT 10")
+        'SELECT * FROM (SELECT * FROM t LIMIT 3)'
+        >>> strip_limit("SELECT estado, AVG(valor) AS média FROM compras "
+        ...             "GROUP BY estado LIMIT 5")
+        'SELECT estado, AVG(valor) AS média FROM compras GROUP BY estado'
+    """
+    return split_limit(sql)[0]
+
+
+def _literal_int(expr: Optional[str]) -> Optional[int]:
+    if expr is not None and re.fullmatch(r"\d+", expr.strip()):
+        return int(expr)
+    return None
+
+
+def _push_down_limit(tokens: List[Token], limit: int) -> List[Token]:
+    """
+    Copia o limite para a subquery do FROM quando isso não muda o resultado.
+
+    Só se aplica a ``SELECT <colunas> FROM (<subquery>) [alias]`` sem
+    filtros, junções, agregações, DISTINCT ou ordenação externos.
+    """
+    top = _top_level(tokens)
+    if not top or top[0][1].upper != "SELECT":
+        return tokens
+    if any(token.upper in _UNSAFE_FOR_PUSHDOWN for _, token in top):
+        return tokens
+
+    from_pos = next(
+        (pos for pos, (_, token) in enumerate(top) if token.upper == "FROM"), None)
+    if from_pos is None or from_pos + 2 >= len(top):
+        return tokens
+
+    # Lista de colunas sem agregações ou funções de janela
+    select_list = tokens[top[0][0] + 1:top[from_pos][0]]
+    if any(t.upper in _AGGREGATES or t.upper == "OVER" for t in select_list):
+        return tokens
+
+    open_idx, open_tok = top[from_pos + 1]
+    close_idx, close_tok = top[from_pos + 2]
+    if open_tok.kind != "lparen" or close_tok.kind != "rparen":
+        return tokens
+
+    # Depois da subquery só pode haver um alias
+    trailing = top[from_pos + 3:]
+    if trailing and trailing[0][1].upper == "AS":
+        trailing = trailing[1:]
+    if len(trailing) > 1 or (trailing and trailing[0][1].kind not in ("word", "ident")):
+        return tokens
+
+    inner = tokens[open_idx + 1:close_idx]
+    inner_top = _top_level(inner)
+    if not inner_top or inner_top[0][1].upper not in ("SELECT", "WITH"):
+        return tokens
+
+    try:
+        inner_body, inner_limit, inner_offset = _split_limit(list(inner))
+    except SQLRewriteError:
+        return tokens
+
+    if inner_limit is not None:
+        current = _literal_int(inner_limit)
+        if current is None or current <= limit:
+            return tokens
+        limit_sql = f" LIMIT {limit}"
+        if inner_offset is not None:
+            limit_sql += f" OFFSET {inner_offset}"
+    else:
+        limit_sql = f" LIMIT {limit}"
+
+    new_inner = tokenize(_render(inner_body) + limit_sql)
+    return tokens[:open_idx + 1] + new_inner + tokens[close_idx:]
+
+
+def apply_limit(sql: str, limit: int, offset: int = 0,
+                push_down: bool = True) -> str:
+    """
+    Define o LIMIT/OFFSET da query externa.
+
+    Um LIMIT externo existente é substituído; LIMITs de subqueries e CTEs
+    são preservados. Quando seguro, o limite também é aplicado à subquery
+    do FROM para evitar varreduras completas.
+
+    Args:
+        sql: Query SQL
+        limit: Número máximo de linhas
+        offset: Linhas a pular
+        push_down: Aplica o limite também à subquery quando seguro
+
+    Returns:
+        Query com o novo LIMIT
+
+    Exemplos:
+        >>> apply_limit("SELECT limite FROM regras LIMIT 50", 10)
+        'SELECT limite FROM regras LIMIT 10'
+        >>> apply_limit("SELECT canal, COUNT(*) AS variação FROM compras "
+        ...             "GROUP BY canal", 5, offset=5)
+        'SELECT canal, COUNT(*) AS variação FROM compras GROUP BY canal LIMIT 5 OFFSET 5'
+    """
+    if limit is None or limit < 0:
+        raise SQLRewriteError(f"Limite inválido: {limit}")
+
+    body, _, _ = _split_limit(_statement_tokens(sql))
+    if push_down:
+        body = _push_down_limit(body, limit + offset)
+
+    rewritten = f"{_render(body)} LIMIT {int(limit)}"
+    if offset:
+        rewritten += f" OFFSET {int(offset)}"
+    return rewritten
+
+
+def count_query(sql: str, alias: str = "total") -> str:
+    """
+    Gera uma query que conta as linhas da query original sem LIMIT.
+
+    ORDER BY e LIMIT externos são removidos, pois não alteram a contagem
+    e forçariam uma ordenação desnecessária.
+
+    Args:
+        sql: Query SQL
+        alias: Nome da coluna com o total
+
+    Returns:
+        Query de contagem
+    """
+    body, _, _ = _split_limit(_statement_tokens(sql))
+    body = _strip_order_by(body)
+    return f"SELECT COUNT(*) AS {alias} FROM ({_render(body)}) AS subquery"
@@ -0,0 +1,257 @@
+import json
+import time
+import inspect
+import logging
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+try:
+    from .memory import memory_stage
+except ImportError:
+    from memory import memory_stage
+
+logger = logging.getLogger(__name__)
+
+_current: contextvars.ContextVar = contextvars.ContextVar("timings", default=None)
+
+
+class Timings:
+    """
+    Coletor de spans (etapas cronometradas) de uma análise.
+
+    Os spans são registrados pelo ``span``/``timed`` enquanto o coletor está
+    ativo (``collect_timings``); fora dele a instrumentação não custa nada
+    além de uma leitura de ContextVar.
+    """
+
+    def __init__(self, label: Optional[str] = None):
+        """
+        Args:
+            label: Identificação da análise nos logs (ex.: a pergunta)
+        """
+        self.label = label
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, **meta):
+        """
+        Registra um span.
+
+        Args:
+            name: Nome da etapa
+            start: ``time.perf_counter()`` do início
+            duration: Duração em segundos
+            **meta: Informações extras (ex.: linhas, erro)
+        """
+        span = {
+            "name": name,
+            "start": round(start - self._start, 6),
+            "duration": round(duration, 6),
+            "thread": threading.current_thread().name,
+        }
+        if meta:
+            span.update(meta)
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s["start"])
+
+    def stages(self) -> Dict[str, float]:
+        """Tempo total por etapa (somando chamadas repetidas), em segundos."""
+        totals: Dict[str, float] = {}
+        for span in self.spans:
+            totals[span["name"]] = round(
+                totals.get(span["name"], 0.0) + span["duration"], 6)
+        return totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Resumo serializável dos tempos.
+
+        Returns:
+            Dict com total (tempo de parede), stages e spans
+        """
+        return {
+            "total": round(time.perf_counter() - self._start, 6),
+            "stages": self.stages(),
+            "spans": self.spans,
+        }
+
+    def log(self, target: Optional[logging.Logger] = None, **fields):
+        """
+        Emite os tempos como um log estruturado (uma linha JSON).
+
+        Args:
+            target: Logger usado (padrão: o deste módulo)
+            **fields: Campos extras do evento (ex.: sql_query)
+        """
+        event = {"event": "analysis_timings", "label": self.label,
+                 "started_at": self.started_at, **fields, **self.to_dict()}
+        (target or logger).info(
+            json.dumps(event, ensure_ascii=False, default=str),
+            extra={"timings": event})
+
+
+def current_timings() -> Optional[Timings]:
+    """Coletor ativo no contexto atual, se houver."""
+    return _current.get()
+
+
+@contextmanager
+def collect_timings(timings: Optional[Timings] = None,
+                    label: Optional[str] = None) -> Iterator[Timings]:
+    """
+    Ativa um coletor de spans no contexto atual.
+
+    Se já houver um coletor ativo e ``timings`` não for informado, o
+    existente é reutilizado, de modo que chamadas aninhadas (ex.:
+    ``execute_analysis`` → ``format_complete_response``) somem no mesmo.
+
+    Args:
+        timings: Coletor a ativar (padrão: o ativo ou um novo)
+        label: Identificação de um coletor novo
+
+    Yields:
+        Coletor ativo
+    """
+    if timings is None:
+        timings = _current.get() or Timings(label)
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name: str, **meta) -> Iterator[None]:
+    """
+    Cronometra um bloco e o registra no coletor ativo.
+
+    Com um perfil de memória ativo (``memory.profile_memory``), o bloco
+    também é medido como uma etapa dele.
+
+    Args:
+        name: Nome da etapa
+        **meta: Informações extras do span
+    """
+    timings = _current.get()
+    with memory_stage(name):
+        if timings is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            meta["error"] = type(e).__name__
+            raise
+        finally:
+            timings.add(name, start, time.perf_counter() - start, **meta)
+
+
+def timed(name: Optional[str] = None) -> Callable:
+    """
+    Decorador que registra cada chamada da função como um span.
+
+    Funciona com funções comuns e corrotinas.
+
+    Args:
+        name: Nome da etapa (padrão: nome da função)
+    """
+    def decorator(func: Callable) -> Callable:
+        stage = name or func.__name__
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def with_timings(func: Callable) -> Callable:
+    """
+    Decorador para funções que retornam o dict de resposta de uma análise.
+
+    Ativa um coletor (reutilizando o ativo, se houver), grava o resumo em
+    ``response["timings"]`` e, quando o coletor foi criado aqui, emite o
+    log estruturado da análise.
+    """
+    def finish(timings: Timings, outermost: bool, response: Any) -> Any:
+        if isinstance(response, dict):
+            response["timings"] = timings.to_dict()
+            if outermost:
+                timings.log(success=response.get("success"),
+                            sql_query=response.get("sql_query"))
+        return response
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            outermost = _current.get() is None
+            with collect_timings() as timings:
+                response = await func(*args, **kwargs)
+            return finish(timings, outermost, response)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        outermost = _current.get() is None
+        with collect_timings() as timings:
+            response = func(*args, **kwargs)
+        return finish(timings, outermost, response)
+    return wrapper
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro de log como um objeto JSON por linha."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+        }
+        # Eventos estruturados (tempos, memória) viram campos do objeto
+        event = getattr(record, "timings", None) or getattr(record, "memory", None)
+        if event is not None:
+            entry.update(event)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_json_logging(level: int = logging.INFO):
+    """
+    Faz o logger raiz emitir JSON, uma linha por registro.
+
+    Handlers já configurados (ex.: ``logging.basicConfig``) passam a usar o
+    ``JsonFormatter``; sem nenhum, um handler de console é criado.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    for handler in root.handlers:
+        if not isinstance(handler.formatter, JsonFormatter):
+            handler.setFormatter(JsonFormatter())
+    root.setLevel(level)
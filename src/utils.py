@@ -1,16 +1,28 @@
 import json
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 import re
 from datetime import datetime
 import logging
 
+try:
+    from .lazy import lazy_module
+except ImportError:
+    from lazy import lazy_module
+
+
+def _configure_plots(pyplot):
+    """Estilo padrão dos gráficos, aplicado quando o matplotlib é carregado."""
+    pyplot.style.use('seaborn-v0_8')
+    sns.set_palette("husl")
+
+
+# Bibliotecas de visualização só são importadas ao gerar o primeiro gráfico
+plt = lazy_module("matplotlib.pyplot", on_load=_configure_plots)
+sns = lazy_module("seaborn")
+px = lazy_module("plotly.express")
+
 
 class AgentsManager:
     def __init__(self, llm, database_manager):
@@ -25,10 +37,6 @@ class AgentsManager:
         self.db = database_manager
         self.logger = logging.getLogger(__name__)
 
-        # Configurar estilo dos gráficos
-        plt.style.use('seaborn-v0_8')
-        sns.set_palette("husl")
-
         # Schema do banco para referência
         self.schema = {
             "clientes": [